@@ -0,0 +1,277 @@
+# 🤖 Async, Rate-Limit-Aware OpenAI Engine
+#
+# One shared AsyncOpenAI client for the whole process, with:
+#   * a concurrency limit (semaphore)
+#   * token buckets for requests/minute and tokens/minute
+#   * exponential backoff that honours the 429 Retry-After header
+#   * a timeout per request
+#
+# Async callers use `await engine.generate(prompt)` / `generate_many(prompts)`.
+# Threaded callers (job workers) use `generate_sync(prompt)`, which runs on a
+# background event loop so every thread shares the same limits.
+# `generate_stream(prompt, on_delta)` / `generate_stream_sync` stream the
+# answer and call `on_delta(text)` for every piece as it arrives. on_delta
+# runs in the loop's executor, one call at a time and in order, so it may
+# block (chatgpt_generate writes each piece to a file) without stalling the
+# other requests on the loop.
+#
+# Settings come from config.json -> "openai" (see DEFAULTS). Set
+# OPENAI_BASE_URL to point the client at a local stub server.
+#
+# The openai package (~0.7s to import) is loaded with the first request.
+
+import asyncio
+import os
+import random
+import threading
+import time
+
+from metrics import registry, timer, record_tokens
+
+DEFAULTS = {
+    "model": "gpt-4",
+    "concurrency": 4,
+    "requestsPerMinute": 60,
+    "tokensPerMinute": 40000,
+    "timeoutSeconds": 120,
+    "maxRetries": 6,
+    "expectedOutputTokens": 1500,
+    "stream": True,             # stream final answers (see chatgpt_generate.py)
+}
+
+SYSTEM_PROMPT = "You are an expert academic assistant."
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+
+def retryable_errors():
+    import openai
+    return (
+        openai.RateLimitError,
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.InternalServerError,
+    )
+
+
+# 🔢 Rough local token estimate (~4 characters per token for English text)
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+# 🪣 Async token bucket: `capacity` units refilled evenly over one minute
+class AsyncTokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = None  # created lazily inside the running loop
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount=1):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # Requests larger than the bucket wait for a full bucket, then go into debt
+        needed = min(float(amount), self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= needed:
+                    self._tokens -= amount
+                    return
+                await asyncio.sleep((needed - self._tokens) / self.rate)
+
+    # Settle an estimate against the real usage reported by the API
+    def adjust(self, delta):
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens - delta)
+
+    # Drain the bucket after a 429 so other tasks back off as well
+    def pause(self, seconds):
+        self._refill()
+        self._tokens = min(self._tokens, -seconds * self.rate)
+
+
+def retry_after_seconds(error):
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    value = response.headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = response.headers.get("retry-after")
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+class GenerationEngine:
+    def __init__(self, settings=None, base_url=None, api_key=None):
+        self.settings = dict(DEFAULTS, **(settings or {}))
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = self.settings["model"]
+        self._client = None
+        self._semaphore = None
+        self.requests = AsyncTokenBucket(self.settings["requestsPerMinute"])
+        self.tokens = AsyncTokenBucket(self.settings["tokensPerMinute"])
+        self.usage = {"requests": 0, "retries": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    # Client and semaphore belong to the loop they are first used on
+    def _ensure(self):
+        if self._client is None:
+            import openai
+            # max_retries=0: retries and backoff are handled here
+            self._client = openai.AsyncOpenAI(
+                base_url=self.base_url, api_key=self.api_key or os.getenv("OPENAI_API_KEY"),
+                max_retries=0, timeout=self.settings["timeoutSeconds"])
+            self._semaphore = asyncio.Semaphore(self.settings["concurrency"])
+
+    def _messages(self, prompt, system_prompt):
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt}
+        ]
+
+    # ⏳ Delay before retry `attempt`, or re-raise once retries are used up
+    def _retry_delay(self, error, attempt):
+        if attempt > self.settings["maxRetries"]:
+            raise error
+        delay = retry_after_seconds(error)
+        if delay is None:
+            delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** (attempt - 1)))
+            delay += random.uniform(0, delay / 2)
+        import openai
+        if isinstance(error, openai.RateLimitError):
+            self.requests.pause(delay)
+        self.usage["retries"] += 1
+        registry.inc("openai_retries_total", error=type(error).__name__)
+        print(f"⏳ OpenAI {type(error).__name__}, retry {attempt} in {delay:.1f}s")
+        return delay
+
+    def _record_usage(self, usage, estimated):
+        self.usage["requests"] += 1
+        if usage is not None:
+            self.usage["prompt_tokens"] += usage.prompt_tokens or 0
+            self.usage["completion_tokens"] += usage.completion_tokens or 0
+            self.tokens.adjust((usage.total_tokens or 0) - estimated)
+            record_tokens(usage.prompt_tokens, usage.completion_tokens)
+
+    async def generate(self, prompt, system_prompt=SYSTEM_PROMPT, model=None):
+        self._ensure()
+        estimated = estimate_tokens(system_prompt + prompt) + self.settings["expectedOutputTokens"]
+        attempt = 0
+
+        async with self._semaphore:
+            while True:
+                await self.requests.acquire(1)
+                await self.tokens.acquire(estimated)
+                try:
+                    with timer("openai"):
+                        response = await self._client.chat.completions.create(
+                            model=model or self.model,
+                            messages=self._messages(prompt, system_prompt),
+                            timeout=self.settings["timeoutSeconds"],
+                        )
+                except retryable_errors() as e:
+                    attempt += 1
+                    await asyncio.sleep(self._retry_delay(e, attempt))
+                    continue
+
+                self._record_usage(getattr(response, "usage", None), estimated)
+                return response.choices[0].message.content
+
+    # 🌊 Streaming variant. Retries only happen before the first token: once
+    # text has been handed to on_delta, a broken stream raises.
+    async def generate_stream(self, prompt, on_delta, system_prompt=SYSTEM_PROMPT, model=None):
+        self._ensure()
+        loop = asyncio.get_running_loop()
+        estimated = estimate_tokens(system_prompt + prompt) + self.settings["expectedOutputTokens"]
+        attempt = 0
+
+        async with self._semaphore:
+            while True:
+                await self.requests.acquire(1)
+                await self.tokens.acquire(estimated)
+                parts = []
+                usage = None
+                try:
+                    with timer("openai"):
+                        stream = await self._client.chat.completions.create(
+                            model=model or self.model,
+                            messages=self._messages(prompt, system_prompt),
+                            timeout=self.settings["timeoutSeconds"],
+                            stream=True,
+                            stream_options={"include_usage": True},
+                        )
+                        async for chunk in stream:
+                            if chunk.usage is not None:
+                                usage = chunk.usage
+                            if chunk.choices and chunk.choices[0].delta.content:
+                                text = chunk.choices[0].delta.content
+                                parts.append(text)
+                                await loop.run_in_executor(None, on_delta, text)
+                except retryable_errors() as e:
+                    if parts:
+                        raise
+                    attempt += 1
+                    await asyncio.sleep(self._retry_delay(e, attempt))
+                    continue
+
+                self._record_usage(usage, estimated)
+                return "".join(parts)
+
+    async def generate_many(self, prompts, **kwargs):
+        return await asyncio.gather(*(self.generate(p, **kwargs) for p in prompts),
+                                    return_exceptions=True)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+# 🧵 Background loop so threaded code shares one engine
+_engine = None
+_loop = None
+_engine_lock = threading.Lock()
+
+
+def _load_settings():
+    try:
+        from storage import get_storage
+        return get_storage().get_setting("openai", {}) or {}
+    except Exception:
+        return {}
+
+
+def get_engine():
+    global _engine, _loop
+    with _engine_lock:
+        if _engine is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="openai-loop", daemon=True).start()
+            _engine = GenerationEngine(_load_settings())
+        return _engine
+
+
+def generate_sync(prompt, **kwargs):
+    engine = get_engine()
+    future = asyncio.run_coroutine_threadsafe(engine.generate(prompt, **kwargs), _loop)
+    return future.result()
+
+
+def generate_stream_sync(prompt, on_delta, **kwargs):
+    engine = get_engine()
+    future = asyncio.run_coroutine_threadsafe(engine.generate_stream(prompt, on_delta, **kwargs), _loop)
+    return future.result()
@@ -0,0 +1,182 @@
+# 🗂️ In-memory Assignment Index
+#
+# Loads every assignment JSON once and keeps it in memory, keyed by
+# assignment id, course and status. Later refreshes only stat the folder
+# and re-read files whose mtime/size changed, so a request no longer
+# costs one json.load per assignment.
+
+import os
+import json
+import hashlib
+import threading
+import time
+
+# ⏱️ Minimum seconds between two directory scans (0 = scan on every call)
+REFRESH_INTERVAL = 2.0
+
+
+class AssignmentIndex:
+    def __init__(self, assignments_dir, refresh_interval=REFRESH_INTERVAL):
+        self.assignments_dir = assignments_dir
+        self.refresh_interval = refresh_interval
+        self.version = 0
+
+        self._lock = threading.RLock()
+        self._files = {}       # filename -> (mtime_ns, size, assignment)
+        self._by_id = {}       # assignment id -> filename
+        self._by_course = {}   # course id -> set of filenames
+        self._by_status = {}   # status -> set of filenames
+        self._last_scan = 0.0
+        self._fingerprint = 0  # XOR of per-file (name, mtime, size) hashes
+
+        self.refresh(force=True)
+
+    # ✅ Key helpers (same fallbacks the API always used)
+    @staticmethod
+    def assignment_id(filename, assignment):
+        return assignment.get('id', filename[:-len('.json')])
+
+    @staticmethod
+    def course_id(assignment):
+        return assignment.get('courseId') or assignment.get('course')
+
+    @staticmethod
+    def status(assignment):
+        return assignment.get('status', 'pending')
+
+    @staticmethod
+    def _entry_hash(filename, mtime_ns, size):
+        digest = hashlib.blake2b(f"{filename}:{mtime_ns}:{size}".encode('utf-8'), digest_size=8)
+        return int.from_bytes(digest.digest(), 'big')
+
+    # 🔖 Content-derived version token: identical across processes that see
+    # the same files, so it is safe to build HTTP validators from it
+    def fingerprint(self):
+        self.refresh()
+        with self._lock:
+            return f"{self._fingerprint:016x}"
+
+    # 🔄 Incremental refresh: only changed files are parsed again
+    def refresh(self, force=False):
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_scan < self.refresh_interval:
+                return False
+            self._last_scan = now
+
+            seen = set()
+            changed = False
+            try:
+                entries = list(os.scandir(self.assignments_dir))
+            except FileNotFoundError:
+                entries = []
+
+            for entry in entries:
+                if not entry.name.endswith('.json') or not entry.is_file():
+                    continue
+                seen.add(entry.name)
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                cached = self._files.get(entry.name)
+                if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+                    continue
+                self._load(entry.name, st)
+                changed = True
+
+            for filename in list(self._files):
+                if filename not in seen:
+                    self._drop(filename)
+                    changed = True
+
+            if changed:
+                self.version += 1
+            return changed
+
+    # 📄 Re-read a single file right away (after we wrote it ourselves)
+    def reload_file(self, filename):
+        filename = os.path.basename(filename)
+        with self._lock:
+            path = os.path.join(self.assignments_dir, filename)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                if filename in self._files:
+                    self._drop(filename)
+                    self.version += 1
+                return
+            self._load(filename, st)
+            self.version += 1
+
+    def _load(self, filename, st):
+        path = os.path.join(self.assignments_dir, filename)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                assignment = json.load(f)
+        except Exception as file_error:
+            print(f"❌ Error in file {filename}: {file_error}")
+            # Remember the stat so a broken file is not re-parsed every scan
+            self._drop(filename)
+            self._files[filename] = (st.st_mtime_ns, st.st_size, None)
+            self._fingerprint ^= self._entry_hash(filename, st.st_mtime_ns, st.st_size)
+            return
+
+        self._drop(filename)
+        self._files[filename] = (st.st_mtime_ns, st.st_size, assignment)
+        self._fingerprint ^= self._entry_hash(filename, st.st_mtime_ns, st.st_size)
+
+        assignment_id = self.assignment_id(filename, assignment)
+        self._by_id[assignment_id] = filename
+        self._by_course.setdefault(self.course_id(assignment), set()).add(filename)
+        self._by_status.setdefault(self.status(assignment), set()).add(filename)
+
+    def _drop(self, filename):
+        cached = self._files.pop(filename, None)
+        if not cached:
+            return
+        self._fingerprint ^= self._entry_hash(filename, cached[0], cached[1])
+        if cached[2] is None:
+            return
+        assignment = cached[2]
+        assignment_id = self.assignment_id(filename, assignment)
+        if self._by_id.get(assignment_id) == filename:
+            del self._by_id[assignment_id]
+        for bucket, key in ((self._by_course, self.course_id(assignment)),
+                            (self._by_status, self.status(assignment))):
+            names = bucket.get(key)
+            if names is not None:
+                names.discard(filename)
+                if not names:
+                    del bucket[key]
+
+    # 🔍 Lookups — each returns (filename, assignment) pairs
+    def get(self, assignment_id):
+        self.refresh()
+        with self._lock:
+            filename = self._by_id.get(assignment_id)
+            if filename is None and self.refresh(force=True):
+                # Maybe written by the fetcher since the last scan
+                filename = self._by_id.get(assignment_id)
+            if filename is None:
+                return None, None
+            return filename, self._files[filename][2]
+
+    def all(self):
+        self.refresh()
+        with self._lock:
+            return [(name, cached[2]) for name, cached in self._files.items()
+                    if cached[2] is not None]
+
+    def by_course(self, course_id):
+        self.refresh()
+        with self._lock:
+            return [(n, self._files[n][2]) for n in self._by_course.get(course_id, ())]
+
+    def by_status(self, status):
+        self.refresh()
+        with self._lock:
+            return [(n, self._files[n][2]) for n in self._by_status.get(status, ())]
+
+    def path(self, filename):
+        return os.path.join(self.assignments_dir, filename)
@@ -1,9 +1,16 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory, g
 from flask import send_file
 from flask_cors import CORS
+from werkzeug.utils import secure_filename
+import base64
+import hashlib
 import json
 import os
+import sys
+import time
 import uuid
+import threading
+import codecs
 
 app = Flask(__name__)
 CORS(app)
@@ -15,8 +22,34 @@ RESPONSE_DIR = os.path.join(BASE_DIR, "Generated_Responses")
 ASSIGNMENTS_DIR = os.path.join(BASE_DIR, "Assignments")
 ATTACHMENT_DIR = os.path.join(BASE_DIR, "Assignment_Files")
 COURSES_FILE = os.path.join(BASE_DIR, "backend/courses.json")
-NOTIFICATIONS_FILE = os.path.join(BASE_DIR, "backend/notifications.json")
 
+# Shared modules live next to the fetcher scripts
+sys.path.insert(0, BASE_DIR)
+from storage import get_storage, write_atomic, STATUSES
+from response_files import ResponseFileCache, html_path_for, render_html, pick_encoding
+from search_index import get_search_index
+from course_export import export_course
+from job_queue import get_queue, GENERATE_RESPONSE
+import metrics
+
+# 💾 JSON files or SQLite, depending on config.json
+storage = get_storage()
+
+
+# 📈 Latency of every route (labelled by the URL rule, not the raw path)
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_latency(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.registry.observe("http_request_seconds", time.perf_counter() - started,
+                                 route=route, method=request.method, status=response.status_code)
+    return response
 
 
 # @app.route('/static/<path:filename>')
@@ -25,85 +58,449 @@ NOTIFICATIONS_FILE = os.path.join(BASE_DIR, "backend/notifications.json")
 
 
 def load_courses():
-    if os.path.exists(COURSES_FILE):
-        with open(COURSES_FILE, 'r') as f:
-            return json.load(f)
-    return {}
+    return storage.courses()
+
+
+ASSIGNMENT_FIELDS = ['id', 'title', 'description', 'dueDate', 'course', 'courseName',
+                     'status', 'priority', 'downloadLink', 'aiResponseFile']
+MAX_PAGE_SIZE = 500
+
+
+def split_param(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    return {v.strip() for v in value.split(',') if v.strip()}
+
+
+def due_key(data):
+    # Sortable "YYYY-MM-DD" string; undated assignments sort last
+    due = data.get('dueDate') or {}
+    if not due.get('year'):
+        return "9999-12-31"
+    return f"{due.get('year', 0):04d}-{due.get('month', 1):02d}-{due.get('day', 1):02d}"
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('ascii')
+
+
+# -> [due key, id], the sort key of the last item of the previous page
+def decode_cursor(cursor):
+    key = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    if not (isinstance(key, list) and len(key) == 2 and all(isinstance(k, str) for k in key)):
+        raise ValueError("malformed cursor")
+    return key
+
+
+def assignments_etag():
+    # Strong validator: stored assignments + courses + the exact query
+    query = "&".join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+    digest = hashlib.sha1(f"{storage.fingerprint()}:{query}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+# 🗂️ (filename, data) of the assignments matching the list filters (sets, or
+# None for "any"), narrowed with the storage indexes before touching records
+def filter_assignments(courses=None, statuses=None, priorities=None, due_after=None, due_before=None):
+    if courses is not None:
+        candidates = [pair for c in courses for pair in storage.assignments_by_course(c)]
+    elif statuses is not None:
+        candidates = [pair for st in statuses for pair in storage.assignments_by_status(st)]
+    else:
+        candidates = storage.all_assignments()
+
+    matched = []
+    for filename, data in candidates:
+        course_id = data.get('courseId') or data.get('course')
+        if courses is not None and course_id not in courses:
+            continue
+        if statuses is not None and data.get('status', 'pending') not in statuses:
+            continue
+        if priorities is not None and data.get('priority', 'medium') not in priorities:
+            continue
+        key = due_key(data)
+        if due_after and key < due_after:
+            continue
+        if due_before and key > due_before:
+            continue
+        matched.append((filename, data))
+    return matched
 
 
 @app.route('/api/assignments', methods=['GET'])
 def get_assignments():
     assignment_list = []
-    
-    with open(COURSES_FILE) as f:
-        course_data = json.load(f)
-    course_map = course_data 
 
     try:
-        for filename in os.listdir(ASSIGNMENTS_DIR):
-            if filename.endswith('.json'):
-                filepath = os.path.join(ASSIGNMENTS_DIR, filename)
-                try:
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                    
-                    course_id = data.get('courseId') or data.get('course')
-                    course_name = course_map.get(course_id, course_id)
-
-                    assignment_list.append({
-                        'id': data.get('id', filename.replace('.json', '')),
-                        'title': data.get('title', 'Untitled'),
-                        'description': data.get('description', 'No description'),
-                        'dueDate': data.get('dueDate', {}),
-                        'course': course_id,
-                        'courseName': course_name,
-                        'status': data.get('status', 'pending'),
-                        'priority': data.get('priority', 'medium'),
-                        'downloadLink': f"/api/assignments/{filename.replace('.json', '')}/download",
-                        'aiResponseFile': f"/api/assignments/{filename.replace('.json', '')}/ai-response"
-                    })
-                except Exception as file_error:
-                    print(f"❌ Error in file {filename}: {file_error}")
-                    continue  # Skip broken file
-
-        return jsonify({'assignments': assignment_list})
+        # 🔖 Unchanged polls get a 304 before anything is serialized
+        etag = assignments_etag()
+        if etag in request.if_none_match:
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            return response
+
+        courses = split_param('course')
+        statuses = split_param('status')
+        priorities = split_param('priority')
+        due_after = request.args.get('dueAfter')    # YYYY-MM-DD, inclusive
+        due_before = request.args.get('dueBefore')  # YYYY-MM-DD, inclusive
+        fields = split_param('fields')
+        order = request.args.get('sort')
+        limit = request.args.get('limit', type=int)
+        cursor = request.args.get('cursor')
+
+        # Unsorted, unpaged requests keep the storage order they always had;
+        # pages need a stable order, so they default to the due date
+        if order is None and (limit is not None or cursor):
+            order = 'dueDate'
+        if order not in (None, 'dueDate', '-dueDate'):
+            return jsonify({'error': "sort must be 'dueDate' or '-dueDate'"}), 400
+        if fields is not None and not fields <= set(ASSIGNMENT_FIELDS):
+            return jsonify({'error': f"Unknown fields: {sorted(fields - set(ASSIGNMENT_FIELDS))}"}), 400
+        if limit is not None:
+            limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+        matched = [([due_key(data), str(data.get('id', filename.replace('.json', '')))], filename, data)
+                   for filename, data in filter_assignments(courses, statuses, priorities,
+                                                            due_after, due_before)]
+
+        if order is not None:
+            matched.sort(key=lambda item: item[0], reverse=(order == '-dueDate'))
+
+        if cursor:
+            try:
+                after = decode_cursor(cursor)
+            except Exception:
+                return jsonify({'error': 'Invalid cursor'}), 400
+            if order == 'dueDate':
+                matched = [m for m in matched if m[0] > after]
+            else:
+                matched = [m for m in matched if m[0] < after]
+
+        next_cursor = None
+        if limit is not None and len(matched) > limit:
+            matched = matched[:limit]
+            next_cursor = encode_cursor(matched[-1][0])
+
+        course_map = load_courses()
+
+        for _, filename, data in matched:
+            stem = filename.replace('.json', '')
+            course_id = data.get('courseId') or data.get('course')
+            course_name = course_map.get(course_id, course_id)
+
+            item = {
+                'id': data.get('id', stem),
+                'title': data.get('title', 'Untitled'),
+                'description': data.get('description', 'No description'),
+                'dueDate': data.get('dueDate', {}),
+                'course': course_id,
+                'courseName': course_name,
+                'status': data.get('status', 'pending'),
+                'priority': data.get('priority', 'medium'),
+                'downloadLink': f"/api/assignments/{stem}/download",
+                'aiResponseFile': f"/api/assignments/{stem}/ai-response"
+            }
+            if fields is not None:
+                item = {k: v for k, v in item.items() if k in fields}
+            assignment_list.append(item)
+
+        payload = {'assignments': assignment_list}
+        if limit is not None:
+            payload['nextCursor'] = next_cursor
+
+        response = jsonify(payload)
+        response.set_etag(etag)
+        return response
 
     except Exception as e:
         print(f"❌ Top-level error: {e}")
         return jsonify({'error': str(e)}), 500
 
-# ✅ Serve AI Response (.md)
+
+# 🔎 Full-text search over titles, descriptions, attachment text and AI
+# responses (search_index.py). Matches come back wrapped in <mark>.
+@app.route('/api/search', methods=['GET'])
+def search_assignments():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': "q is required"}), 400
+    limit = max(1, min(request.args.get('limit', 20, type=int), MAX_PAGE_SIZE))
+    offset = max(0, request.args.get('offset', 0, type=int))
+
+    index = get_search_index()
+    index.ensure_built(storage)
+    page = index.search(query, limit=limit, offset=offset, course_id=request.args.get('course'))
+
+    course_map = load_courses()
+    for result in page['results']:
+        stem = result['filename'].replace('.json', '')
+        # Status changes do not touch the index: read the live value
+        data = storage.read_assignment(result['filename']) or {}
+        result['courseName'] = course_map.get(result['course'], result['courseName'] or result['course'])
+        result['status'] = data.get('status', 'pending')
+        result['dueDate'] = data.get('dueDate', {})
+        result['downloadLink'] = f"/api/assignments/{stem}/download"
+        result['aiResponseFile'] = f"/api/assignments/{stem}/ai-response"
+    return jsonify(page)
+
+
+# 🧠 Hot AI responses stay in memory with their ETag and compressed forms
+response_cache = ResponseFileCache()
+
+RESPONSE_FORMATS = {
+    'json': 'application/json',
+    'markdown': 'text/markdown; charset=utf-8',
+    'html': 'text/html; charset=utf-8',
+}
+
+
+def read_markdown(path):
+    with open(path, 'r', encoding='utf-8') as rf:
+        return rf.read()
+
+
+def response_body(md_path, fmt):
+    if fmt == 'json':
+        return response_cache.get(
+            md_path, lambda p: json.dumps({"content": read_markdown(p)}).encode('utf-8'), 'json')
+    if fmt == 'markdown':
+        return response_cache.get(md_path, variant='markdown')
+
+    html_path = html_path_for(md_path)
+    if not os.path.exists(html_path) or os.stat(html_path).st_mtime_ns < os.stat(md_path).st_mtime_ns:
+        # Answers written before pre-rendering existed: render once and keep it
+        write_atomic(html_path, render_html(read_markdown(md_path)))
+    return response_cache.get(html_path, variant='html')
+
+
+# ✅ Serve AI Response. ?format=json (default, {"content": markdown}),
+# markdown, or html (pre-rendered at generation time). Responses carry an
+# ETag and Last-Modified, answer 304 to revalidation and are gzip/brotli
+# compressed when the client accepts it.
 @app.route('/api/assignments/<assignment_id>/ai-response', methods=['GET'])
 def get_ai_response(assignment_id):
-    # Search the JSON files to get the correct ai_response_file path
-    for file in os.listdir(ASSIGNMENTS_DIR):
-        if file.endswith(".json"):
-            file_path = os.path.join(ASSIGNMENTS_DIR, file)
-            with open(file_path, 'r', encoding='utf-8') as f:
-                assignment = json.load(f)
-                if assignment.get("id") == assignment_id:
-                    response_path = assignment.get("ai_response_file")
-                    if not response_path:
-                        return jsonify({"error": "No AI response path set"}), 404
-
-                    full_path = os.path.join(BASE_DIR, response_path)
-                    if not os.path.exists(full_path):
-                        return jsonify({"error": "AI response file not found"}), 404
-
-                    with open(full_path, 'r', encoding='utf-8') as rf:
-                        content = rf.read()
-                    return jsonify({"content": content})
-
-    return jsonify({"error": "Assignment not found"}), 404
+    fmt = request.args.get('format', 'json')
+    if fmt not in RESPONSE_FORMATS:
+        return jsonify({"error": f"format must be one of {sorted(RESPONSE_FORMATS)}"}), 400
+
+    # Look up the ai_response_file path through the index
+    _, assignment = storage.get_assignment(assignment_id)
+    if assignment is None:
+        return jsonify({"error": "Assignment not found"}), 404
+
+    response_path = assignment.get("ai_response_file")
+    if not response_path:
+        return jsonify({"error": "No AI response path set"}), 404
+
+    full_path = os.path.join(BASE_DIR, response_path)
+    try:
+        entry = response_body(full_path, fmt)
+    except FileNotFoundError:
+        return jsonify({"error": "AI response file not found"}), 404
+
+    encoding = pick_encoding(request.accept_encodings, len(entry.body))
+    response = app.response_class(
+        response_cache.encoded(entry, encoding) if encoding else entry.body, mimetype=RESPONSE_FORMATS[fmt])
+    response.set_etag(f"{entry.etag}-{encoding}" if encoding else entry.etag)
+    response.last_modified = entry.mtime
+    response.headers['Cache-Control'] = 'no-cache'  # always revalidate, 304 is cheap
+    response.vary.add('Accept-Encoding')
+    if encoding:
+        response.content_encoding = encoding
+    return response.make_conditional(request)
+
+STREAM_POLL_SECONDS = 0.1
+STREAM_IDLE_SECONDS = 180      # no new tokens for this long -> give up
+STREAM_KEEPALIVE_SECONDS = 15
+STREAM_JOB_CHECK_SECONDS = 1   # while waiting for generation to start
+PARTIAL_SUFFIX = ".partial"    # written by chatgpt_generate while streaming
+
+
+def sse(event, data, event_id=None):
+    prefix = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{prefix}event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+# 🌊 Live AI response (Server-Sent Events). While the generator streams into
+# <response>.md.partial, new text is sent as `delta` events; once the final
+# file is written, one `done` event carries the complete content.
+@app.route('/api/assignments/<assignment_id>/ai-response/stream', methods=['GET'])
+def stream_ai_response(assignment_id):
+    filename, assignment = storage.get_assignment(assignment_id)
+    if assignment is None:
+        return jsonify({"error": "Assignment not found"}), 404
+    response_path = assignment.get("ai_response_file")
+    if not response_path:
+        return jsonify({"error": "No AI response path set"}), 404
+
+    full_path = os.path.join(BASE_DIR, response_path)
+    partial_path = full_path + PARTIAL_SUFFIX
+
+    # Nothing to wait for: no answer, none being written, no job queued
+    def generation_pending():
+        return os.path.exists(partial_path) or get_queue().is_pending(GENERATE_RESPONSE, filename)
+
+    if not os.path.exists(full_path) and not generation_pending():
+        return jsonify({"error": "AI response is not being generated"}), 404
+
+    def events():
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        offset = 0
+        last_progress = last_sent = last_check = time.monotonic()
+        while True:
+            if os.path.exists(partial_path):
+                try:
+                    with open(partial_path, 'rb') as f:
+                        f.seek(offset)
+                        data = f.read()
+                except FileNotFoundError:
+                    continue  # finished between the check and the read
+                offset += len(data)
+                text = decoder.decode(data)
+                if text:
+                    yield sse("delta", {"text": text})
+                    last_progress = last_sent = time.monotonic()
+            elif os.path.exists(full_path):
+                with open(full_path, 'r', encoding='utf-8') as rf:
+                    yield sse("done", {"content": rf.read()})
+                return
+
+            now = time.monotonic()
+            if offset == 0 and now - last_check > STREAM_JOB_CHECK_SECONDS:
+                # Still queued? A job that failed or was removed never writes anything
+                last_check = now
+                if not generation_pending() and not os.path.exists(full_path):
+                    yield sse("error", {"error": "AI response is not being generated"})
+                    return
+            if now - last_progress > STREAM_IDLE_SECONDS:
+                yield sse("error", {"error": "AI response is not being generated"})
+                return
+            if now - last_sent > STREAM_KEEPALIVE_SECONDS:
+                yield ": keep-alive\n\n"
+                last_sent = now
+            time.sleep(STREAM_POLL_SECONDS)
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+CHANGES_POLL_SECONDS = 0.25
+MAX_WAIT_SECONDS = 60
+
+
+# 👀 One thread per backend worker polls the feed's latest version (a single
+# indexed lookup); long-poll and SSE clients sleep on the condition instead
+# of each querying storage.
+class ChangeWatcher:
+    def __init__(self):
+        self.version = None
+        self.condition = threading.Condition()
+        self._started = False
+        self._start_lock = threading.Lock()
+
+    def _run(self):
+        while True:
+            try:
+                latest = storage.latest_change()
+            except Exception as e:
+                print(f"⚠️ Change feed poll failed: {e}")
+                latest = self.version
+            with self.condition:
+                if latest != self.version:
+                    self.version = latest
+                    self.condition.notify_all()
+            time.sleep(CHANGES_POLL_SECONDS)
+
+    # True once a version newer than `since` exists, False after `timeout`
+    def wait_beyond(self, since, timeout):
+        with self._start_lock:
+            if not self._started:
+                threading.Thread(target=self._run, name="change-watcher", daemon=True).start()
+                self._started = True
+        with self.condition:
+            return self.condition.wait_for(
+                lambda: self.version is not None and self.version > since, timeout)
+
+
+change_watcher = ChangeWatcher()
+
+
+def changes_page(since):
+    changes, reset = storage.changes(since, MAX_PAGE_SIZE)
+    latest = changes[-1]['version'] if changes else storage.latest_change()
+    if since > latest:
+        reset = True  # the feed was recreated; the client's version means nothing
+    return changes, reset, latest
+
+
+# 📰 Change feed: ?since=<version> returns what changed after that version.
+# Without `since` only the current version is returned (start from there).
+# &wait=<seconds> long-polls until something changes or the time is up.
+# Clients that get "reset": true reload their lists once.
+@app.route('/api/changes', methods=['GET'])
+def get_changes():
+    since = request.args.get('since', type=int)
+    wait = max(0.0, min(request.args.get('wait', 0, type=float), MAX_WAIT_SECONDS))
+    if since is None:
+        return jsonify({'version': storage.latest_change(), 'changes': [], 'reset': False,
+                        'hasMore': False})
+
+    changes, reset, latest = changes_page(since)
+    if not changes and not reset and wait:
+        if change_watcher.wait_beyond(since, wait):
+            changes, reset, latest = changes_page(since)
+
+    return jsonify({
+        'version': changes[-1]['version'] if changes else (latest if reset else since),
+        'changes': changes,
+        'reset': reset,
+        'hasMore': len(changes) >= MAX_PAGE_SIZE,
+    })
+
+
+# 🌊 The same feed as Server-Sent Events: one `change` event per entry (its
+# id is the version, so EventSource resumes via Last-Event-ID) and a `reset`
+# event when the client fell too far behind.
+@app.route('/api/changes/stream', methods=['GET'])
+def stream_changes():
+    since = request.args.get('since', type=int)
+    if since is None:
+        since = request.headers.get('Last-Event-ID', type=int)
+    if since is None:
+        since = storage.latest_change()
+
+    def events():
+        version = since
+        yield sse("version", {"version": version}, version)
+        while True:
+            changes, reset, latest = changes_page(version)
+            if reset:
+                version = latest
+                yield sse("reset", {"version": version}, version)
+                continue
+            for change in changes:
+                version = change['version']
+                yield sse("change", change, version)
+            if changes:
+                continue
+            if not change_watcher.wait_beyond(version, STREAM_KEEPALIVE_SECONDS):
+                yield ": keep-alive\n\n"
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/api/assignments/<assignment_id>/download', methods=['GET'])
 def download_attachment(assignment_id):
     try:
-        filepath = os.path.join(ASSIGNMENTS_DIR, f"{assignment_id}.json")
-        with open(filepath, 'r', encoding='utf-8') as f:
-            assignment = json.load(f)
+        assignment = storage.read_assignment(f"{assignment_id}.json")
+        if assignment is None:
+            return jsonify({"error": "Assignment not found"}), 404
 
         attachment_path = assignment.get("local_attachment_path", "").replace("\\", "/")
+        if attachment_path and not os.path.isabs(attachment_path):
+            # Stored relative to the project root by the fetcher
+            attachment_path = os.path.join(BASE_DIR, attachment_path)
         print("📂 Normalized Attachment path:", attachment_path)
 
         if not attachment_path or not os.path.exists(attachment_path):
@@ -123,7 +520,7 @@ def download_attachment(assignment_id):
 def get_response_file(filename):
     return send_from_directory(RESPONSE_DIR, filename)
 
-@app.route('/Assignment_Files/<filename>', methods=['GET'])
+@app.route('/Assignment_Files/<path:filename>', methods=['GET'])
 def get_attachment_file(filename):
     return send_from_directory(ATTACHMENT_DIR, filename)
 
@@ -133,68 +530,141 @@ def update_assignment_status(assignment_id):
     data = request.get_json()
     new_status = data.get('status')
 
-    if new_status not in ['pending', 'completed']:
-        return jsonify({"error": "Invalid status"}), 400
+    if new_status not in STATUSES:
+        return jsonify({"error": f"Invalid status, expected one of {list(STATUSES)}"}), 400
 
-    assignment_files = os.listdir(ASSIGNMENTS_DIR)
-    matched_file = None
-
-    # 🔍 Find the file by ID
-    for filename in assignment_files:
-        if filename.endswith(".json"):
-            filepath = os.path.join(ASSIGNMENTS_DIR, filename)
-            with open(filepath, 'r') as f:
-                assignment = json.load(f)
-                if assignment.get("id") == assignment_id:
-                    matched_file = filepath
-                    break
-
-    if not matched_file:
+    # ✅ Find the record by ID and update the status
+    if not storage.update_assignment_status(assignment_id, new_status):
         return jsonify({"error": "Assignment not found"}), 404
 
-    # ✅ Update the status
-    with open(matched_file, 'r') as f:
-        assignment_data = json.load(f)
-
-    assignment_data['status'] = new_status
-
-    with open(matched_file, 'w') as f:
-        json.dump(assignment_data, f, indent=2)
-        
     print(f"Received status update for {assignment_id}: {new_status}")
     return jsonify({"message": f"Status updated to '{new_status}'"}), 200
-    
-
 
 
+# ✅ Bulk status update, applied as one commit. The body lists the changes
+#   {"updates": [{"id": "...", "status": "completed"}, ...]}
+# and/or sets one status on every assignment matching a filter (same
+# meaning as the /api/assignments query parameters):
+#   {"status": "archived", "filter": {"course": ["123"], "dueBefore": "2025-01-31"}}
+# Each item gets its own result; invalid or unknown items are skipped
+# without affecting the rest.
+@app.route('/api/assignments/status', methods=['PATCH'])
+def update_assignment_statuses():
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({"error": "Expected a JSON object"}), 400
+    items = body.get('updates', [])
+    if not isinstance(items, list):
+        return jsonify({"error": "'updates' must be a list"}), 400
+
+    requested = [(str(item.get('id', '')) if isinstance(item, dict) else '',
+                  item.get('status') if isinstance(item, dict) else None) for item in items]
+
+    if 'filter' in body:
+        flt = body['filter']
+        if not isinstance(flt, dict) or not flt:
+            return jsonify({"error": "'filter' must be a non-empty object"}), 400
+        unknown = set(flt) - {'course', 'status', 'priority', 'dueAfter', 'dueBefore'}
+        if unknown:
+            return jsonify({"error": f"Unknown filters: {sorted(unknown)}"}), 400
+        if body.get('status') not in STATUSES:
+            return jsonify({"error": f"Invalid status, expected one of {list(STATUSES)}"}), 400
+        for key in ('dueAfter', 'dueBefore'):
+            if key in flt and not isinstance(flt[key], str):
+                return jsonify({"error": f"'{key}' must be a YYYY-MM-DD string"}), 400
+        for key in ('course', 'status', 'priority'):
+            value = flt.get(key)
+            if value is not None and not isinstance(value, str) and not (
+                    isinstance(value, list) and all(isinstance(v, str) for v in value)):
+                return jsonify({"error": f"'{key}' must be a string or a list of strings"}), 400
+
+        def as_set(value):
+            if value is None:
+                return None
+            return {str(v) for v in value} if isinstance(value, list) else {str(value)}
+
+        matched = filter_assignments(as_set(flt.get('course')), as_set(flt.get('status')),
+                                     as_set(flt.get('priority')), flt.get('dueAfter'), flt.get('dueBefore'))
+        requested += [(data.get('id', filename.replace('.json', '')), body['status'])
+                      for filename, data in matched]
+
+    # One result (and one write) per id: an id given twice keeps its first
+    # position and its last status, like storage.update_statuses
+    unique, positions = [], {}
+    for assignment_id, status in requested:
+        if assignment_id in positions:
+            unique[positions[assignment_id]] = (assignment_id, status)
+            continue
+        if assignment_id:
+            positions[assignment_id] = len(unique)
+        unique.append((assignment_id, status))
+
+    results = []
+    valid = []
+    for assignment_id, status in unique:
+        if not assignment_id:
+            results.append({"id": assignment_id, "ok": False, "error": "Missing id"})
+        elif status not in STATUSES:
+            results.append({"id": assignment_id, "ok": False, "error": "Invalid status"})
+        else:
+            results.append({"id": assignment_id, "ok": True, "status": status})
+            valid.append((assignment_id, status))
+
+    found = storage.update_statuses(valid) if valid else {}
+    for result in results:
+        if result["ok"] and not found.get(result["id"]):
+            result.update(ok=False, error="Assignment not found")
+            result.pop("status")
+
+    updated = sum(1 for r in results if r["ok"])
+    print(f"Bulk status update: {updated} updated, {len(results) - updated} failed")
+    return jsonify({"results": results, "updated": updated, "failed": len(results) - updated})
+    
 
-def load_json_file(path):
-    if os.path.exists(path):
-        with open(path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return []
-
-def save_json_file(path, data):
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2)
 
 
 
 # ✅ Return course names (mock or static)
 @app.route('/api/courses', methods=['GET'])
 def get_courses():
-    courses = load_json_file(COURSES_FILE)
+    courses = storage.courses()
     return jsonify(courses)
 
 
+# 📦 Everything stored for one course as a ZIP, streamed while it is built
+@app.route('/api/courses/<course_id>/export', methods=['GET'])
+def export_course_zip(course_id):
+    course_name = storage.courses().get(course_id)
+    if course_name is None and not storage.assignments_by_course(course_id):
+        return jsonify({"error": "Course not found"}), 404
+
+    name = secure_filename(course_name or course_id) or "course"
+    return Response(export_course(storage, course_id, course_name, BASE_DIR), mimetype='application/zip',
+                    headers={'Content-Disposition': f'attachment; filename="{name}.zip"',
+                             'Cache-Control': 'no-store'})
+
+
+# 🔔 Notification log. Without parameters the whole log is returned as a list
+# (as before); with ?since=<seq>&limit=<n> one page, oldest first, plus the
+# cursor for the next page.
 @app.route("/api/notifications", methods=["GET"])
 def get_notifications():
-    try:
-        with open(NOTIFICATIONS_FILE, "r", encoding='utf-8') as f:
-            data = json.load(f)
-        return jsonify(data)
-    except FileNotFoundError:
-        return jsonify([]), 200
+    since = request.args.get('since', type=int)
+    limit = request.args.get('limit', type=int)
+    if since is None and limit is None:
+        return jsonify(storage.notifications())
+
+    since = max(0, since or 0)
+    limit = max(1, min(limit or MAX_PAGE_SIZE, MAX_PAGE_SIZE))
+    # One extra entry tells whether another page follows
+    entries = storage.notifications_page(since, limit + 1)
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    return jsonify({
+        'notifications': entries,
+        'nextSince': entries[-1]['seq'] if entries else since,
+        'hasMore': has_more,
+    })
     
 
 @app.route('/api/settings/email', methods=['POST'])
@@ -206,19 +676,19 @@ def update_email():
         return {"error": "Email is required"}, 400
 
     try:
-        config_path = os.path.join(BASE_DIR, 'config.json')
-        with open(config_path, 'r') as f:
-            config = json.load(f)
-
-        config['receiverEmail'] = email
-
-        with open(config_path, 'w') as f:
-            json.dump(config, f, indent=2)
-
+        storage.set_setting('receiverEmail', email)
         return {"message": "Email updated successfully"}
     except Exception as e:
         return {"error": str(e)}, 500
     
 
+# 📈 Prometheus scrape target: this process plus the last fetcher/generator runs
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    snapshots = {"backend": metrics.registry.snapshot(), **metrics.load_snapshots()}
+    return Response(metrics.render_prometheus(snapshots), mimetype='text/plain; version=0.0.4')
+
+
 if __name__ == '__main__':
-    app.run(port=5000)
+    # State writes are atomic and locked (storage.py), so requests may run in parallel
+    app.run(port=5000, threaded=True)
@@ -0,0 +1,236 @@
+# 🎭 In-Process Fakes for the Benchmarks
+#
+# Stand-ins for the Google Classroom / Drive services, the OpenAI client and
+# the SMTP server. Each sleeps for a configurable latency per round trip, so
+# the benchmarks measure our own overhead plus realistic waiting, without
+# network access or credentials. Every fake counts its calls.
+
+import asyncio
+import hashlib
+import threading
+import time
+from types import SimpleNamespace
+
+
+class Counter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.values = {}
+
+    def add(self, name, amount=1):
+        with self._lock:
+            self.values[name] = self.values.get(name, 0) + amount
+
+
+# 🏫 Classroom -------------------------------------------------------------
+
+class FakeRequest:
+    def __init__(self, fn, latency, counter, name):
+        self.fn = fn
+        self.latency = latency
+        self.counter = counter
+        self.name = name
+
+    def execute(self):
+        self.counter.add(self.name)
+        time.sleep(self.latency)
+        return self.fn()
+
+
+class FakeBatch:
+    # One round trip for the whole batch, like a real batch request
+    def __init__(self, callback, latency, counter):
+        self.callback = callback
+        self.latency = latency
+        self.counter = counter
+        self.requests = []
+
+    def add(self, request, request_id=None):
+        self.requests.append((request, request_id))
+
+    def execute(self):
+        self.counter.add("batches")
+        time.sleep(self.latency)
+        for request, request_id in self.requests:
+            self.counter.add(request.name)
+            try:
+                self.callback(request_id, request.fn(), None)
+            except Exception as e:
+                self.callback(request_id, None, e)
+
+
+def _page(items, page_size, page_token):
+    start = int(page_token or 0)
+    end = start + (page_size or 100)
+    return items[start:end], (str(end) if end < len(items) else None)
+
+
+class FakeClassroom:
+    # courses: [course dict]; coursework: {course_id: [courseWork dict]}
+    def __init__(self, courses, coursework, latency=0.0):
+        self.courses_data = courses
+        self.coursework_data = coursework
+        self.latency = latency
+        self.counter = Counter()
+
+    def new_batch_http_request(self, callback=None):
+        return FakeBatch(callback, self.latency, self.counter)
+
+    def courses(self):
+        return _FakeCourses(self)
+
+
+class _FakeCourses:
+    def __init__(self, classroom):
+        self.classroom = classroom
+
+    def list(self, pageSize=None, pageToken=None, courseStates=None, fields=None, **_):
+        courses = [c for c in self.classroom.courses_data
+                   if not courseStates or c.get("courseState", "ACTIVE") in courseStates]
+
+        def respond():
+            page, token = _page(courses, pageSize, pageToken)
+            return {"courses": page, "nextPageToken": token} if token else {"courses": page}
+        return FakeRequest(respond, self.classroom.latency, self.classroom.counter, "courses.list")
+
+    def courseWork(self):
+        return _FakeCourseWork(self.classroom)
+
+
+class _FakeCourseWork:
+    def __init__(self, classroom):
+        self.classroom = classroom
+
+    def list(self, courseId, pageSize=None, pageToken=None, orderBy=None, fields=None, **_):
+        items = list(self.classroom.coursework_data.get(courseId, []))
+        if orderBy:
+            key, _, direction = orderBy.partition(" ")
+            items.sort(key=lambda w: w.get(key, ""), reverse=direction == "desc")
+
+        def respond():
+            page, token = _page(items, pageSize, pageToken)
+            return {"courseWork": page, "nextPageToken": token} if token else {"courseWork": page}
+        return FakeRequest(respond, 0.0, self.classroom.counter, "courseWork.list")
+
+
+# 📂 Drive -----------------------------------------------------------------
+
+class FakeHttpResponse(dict):
+    def __init__(self, status, headers):
+        super().__init__(headers)
+        self.status = status
+
+
+class FakeDrive:
+    # files: {file_id: (title, bytes)}; bandwidth in bytes/second (None = unlimited)
+    def __init__(self, files, latency=0.0, bandwidth=None):
+        self.files_data = files
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.counter = Counter()
+        self.http = SimpleNamespace(request=self._http_request)
+
+    def files(self):
+        return self
+
+    def get(self, fileId, fields=None, **_):
+        title, content = self.files_data[fileId]
+        metadata = {
+            "id": fileId,
+            "name": title,
+            "md5Checksum": hashlib.md5(content).hexdigest(),
+            "modifiedTime": "2025-01-01T00:00:00.000Z",
+            "size": str(len(content)),
+        }
+        return FakeRequest(lambda: metadata, self.latency, self.counter, "files.get")
+
+    def get_media(self, fileId, **_):
+        return SimpleNamespace(uri=fileId, http=self.http)
+
+    def _http_request(self, uri, headers=None):
+        _, content = self.files_data[uri]
+        start, end = 0, len(content) - 1
+        range_header = (headers or {}).get("range", "")
+        if range_header.startswith("bytes="):
+            first, _, last = range_header[len("bytes="):].partition("-")
+            start = int(first)
+            end = min(int(last) if last else end, len(content) - 1)
+        body = content[start:end + 1]
+        self.counter.add("media.requests")
+        self.counter.add("media.bytes", len(body))
+        time.sleep(self.latency + (len(body) / self.bandwidth if self.bandwidth else 0))
+        return FakeHttpResponse(206, {"content-range": f"bytes {start}-{end}/{len(content)}"}), body
+
+
+# Replacement for googleapiclient.discovery.build
+def fake_build(classroom=None, drive=None):
+    def build(service_name, version, credentials=None, **_):
+        return classroom if service_name == "classroom" else drive
+    return build
+
+
+# 🤖 OpenAI ----------------------------------------------------------------
+
+class FakeAsyncOpenAI:
+    # latency: seconds until the first token; stream_chunks: pieces per answer
+    def __init__(self, latency=0.0, answer_words=400, stream_chunks=20):
+        self.latency = latency
+        self.answer_words = answer_words
+        self.stream_chunks = stream_chunks
+        self.counter = Counter()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _answer(self, messages):
+        prompt = messages[-1]["content"]
+        seed = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        words = " ".join(f"word{seed}{i % 97}" for i in range(self.answer_words))
+        return f"# Answer {seed}\n\n## Steps\n\n- {words}\n", len(prompt) // 4
+
+    async def _create(self, model=None, messages=None, stream=False, **_):
+        self.counter.add("requests")
+        content, prompt_tokens = self._answer(messages)
+        usage = SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=len(content) // 4,
+                                total_tokens=prompt_tokens + len(content) // 4)
+        await asyncio.sleep(self.latency)
+        if not stream:
+            message = SimpleNamespace(content=content)
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+        return self._stream(content, usage)
+
+    async def _stream(self, content, usage):
+        size = max(1, len(content) // self.stream_chunks)
+        for i in range(0, len(content), size):
+            delta = SimpleNamespace(content=content[i:i + size])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+            await asyncio.sleep(0)
+        yield SimpleNamespace(choices=[], usage=usage)
+
+    async def close(self):
+        pass
+
+
+# ✉️ SMTP ------------------------------------------------------------------
+
+class FakeSMTP:
+    latency = 0.0
+    counter = Counter()
+
+    def __init__(self, host=None, port=None, timeout=None):
+        self.counter.add("connections")
+        time.sleep(self.latency)
+
+    def starttls(self):
+        time.sleep(self.latency)
+
+    def login(self, username, password):
+        time.sleep(self.latency)
+
+    def send_message(self, msg):
+        self.counter.add("messages")
+        time.sleep(self.latency)
+
+    def quit(self):
+        pass
+
+    def close(self):
+        pass
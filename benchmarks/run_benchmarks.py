@@ -0,0 +1,414 @@
+# 📊 Offline Benchmarks
+#
+# Runs the hot paths against synthetic data and in-process fakes (see
+# fakes.py), so results are reproducible without Google / OpenAI / SMTP
+# accounts or network access:
+#
+#   api       GET /api/assignments and /api/search at several dataset sizes (JSON + SQLite)
+#   fetch     fetch_assignments.main(): full sync, then an incremental rerun
+#   backfill  chatgpt_generate.main(): fresh answers, then cached answers
+#   extract   text_extraction.extract_to_cache(): cold vs warm cache
+#   startup   import time of each CLI command, in a fresh interpreter
+#
+# `--only startup --check` exits non-zero when a command imports a module
+# it should load lazily (openai, googleapiclient, fitz...) or exceeds its
+# time budget; run it before merging changes to module imports.
+#
+# Every benchmark runs in its own temporary workspace; the repository's
+# state files are never touched. Results are printed (and optionally
+# written) as JSON, one file per run, so runs can be diffed.
+#
+#   python benchmarks/run_benchmarks.py --sizes 100,1000 --output bench.json
+
+import io
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import tempfile
+import shutil
+import statistics
+import subprocess
+import contextlib
+from datetime import datetime, timezone
+from unittest import mock
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "backend"))
+sys.path.insert(0, BENCH_DIR)
+
+from fakes import FakeClassroom, FakeDrive, FakeAsyncOpenAI, FakeSMTP, Counter, fake_build
+from synthetic_data import generate, write_layout
+
+BENCHMARKS = ("api", "fetch", "backfill", "extract", "startup")
+
+# command -> (module it imports, modules that must stay unloaded, budget ms)
+HEAVY = ["openai", "googleapiclient", "google_auth_oauthlib", "fitz", "docx"]
+STARTUP_TARGETS = {
+    "cli": ("cli", HEAVY + ["flask"], 50),
+    "sync": ("fetch_assignments", HEAVY + ["flask"], 150),
+    "sync --daemon": ("sync_daemon", HEAVY + ["flask"], 200),
+    "generate/backfill": ("chatgpt_generate", HEAVY + ["flask"], 150),
+    "serve": ("app", HEAVY, 500),
+}
+STARTUP_PROBE = """
+import sys, time, json
+sys.path[:0] = [{repo!r}, {backend!r}]
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"ms": elapsed * 1000, "loaded": [m for m in {forbidden!r} if m in sys.modules]}}))
+"""
+
+# No rate limiting against the fakes: we measure our overhead plus latency
+UNLIMITED = {
+    "cutoffDate": "2000-01-01",
+    "drainQueueAfterSync": False,
+    "rateLimits": {"classroom": 10000, "drive": 10000},
+}
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    ms = lambda s: round(s * 1000, 3)
+    return {
+        "runs": len(ordered),
+        "mean_ms": ms(statistics.fmean(ordered)),
+        "p50_ms": ms(ordered[len(ordered) // 2]),
+        "p95_ms": ms(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]),
+        "min_ms": ms(ordered[0]),
+        "max_ms": ms(ordered[-1]),
+    }
+
+
+def timed(fn, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples), result
+
+
+# 🗂️ Isolated workspace: cwd, config, storage and every cache point into a
+# temp dir; module singletons are restored afterwards
+@contextlib.contextmanager
+def workspace(settings=None, openai_settings=None):
+    import storage, job_queue, response_cache, email_notifier, text_extraction, drive_downloads, ai_engine, metrics
+    import search_index, similar_responses
+
+    ws = tempfile.mkdtemp(prefix="bench-")
+    previous_cwd = os.getcwd()
+    saved = (storage._storage, job_queue._queue, response_cache._cache, email_notifier._dispatcher,
+             ai_engine._engine, text_extraction.CACHE_DIR, drive_downloads.STORE_DIR, metrics.METRICS_DIR,
+             search_index._index, similar_responses._index)
+    config = dict(UNLIMITED, **(settings or {}))
+    config["openai"] = dict({"requestsPerMinute": 1000000, "tokensPerMinute": 1000000000},
+                            **(openai_settings or {}))
+    with open(os.path.join(ws, "config.json"), 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=2)
+    for folder in ("Assignments", "Generated_Responses", "Assignment_Files", "backend"):
+        os.makedirs(os.path.join(ws, folder), exist_ok=True)
+
+    os.chdir(ws)
+    try:
+        storage._storage = storage.JsonStorage(ws)
+        job_queue._queue = job_queue.JobQueue(os.path.join(ws, "job_queue.db"))
+        response_cache._cache = response_cache.ResponseCache(os.path.join(ws, "response_cache.db"))
+        email_notifier._dispatcher = None
+        ai_engine._engine = None
+        text_extraction.CACHE_DIR = os.path.join(ws, "Extracted_Text")
+        drive_downloads.STORE_DIR = os.path.join(ws, "Assignment_Files")
+        metrics.METRICS_DIR = os.path.join(ws, "metrics")
+        search_index._index = search_index.SearchIndex(os.path.join(ws, "search.db"), base_dir=ws)
+        similar_responses._index = similar_responses.SimilarityIndex(os.path.join(ws, "similar_responses.db"))
+        yield ws
+    finally:
+        if email_notifier._dispatcher is not None:
+            email_notifier._dispatcher.flush()
+        os.chdir(previous_cwd)
+        (storage._storage, job_queue._queue, response_cache._cache, email_notifier._dispatcher,
+         ai_engine._engine, text_extraction.CACHE_DIR, drive_downloads.STORE_DIR, metrics.METRICS_DIR,
+         search_index._index, similar_responses._index) = saved
+        shutil.rmtree(ws, ignore_errors=True)
+
+
+# 🎭 Route Google, OpenAI and SMTP to the fakes for the duration of a run
+@contextlib.contextmanager
+def fake_services(classroom=None, drive=None, openai_client=None, smtp_latency=0.0):
+    import classroom_sync, drive_downloads, fetch_assignments, chatgpt_generate, email_notifier, ai_engine
+
+    FakeSMTP.latency = smtp_latency
+    FakeSMTP.counter = Counter()
+    build = fake_build(classroom, drive)
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(mock.patch.object(classroom_sync, "build", build))
+        stack.enter_context(mock.patch.object(drive_downloads, "build", build))
+        stack.enter_context(mock.patch.object(fetch_assignments, "authenticate", lambda: object()))
+        stack.enter_context(mock.patch.object(chatgpt_generate, "authenticate_google", lambda: drive))
+        stack.enter_context(mock.patch.object(email_notifier.smtplib, "SMTP", FakeSMTP))
+        chatgpt_generate._worker_state.__dict__.clear()
+        if openai_client is not None:
+            engine = ai_engine.get_engine()
+            engine._client = openai_client
+            engine._semaphore = asyncio.Semaphore(engine.settings["concurrency"])
+        yield
+        chatgpt_generate._worker_state.__dict__.clear()
+
+
+# 🌐 GET /api/assignments
+def bench_api(args):
+    import storage
+    results = {}
+    for backend in args.backends:
+        results[backend] = {}
+        for size in args.sizes:
+            courses = max(1, size // 50)
+            dataset = generate(courses=courses, assignments=size // courses, attachments=0, seed=args.seed)
+            with workspace() as ws:
+                count = write_layout(dataset, ws, seed=args.seed)
+                if backend == "sqlite":
+                    storage._storage = storage.import_json_layout(ws, os.path.join(ws, "classroom.db"))
+                import app as backend_app
+                backend_app.storage = storage.get_storage()
+                client = backend_app.app.test_client()
+
+                start = time.perf_counter()
+                first = client.get("/api/assignments")
+                cold = time.perf_counter() - start
+                etag = first.headers.get("ETag")
+                course_id = dataset.courses[0]["id"]
+                target = dataset.coursework[course_id][0]["id"]
+                statuses = iter(["completed", "pending"] * args.repeat)
+
+                def update_then_list():
+                    client.put(f"/api/assignments/{target}/status", json={"status": next(statuses)})
+                    return client.get("/api/assignments")
+
+                full, _ = timed(lambda: client.get("/api/assignments"), args.repeat)
+                results[backend][str(size)] = {
+                    "assignments": count,
+                    "response_bytes": len(first.data),
+                    "cold_ms": round(cold * 1000, 3),
+                    "full_list": full,
+                    "not_modified": timed(lambda: client.get(
+                        "/api/assignments", headers={"If-None-Match": etag}), args.repeat)[0],
+                    "course_filter": timed(lambda: client.get(
+                        f"/api/assignments?course={course_id}"), args.repeat)[0],
+                    "first_page_50": timed(lambda: client.get("/api/assignments?limit=50"), args.repeat)[0],
+                    "status_update_then_list": timed(update_then_list, args.repeat)[0],
+                }
+                # First search builds the index; later ones are plain FTS queries
+                word = dataset.coursework[course_id][0]["title"].split()[0]
+                start = time.perf_counter()
+                client.get(f"/api/search?q={word}")
+                results[backend][str(size)]["search_build_ms"] = round((time.perf_counter() - start) * 1000, 3)
+                results[backend][str(size)]["search"] = timed(
+                    lambda: client.get(f"/api/search?q={word}"), args.repeat)[0]
+    return results
+
+
+# 🔄 fetch_assignments.main()
+def bench_fetch(args):
+    import fetch_assignments
+    dataset = generate(courses=args.courses, assignments=args.assignments,
+                       attachments=args.attachments, seed=args.seed)
+    classroom = FakeClassroom(dataset.courses, dataset.coursework, latency=args.latency_ms / 1000)
+    drive = FakeDrive(dataset.files, latency=args.latency_ms / 1000, bandwidth=args.bandwidth_mbps * 125000)
+
+    results = {"assignments": dataset.assignment_count(), "attachments": len(dataset.files)}
+    with workspace(), fake_services(classroom, drive, smtp_latency=args.latency_ms / 1000):
+        for run, full in (("full", True), ("incremental", False)):
+            classroom.counter.values.clear()
+            drive.counter.values.clear()
+            start = time.perf_counter()
+            fetch_assignments.main(full=full)
+            elapsed = time.perf_counter() - start
+            results[run] = {
+                "seconds": round(elapsed, 3),
+                "assignments_per_second": round(dataset.assignment_count() / elapsed, 1),
+                "classroom_calls": dict(classroom.counter.values),
+                "drive_calls": dict(drive.counter.values),
+            }
+    return results
+
+
+# 🤖 chatgpt_generate.main()
+def bench_backfill(args):
+    import chatgpt_generate, ai_engine
+    dataset = generate(courses=args.courses, assignments=args.assignments,
+                       attachments=args.attachments, seed=args.seed)
+    drive = FakeDrive(dataset.files, latency=args.latency_ms / 1000)
+    client = FakeAsyncOpenAI(latency=args.openai_latency_ms / 1000)
+
+    results = {"assignments": dataset.assignment_count()}
+    with workspace(openai_settings={"concurrency": args.concurrency}) as ws:
+        write_layout(dataset, ws, seed=args.seed)
+        with fake_services(drive=drive, openai_client=client, smtp_latency=args.latency_ms / 1000):
+            # "fresh": every answer comes from the (fake) model; "cached": the
+            # response files are gone but the prompts are unchanged
+            for run in ("fresh", "cached"):
+                if run == "cached":
+                    shutil.rmtree(os.path.join(ws, "Generated_Responses"))
+                    os.makedirs(os.path.join(ws, "Generated_Responses"))
+                client.counter.values.clear()
+                FakeSMTP.counter.values.clear()
+                start = time.perf_counter()
+                chatgpt_generate.main()
+                elapsed = time.perf_counter() - start
+                results[run] = {
+                    "seconds": round(elapsed, 3),
+                    "responses_per_second": round(dataset.assignment_count() / elapsed, 1),
+                    "openai_requests": client.counter.values.get("requests", 0),
+                    "emails_sent": FakeSMTP.counter.values.get("messages", 0),
+                    "smtp_connections": FakeSMTP.counter.values.get("connections", 0),
+                }
+            results["usage"] = dict(ai_engine.get_engine().usage)
+    return results
+
+
+# 📄 text_extraction.extract_to_cache()
+def bench_extract(args):
+    import text_extraction
+    files_per_assignment = 2
+    dataset = generate(courses=1, assignments=max(1, args.extract_files // files_per_assignment),
+                       attachments=files_per_assignment, seed=args.seed)
+    results = {"files": len(dataset.files)}
+    with workspace() as ws:
+        write_layout(dataset, ws, seed=args.seed)
+        paths = [os.path.join(root, name)
+                 for root, _, names in os.walk(os.path.join(ws, "Assignment_Files"))
+                 for name in names if not name.startswith(".")]
+        results["bytes"] = sum(os.path.getsize(p) for p in paths)
+
+        start = time.perf_counter()
+        text_extraction.extract_to_cache(paths)
+        results["cold_seconds"] = round(time.perf_counter() - start, 3)
+        results["warm"] = timed(lambda: text_extraction.extract_to_cache(paths), args.repeat)[0]
+
+        # Same files parsed inline, one after another, for comparison
+        text_extraction.CACHE_DIR = os.path.join(ws, "Extracted_Text_inline")
+        start = time.perf_counter()
+        for path in paths:
+            text_extraction.extract_text(path)
+        results["inline_sequential_seconds"] = round(time.perf_counter() - start, 3)
+    return results
+
+
+# ⚡ Import cost of each command, measured in a fresh interpreter each time
+def bench_startup(args):
+    results = {}
+    with workspace() as ws:
+        start = time.perf_counter()
+        for _ in range(args.startup_runs):
+            subprocess.run([sys.executable, "-c", "pass"], cwd=ws, check=True)
+        results["interpreter_ms"] = round((time.perf_counter() - start) * 1000 / args.startup_runs, 1)
+
+        for command, (module, forbidden, budget) in STARTUP_TARGETS.items():
+            probe = STARTUP_PROBE.format(repo=REPO_DIR, backend=os.path.join(REPO_DIR, "backend"),
+                                         module=module, forbidden=forbidden)
+            samples, loaded = [], []
+            for _ in range(args.startup_runs):
+                out = subprocess.run([sys.executable, "-c", probe], cwd=ws, check=True,
+                                     capture_output=True, text=True).stdout
+                measured = json.loads(out.strip().splitlines()[-1])
+                samples.append(measured["ms"])
+                loaded = measured["loaded"]
+            median = round(statistics.median(samples), 1)
+            results[command] = {
+                "module": module,
+                "import_ms": median,
+                "budget_ms": budget,
+                "heavy_modules_loaded": loaded,
+                "ok": median <= budget and not loaded,
+            }
+    return results
+
+
+def startup_failures(results):
+    return [f"{command}: imports {', '.join(r['heavy_modules_loaded'])}" if r["heavy_modules_loaded"]
+            else f"{command}: {r['import_ms']}ms > {r['budget_ms']}ms budget"
+            for command, r in results.items() if isinstance(r, dict) and not r["ok"]]
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def parse_args(argv=None):
+    csv = lambda value: [v.strip() for v in value.split(",") if v.strip()]
+    parser = argparse.ArgumentParser(description="Run the offline benchmarks")
+    parser.add_argument("--only", type=csv, default=list(BENCHMARKS), help=f"subset of {','.join(BENCHMARKS)}")
+    parser.add_argument("--sizes", type=lambda v: [int(s) for s in csv(v)], default=[100, 1000, 5000],
+                        help="assignment counts for the api benchmark")
+    parser.add_argument("--backends", type=csv, default=["json", "sqlite"])
+    parser.add_argument("--courses", type=int, default=4, help="fetch/backfill dataset")
+    parser.add_argument("--assignments", type=int, default=25, help="per course, fetch/backfill dataset")
+    parser.add_argument("--attachments", type=int, default=1, help="per assignment, fetch/backfill dataset")
+    parser.add_argument("--extract-files", type=int, default=12)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Google / SMTP round trip")
+    parser.add_argument("--openai-latency-ms", type=float, default=300.0, help="time to first token")
+    parser.add_argument("--bandwidth-mbps", type=float, default=50.0, help="Drive download speed")
+    parser.add_argument("--concurrency", type=int, default=4, help="OpenAI concurrency")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--startup-runs", type=int, default=5, help="fresh interpreters per command")
+    parser.add_argument("--check", action="store_true", help="exit 1 if a startup budget is exceeded")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="also write the JSON results here")
+    parser.add_argument("--verbose", action="store_true", help="show the scripts' own output")
+    args = parser.parse_args(argv)
+    unknown = set(args.only) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    runners = {"api": bench_api, "fetch": bench_fetch, "backfill": bench_backfill, "extract": bench_extract,
+               "startup": bench_startup}
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("output", "verbose", "check")},
+        },
+        "results": {},
+    }
+    for name in BENCHMARKS:
+        if name not in args.only:
+            continue
+        print(f"⏱️ {name}...", file=sys.stderr)
+        quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        with quiet:
+            report["results"][name] = runners[name](args)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + "\n")
+    if args.check and "startup" in report["results"]:
+        failures = startup_failures(report["results"]["startup"])
+        for failure in failures:
+            print(f"❌ Startup regression: {failure}", file=sys.stderr)
+        if failures:
+            sys.exit(1)
+    return report
+
+
+if __name__ == '__main__':
+    main()
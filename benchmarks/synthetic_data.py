@@ -0,0 +1,167 @@
+# 🧪 Synthetic Classroom Data
+#
+# Builds N courses with M assignments each, in the shape the Classroom API
+# returns, plus PDF/DOCX attachments. The same dataset can feed the fake
+# Google services (fetch benchmark) or be written straight into the
+# Assignments/ + Assignment_Files/ layout (API, backfill, extraction).
+#
+#   python benchmarks/synthetic_data.py <dir> --courses 5 --assignments 40
+
+import io
+import os
+import sys
+import json
+import random
+import hashlib
+import argparse
+from datetime import datetime, timedelta, timezone
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+WORDS = ("data model analysis report experiment design results method function "
+         "theory network system matrix vector probability algorithm sample error "
+         "student course lab dataset training evaluation chapter question answer").split()
+
+
+def sentence(rng, words=12):
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text.capitalize() + "."
+
+
+def paragraph(rng, sentences=5):
+    return " ".join(sentence(rng, rng.randint(8, 16)) for _ in range(sentences))
+
+
+# 📄 Attachments (PyMuPDF and python-docx are already app dependencies)
+def make_pdf(rng, pages):
+    import fitz
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(50, 50, 550, 800), "\n\n".join(paragraph(rng) for _ in range(6)),
+                            fontsize=10)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def make_docx(rng, paragraphs):
+    import docx
+    document = docx.Document()
+    for _ in range(paragraphs):
+        document.add_paragraph(paragraph(rng))
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+class Dataset:
+    def __init__(self, courses, coursework, files):
+        self.courses = courses          # [{"id", "name", "courseState"}]
+        self.coursework = coursework    # {course_id: [courseWork]}
+        self.files = files              # {file_id: (title, bytes)}
+
+    def assignment_count(self):
+        return sum(len(items) for items in self.coursework.values())
+
+
+def generate(courses=5, assignments=20, attachments=1, pdf_pages=3, docx_paragraphs=20, seed=42):
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    course_list, coursework, files = [], {}, {}
+
+    # A handful of distinct documents, shared like real course material
+    pdf_pool = [make_pdf(rng, pdf_pages) for _ in range(3)] if attachments else []
+    docx_pool = [make_docx(rng, docx_paragraphs) for _ in range(3)] if attachments else []
+
+    for c in range(courses):
+        course_id = f"{100000 + c}"
+        course_list.append({"id": course_id, "name": f"Course {c + 1}", "courseState": "ACTIVE"})
+        items = []
+        for a in range(assignments):
+            work_id = f"{course_id}{a:05d}"
+            created = now - timedelta(days=rng.randint(1, 60), minutes=a)
+            due = now + timedelta(days=rng.randint(-10, 40))
+            materials = []
+            for k in range(attachments):
+                file_id = f"file{work_id}{k}"
+                if k % 2 == 0:
+                    title = f"Handout {a + 1}-{k + 1}.pdf"
+                    content = pdf_pool[rng.randrange(len(pdf_pool))] + f"%{file_id}\n".encode()
+                else:
+                    title = f"Notes {a + 1}-{k + 1}.docx"
+                    content = docx_pool[rng.randrange(len(docx_pool))]
+                files[file_id] = (title, content)
+                materials.append({"driveFile": {"driveFile": {"id": file_id, "title": title}}})
+            items.append({
+                "id": work_id,
+                "courseId": course_id,
+                "title": f"Assignment {a + 1} {rng.choice(WORDS).title()}",
+                "description": paragraph(rng, rng.randint(2, 8)),
+                "materials": materials,
+                "dueDate": {"year": due.year, "month": due.month, "day": due.day},
+                "dueTime": {"hours": 23, "minutes": 59},
+                "creationTime": created.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+                "updateTime": (created + timedelta(hours=1)).strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+                "state": "PUBLISHED",
+                "maxPoints": 100,
+                "workType": "ASSIGNMENT",
+            })
+        coursework[course_id] = items
+    return Dataset(course_list, coursework, files)
+
+
+# 💾 Write the dataset the way fetch_assignments.save_assignment would
+def write_layout(dataset, base_dir, seed=42):
+    from fetch_assignments import sanitize_filename
+    from drive_downloads import safe_name, write_meta, version_fields
+
+    rng = random.Random(seed)
+    assignments_dir = os.path.join(base_dir, "Assignments")
+    store_dir = os.path.join(base_dir, "Assignment_Files")
+    os.makedirs(assignments_dir, exist_ok=True)
+    os.makedirs(os.path.join(base_dir, "backend"), exist_ok=True)
+
+    courses = {}
+    for course in dataset.courses:
+        courses[course["id"]] = course["name"]
+        for work in dataset.coursework[course["id"]]:
+            assignment = dict(work)
+            stem = f"{sanitize_filename(course['name'])}_{sanitize_filename(work['title'])}"
+            assignment["ai_response_file"] = f"Generated_Responses/{stem}_response.md"
+            assignment["courseName"] = course["name"]
+            assignment["status"] = rng.choice(["pending", "pending", "completed"])
+            assignment["priority"] = rng.choice(["low", "medium", "high"])
+            for material in work["materials"]:
+                drive_file = material["driveFile"]["driveFile"]
+                title, content = dataset.files[drive_file["id"]]
+                folder = os.path.join(store_dir, drive_file["id"])
+                os.makedirs(folder, exist_ok=True)
+                with open(os.path.join(folder, safe_name(title)), 'wb') as f:
+                    f.write(content)
+                write_meta(os.path.join(folder, ".meta.json"), {"complete": dict(version_fields({
+                    "md5Checksum": hashlib.md5(content).hexdigest(),
+                    "modifiedTime": "2025-01-01T00:00:00.000Z",
+                    "size": str(len(content))}), title=title)})
+                assignment["local_attachment_path"] = os.path.join(
+                    "Assignment_Files", drive_file["id"], safe_name(title))
+            with open(os.path.join(assignments_dir, f"{stem}.json"), 'w', encoding='utf-8') as f:
+                json.dump(assignment, f, indent=2)
+
+    with open(os.path.join(base_dir, "backend", "courses.json"), 'w', encoding='utf-8') as f:
+        json.dump(courses, f, indent=2)
+    return dataset.assignment_count()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Write a synthetic Assignments/ layout")
+    parser.add_argument("directory")
+    parser.add_argument("--courses", type=int, default=5)
+    parser.add_argument("--assignments", type=int, default=20, help="per course")
+    parser.add_argument("--attachments", type=int, default=1, help="per assignment")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    data = generate(args.courses, args.assignments, args.attachments, seed=args.seed)
+    count = write_layout(data, args.directory, seed=args.seed)
+    print(f"✅ Wrote {count} assignments in {args.courses} courses to {args.directory}")
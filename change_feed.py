@@ -0,0 +1,92 @@
+# 📰 Change Feed
+#
+# Every state change (assignment added/updated, status changed, AI response
+# written, notification sent) is appended here with a monotonically
+# increasing version. Clients remember the last version they saw and ask
+# for "everything since N" instead of re-downloading whole lists.
+#
+# The feed is a small SQLite table, so the fetcher, the generator workers
+# and every backend worker share one sequence. Only the newest MAX_CHANGES
+# entries are kept; a client that fell further behind gets "reset": true
+# and reloads its lists once.
+
+import json
+import time
+import sqlite3
+import threading
+
+MAX_CHANGES = 10000
+PRUNE_EVERY = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS changes (
+    version     INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind        TEXT NOT NULL,
+    entity_id   TEXT,
+    data        TEXT NOT NULL,
+    created_at  REAL NOT NULL
+);
+"""
+
+
+class ChangeFeed:
+    def __init__(self, path, max_changes=MAX_CHANGES):
+        self.path = path
+        self.max_changes = max_changes
+        self._local = threading.local()
+        self._recorded = 0
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            conn.executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    # ✅ Append one change -> its version
+    def record(self, kind, entity_id=None, **data):
+        with self._conn() as conn:
+            cur = conn.execute(
+                "INSERT INTO changes (kind, entity_id, data, created_at) VALUES (?, ?, ?, ?)",
+                (kind, entity_id, json.dumps(data), time.time()))
+            version = cur.lastrowid
+            self._recorded += 1
+            if self._recorded % PRUNE_EVERY == 0:
+                conn.execute("DELETE FROM changes WHERE version <= ?", (version - self.max_changes,))
+        return version
+
+    # Many changes of one kind in a single transaction -> their versions
+    def record_many(self, kind, entries):
+        versions = []
+        with self._conn() as conn:
+            for entity_id, data in entries:
+                cur = conn.execute(
+                    "INSERT INTO changes (kind, entity_id, data, created_at) VALUES (?, ?, ?, ?)",
+                    (kind, entity_id, json.dumps(data), time.time()))
+                versions.append(cur.lastrowid)
+            self._recorded += len(versions)
+            if versions and self._recorded % PRUNE_EVERY < len(versions):
+                conn.execute("DELETE FROM changes WHERE version <= ?", (versions[-1] - self.max_changes,))
+        return versions
+
+    def latest(self):
+        row = self._conn().execute("SELECT MAX(version) FROM changes").fetchone()
+        return row[0] or 0
+
+    # 📄 Changes after `since`, oldest first -> (changes, reset)
+    def since(self, since=0, limit=None):
+        conn = self._conn()
+        oldest = conn.execute("SELECT MIN(version) FROM changes").fetchone()[0]
+        reset = oldest is not None and since < oldest - 1
+        rows = conn.execute(
+            "SELECT version, kind, entity_id, data, created_at FROM changes "
+            "WHERE version > ? ORDER BY version LIMIT ?",
+            (since, -1 if limit is None else limit))
+        changes = [dict(json.loads(data), version=version, kind=kind, id=entity_id, time=created_at)
+                   for version, kind, entity_id, data, created_at in rows]
+        return changes, reset
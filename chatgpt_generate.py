@@ -1,32 +1,30 @@
 # 🚀 Generate AI Response for Assignments
 
 import os
-import json
-import openai
-import fitz  
-import docx
-from datetime import datetime
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
-import io
-from email_notifier import send_email
+import threading
+from email_notifier import send_email, flush_notifications
+from storage import get_storage
+from response_files import write_response
+from ai_engine import generate_sync, generate_stream_sync, get_engine, estimate_tokens
+from response_cache import get_response_cache
+from similar_responses import get_similarity_index, adapt_response
+from text_extraction import extract_text, extract_to_cache, SUPPORTED
+from drive_downloads import DriveDownloadManager
+from prompt_builder import PromptBuilder, load_settings as load_prompt_budget
+from metrics import timed, write_snapshot, registry
+from search_index import index_quietly
 
 # 📁 Folder Paths
 ASSIGNMENTS_DIR = "Assignments"
 RESPONSES_DIR = "Generated_Responses"
 ASSIGNMENT_FILES_DIR = "Assignment_Files"
+PARTIAL_SUFFIX = ".partial"  # <response>.md.partial grows while the answer streams in
 TOKEN_PATH = "token.json"
 CREDENTIALS_PATH = "credentials.json"
 
-# 🔐 OpenAI API Key
-openai.api_key = os.getenv("OPENAI_API_KEY")
-
-# 📌 Ensure folders exist
-os.makedirs(RESPONSES_DIR, exist_ok=True)
-os.makedirs(ASSIGNMENT_FILES_DIR, exist_ok=True)
+# 🔐 The OpenAI key is read from OPENAI_API_KEY by ai_engine when the first
+# request is made. Heavy clients (openai, Google) are imported on first use,
+# so importing this module stays cheap and has no side effects.
 
 # ✅ Auth to Google Drive
 SCOPES = [
@@ -38,14 +36,18 @@ CONFIG_PATH = "config.json"
 
 def load_receiver_email():
     try:
-        with open(CONFIG_PATH, 'r') as f:
-            config = json.load(f)
-            return config.get("receiverEmail", "default@email.com")
+        return get_storage().get_setting("receiverEmail", "default@email.com")
     except:
         return "default@email.com"
 
 
+@timed("authenticate")
 def authenticate_google():
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from google.auth.transport.requests import Request
+    from classroom_sync import build
+
     creds = None
     if os.path.exists(TOKEN_PATH):
         creds = Credentials.from_authorized_user_file(TOKEN_PATH, SCOPES)
@@ -59,57 +61,52 @@ def authenticate_google():
             token.write(creds.to_json())
     return build('drive', 'v3', credentials=creds)
 
-# 📌 File Reading Functions
+# 📌 File Reading Functions (cached by content hash, see text_extraction.py)
 def extract_text_from_pdf(pdf_path):
-    try:
-        doc = fitz.open(pdf_path)
-        return "\n".join([page.get_text() for page in doc])
-    except Exception as e:
-        return f"(Error reading PDF: {e})"
+    return extract_text(pdf_path)
 
 def extract_text_from_docx(docx_path):
-    try:
-        doc = docx.Document(docx_path)
-        return "\n".join([para.text for para in doc.paragraphs])
-    except Exception as e:
-        return f"(Error reading DOCX: {e})"
+    return extract_text(docx_path)
 
 def download_file_from_drive(drive_service, file_id, file_name):
     try:
-        request = drive_service.files().get_media(fileId=file_id)
-        filepath = os.path.join(ASSIGNMENT_FILES_DIR, file_name)
-        fh = io.FileIO(filepath, 'wb')
-        downloader = MediaIoBaseDownload(fh, request)
-        done = False
-        while not done:
-            status, done = downloader.next_chunk()
+        filepath = DriveDownloadManager(drive_service).download(file_id, file_name)
         print(f"⬇️ Downloaded missing file: {file_name}")
         return filepath
     except Exception as e:
         return f"(Failed to download file from Drive: {e})"
 
+# ❗ Local path of an attachment, downloading it if missing -> (path, error).
+# The fetcher already stored it by file id, so normally no request is made.
+def ensure_local_file(filename, file_id=None, drive_service=None):
+    if file_id:
+        filepath = DriveDownloadManager().local_path(file_id, filename)
+        if os.path.exists(filepath):
+            return filepath, None
+
+    # Files downloaded before attachments were stored by id
+    legacy_path = os.path.join(ASSIGNMENT_FILES_DIR, filename)
+    if os.path.exists(legacy_path):
+        return legacy_path, None
+
+    if drive_service and file_id:
+        result = download_file_from_drive(drive_service, file_id, filename)
+        if isinstance(result, str) and result.startswith("("):  # error string
+            return None, result
+        return result, None
+    return None, f"(Assignment file '{filename}' not found locally)"
+
 def extract_text_from_file(filename, file_id=None, drive_service=None):
     ext = filename.split('.')[-1].lower()
-    filepath = os.path.join(ASSIGNMENT_FILES_DIR, filename)
-
-    # ❗ Try to download if not exists
-    if not os.path.exists(filepath):
-        if drive_service and file_id:
-            result = download_file_from_drive(drive_service, file_id, filename)
-            if isinstance(result, str) and result.startswith("("):  # error string
-                return result
-        else:
-            return f"(Assignment file '{filename}' not found locally)"
+    if ext not in SUPPORTED:
+        return f"(Unsupported file type: {ext})"
+
+    filepath, error = ensure_local_file(filename, file_id, drive_service)
+    if error:
+        return error
 
     # 🔍 Read the file
-    if ext == "pdf":
-        return extract_text_from_pdf(filepath)
-    elif ext == "docx":
-        return extract_text_from_docx(filepath)
-    elif ext == "txt":
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return f.read()
-    return f"(Unsupported file type: {ext})"
+    return extract_text(filepath)
 
 # 📌 Prompt Builder
 def generate_prompt(title, description):
@@ -131,30 +128,65 @@ You are an intelligent and helpful academic assistant. Your task is to read the
 Please format your response in markdown using clear sections.
 """
 
-# 📌 ChatGPT Handler
+# 📌 ChatGPT Handler (shared client, rate limits and retries live in ai_engine)
 def generate_assignment_response(prompt):
-    client = openai.OpenAI()
-    response = client.chat.completions.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": "You are an expert academic assistant."},
-            {"role": "user", "content": prompt}
-        ]
-    )
-    return response.choices[0].message.content
+    return generate_with_cache(prompt)[0]
+
+# ♻️ Same prompt + model -> reuse the cached answer.
+# Returns (content, from_cache, match); match is the similar_responses.Match
+# whose answer was adapted, None otherwise.
+# With `stream_to`, a fresh answer is streamed into that file as it arrives
+# (the backend tails it for /ai-response/stream).
+# With `similar=(filename, title, statement, text)`, a near-duplicate assignment's answer
+# is reused too (similar_responses.py), and fresh answers are remembered for that.
+def generate_with_cache(prompt, stream_to=None, similar=None):
+    model = get_engine().model
+    cache = get_response_cache()
+    cached = cache.get(prompt, model)
+    if cached is not None:
+        return cached, True, None
+
+    index = get_similarity_index() if similar else None
+    if index is not None and index.enabled:
+        filename, title, statement, text = similar
+        try:
+            match = index.find(filename, model, statement, text)
+        except Exception as e:
+            print(f"⚠️ Similar-response lookup failed: {e}")
+            match = None
+        if match:
+            index.record_reuse(filename, match.filename, match.similarity)
+            registry.inc("similar_reuses_total")
+            print(f"♻️ {match.similarity:.0%} similar to {match.filename}, reusing its answer")
+            return adapt_response(match.content, match.title, title, match.similarity), True, match
+    if stream_to:
+        with open(stream_to, 'w', encoding='utf-8') as partial:
+            def on_delta(text):
+                partial.write(text)
+                partial.flush()
+            content = generate_stream_sync(prompt, on_delta, model=model)
+    else:
+        content = generate_sync(prompt, model=model)
+    cache.put(prompt, model, content)
+    if index is not None and index.enabled:
+        try:
+            index.add(filename, model, title, statement, text, content)
+        except Exception as e:
+            print(f"⚠️ Similar-response index not updated: {e}")
+    return content, False, None
 
 
 # 📌 Main Processor
-def process_assignment_file(filepath, drive_service):
-    with open(filepath, 'r', encoding='utf-8') as f:
-        assignment = json.load(f)
+def process_assignment_file(filepath, drive_service, raise_errors=False):
+    assignment = get_storage().read_assignment(os.path.basename(filepath))
 
     title = assignment.get("title", "Untitled Assignment")
     description = assignment.get("description", "").strip()
+    statement = f"{title}\n{description}"  # the teacher's own words, before attachments are added
 
     # 📎 Always try extracting text from all attachments (if any)
     materials = assignment.get("materials", [])
-    attachment_texts = []
+    attachments = []  # (filename, local path or None, error)
 
     for material in materials:
         try:
@@ -165,37 +197,71 @@ def process_assignment_file(filepath, drive_service):
                 continue
 
             ext = filename.split('.')[-1].lower()
-            if ext not in ["pdf", "docx", "txt"]:
+            if ext not in SUPPORTED:
                 print(f"⚠️ Skipping unsupported file: {filename}")
                 continue
 
-            text = extract_text_from_file(filename, file_id, drive_service)
-            if text:
-                attachment_texts.append(f"📎 **{filename}**:\n{text.strip()}")
+            path, error = ensure_local_file(filename, file_id, drive_service)
+            attachments.append((filename, path, error))
         except Exception as e:
-            attachment_texts.append(f"(Error extracting from attachment: {e})")
-
-    if attachment_texts:
-        description += "\n\n---\n📂 **Attached File Content:**\n\n" + "\n\n---\n".join(attachment_texts)
+            attachments.append((None, None, f"(Error extracting from attachment: {e})"))
 
-    prompt = generate_prompt(title, description)
-    print("🎯 Prompt sent to OpenAI...")
+    # ⚡ Parse all attachments at once (cached, in parallel, with timeouts)
+    cache_files, errors = extract_to_cache([path for _, path, _ in attachments if path])
+    attachments = [(filename, cache_files.get(path), error or errors.get(path))
+                   for filename, path, error in attachments]
 
     try:
-        result = generate_assignment_response(prompt)
+        # 🧮 Fit description + attachments into the token budget (map-reduce if needed)
+        builder = PromptBuilder(generate_with_cache, load_prompt_budget(),
+                                concurrency=get_engine().settings["concurrency"])
+        description = builder.build_description(
+            title, description, attachments,
+            template_tokens=estimate_tokens(generate_prompt(title, "")))
+
+        prompt = generate_prompt(title, description)
+        print("🎯 Prompt sent to OpenAI...")
+
+        os.makedirs(RESPONSES_DIR, exist_ok=True)
         filename = os.path.basename(filepath).replace(".json", "_response.md")
         output_path = os.path.join(RESPONSES_DIR, filename)
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(result)
+        partial_path = output_path + PARTIAL_SUFFIX
+        try:
+            stream_to = partial_path if get_engine().settings["stream"] else None
+            assignment_file = os.path.basename(filepath)
+            result, from_cache, reused = generate_with_cache(
+                prompt, stream_to=stream_to, similar=(assignment_file, title, statement, f"{title}\n{description}"))
+
+            # Only metadata changed (due date, points...): keep the existing answer
+            unchanged = False
+            if from_cache and os.path.exists(output_path):
+                with open(output_path, 'r', encoding='utf-8') as f:
+                    unchanged = f.read() == result
+            if not unchanged:
+                # .md + pre-rendered .html, atomically: the backend may be serving them
+                write_response(output_path, result)
+                stem = os.path.basename(filepath).replace(".json", "")
+                get_storage().record_change("ai_response", assignment.get("id", stem),
+                                            file=assignment.get("ai_response_file"),
+                                            **({"reusedFrom": reused.filename, "similarity": round(reused.similarity, 3)}
+                                               if reused else {}))
+            # Also when unchanged: attachment text may have been extracted just now
+            index_quietly(os.path.basename(filepath), assignment)
+        finally:
+            # Removed only once the final file exists: tells streams we are done
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+
+        if unchanged:
+            print(f"♻️ Prompt unchanged, kept {output_path}\n")
+            return
         print(f"✅ Response saved to {output_path}\n")
 
         # ✅ Send Email Notification
         course_id = assignment.get("courseId", "Unknown")
         course_name = "Unknown"
         try:
-            with open("backend/courses.json", "r", encoding="utf-8") as f:
-                courses_map = json.load(f)
-            course_name = courses_map.get(course_id, "Unknown")
+            course_name = get_storage().courses().get(course_id, "Unknown")
         except Exception as e:
             print(f"⚠️ Could not load course name: {e}")
 
@@ -218,17 +284,45 @@ Your AI assistant has generated a solution. Please review it!"""
 
     except Exception as e:
         print(f"❌ Error from OpenAI: {e}\n")
+        if raise_errors:
+            raise
+
 
+# 📬 Job-queue handler (see job_queue.py); errors propagate so the job is retried
+_worker_state = threading.local()
 
-# 📌 Entry
+def handle_generate_job(payload):
+    if not hasattr(_worker_state, "drive_service"):
+        try:
+            _worker_state.drive_service = authenticate_google()
+        except Exception as e:
+            print(f"⚠️ Google Drive unavailable, using local attachments only: {e}")
+            _worker_state.drive_service = None
+    filepath = os.path.join(ASSIGNMENTS_DIR, payload["filename"])
+    process_assignment_file(filepath, _worker_state.drive_service, raise_errors=True)
+
+
+# 📌 Entry: backfill every assignment that has no response yet. Jobs run on
+# a worker pool; the shared engine keeps them inside the OpenAI rate limits.
 def main():
-    drive_service = authenticate_google()
-    assignment_files = [f for f in os.listdir(ASSIGNMENTS_DIR) if f.endswith(".json")]
+    from job_queue import get_queue, WorkerPool, GENERATE_RESPONSE
+
+    queue = get_queue()
+    assignment_files = get_storage().assignment_filenames()
+    queued = 0
     for file in assignment_files:
         response_file = file.replace(".json", "_response.md")
         response_path = os.path.join(RESPONSES_DIR, response_file)
         if not os.path.exists(response_path):
-            process_assignment_file(os.path.join(ASSIGNMENTS_DIR, file), drive_service)
+            if queue.enqueue(GENERATE_RESPONSE, {"filename": file}, key=file):
+                queued += 1
+    print(f"🧾 Queued {queued} assignment(s) for generation")
+
+    workers = get_engine().settings["concurrency"]
+    WorkerPool(queue, {GENERATE_RESPONSE: handle_generate_job}, workers=workers).run(until_empty=True)
+    flush_notifications()
+    write_snapshot("generator")
+    print(f"✅ Backfill finished. OpenAI usage: {get_engine().usage}")
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,101 @@
+# 🧰 Command-Line Entry Point
+#
+#   python cli.py sync [--full] [--daemon]   fetch from Classroom (once, or as a daemon)
+#   python cli.py generate <assignment>...   AI response for specific assignments
+#                                            (file name in Assignments/ or Classroom id)
+#   python cli.py backfill                   responses for every assignment missing one
+#   python cli.py serve [--host] [--port]    run the Flask backend
+#
+# Every command imports only the modules it needs, when it runs: `sync`
+# never loads openai, `serve` never loads the Google clients. Keep it that
+# way; `python benchmarks/run_benchmarks.py --only startup --check` fails
+# when a command starts pulling in heavy modules again.
+
+import os
+import sys
+import argparse
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def cmd_sync(args):
+    if args.daemon:
+        from sync_daemon import main as run_daemon
+        run_daemon()
+    else:
+        from fetch_assignments import main as run_sync
+        run_sync(full=args.full)
+
+
+def cmd_generate(args):
+    from storage import get_storage
+    import chatgpt_generate
+
+    storage = get_storage()
+    try:
+        drive_service = chatgpt_generate.authenticate_google()
+    except Exception as e:
+        print(f"⚠️ Google Drive unavailable, using local attachments only: {e}")
+        drive_service = None
+
+    failed = 0
+    for name in args.assignments:
+        filename = name if name.endswith(".json") else storage.get_assignment(name)[0]
+        if not filename or storage.read_assignment(filename) is None:
+            print(f"❌ Assignment not found: {name}")
+            failed += 1
+            continue
+        try:
+            chatgpt_generate.process_assignment_file(
+                os.path.join(chatgpt_generate.ASSIGNMENTS_DIR, filename), drive_service, raise_errors=True)
+        except Exception:
+            failed += 1
+    chatgpt_generate.flush_notifications()
+    return 1 if failed else 0
+
+
+def cmd_backfill(args):
+    from chatgpt_generate import main as run_backfill
+    run_backfill()
+
+
+def cmd_serve(args):
+    sys.path.insert(0, os.path.join(BASE_DIR, "backend"))
+    from app import app
+    # State writes are atomic and locked (storage.py), so requests may run in parallel
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="AI Classroom Assistant")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    sync = commands.add_parser("sync", help="fetch new and updated assignments from Classroom")
+    sync.add_argument("--full", action="store_true", help="re-list everything, ignoring watermarks")
+    sync.add_argument("--daemon", action="store_true", help="keep running with adaptive scheduling")
+    sync.set_defaults(handler=cmd_sync)
+
+    generate = commands.add_parser("generate", help="generate AI responses for specific assignments")
+    generate.add_argument("assignments", nargs="+", metavar="assignment",
+                          help="file name in Assignments/ or Classroom courseWork id")
+    generate.set_defaults(handler=cmd_generate)
+
+    backfill = commands.add_parser("backfill", help="generate every missing AI response")
+    backfill.set_defaults(handler=cmd_backfill)
+
+    serve = commands.add_parser("serve", help="run the Flask backend")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=5000)
+    serve.set_defaults(handler=cmd_serve)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    # Relative state paths (Assignments/, config.json, ...) resolve from the repo root
+    os.chdir(BASE_DIR)
+    return args.handler(args) or 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+# 📦 Course Export: One Streamed ZIP per Course
+#
+# Everything stored for a course, in the same layout as on disk:
+#   <Course>/Assignments/<name>.json
+#   <Course>/Assignment_Files/<file id>/<title>
+#   <Course>/Generated_Responses/<name>_response.md
+#
+# The archive is produced by a generator while it is being sent: zipfile
+# writes into a small buffer that is drained after every chunk, so there is
+# no temp file and memory stays constant however large the attachments are.
+# Without a seekable output zipfile writes each entry's sizes and CRC after
+# its data (a data descriptor), which every unzip tool understands.
+#
+# PDFs, images, Office files and archives are already compressed and are
+# stored as-is; deflating them again costs CPU for a ~1% gain.
+
+import os
+import json
+import posixpath
+import time
+import zipfile
+
+from drive_downloads import ASSIGNMENT_FILES_DIR, safe_name
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+READ_CHUNK = 1024 * 1024
+COMPRESS_LEVEL = 6
+ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)  # earliest date a ZIP entry can carry
+STORED_EXTENSIONS = {
+    ".pdf", ".docx", ".pptx", ".xlsx", ".odt", ".odp", ".ods", ".epub",
+    ".zip", ".gz", ".tgz", ".bz2", ".xz", ".7z", ".rar",
+    ".png", ".jpg", ".jpeg", ".gif", ".webp", ".heic",
+    ".mp3", ".mp4", ".m4a", ".mov", ".avi", ".mkv", ".webm",
+}
+
+
+def compress_type(name):
+    if os.path.splitext(name)[1].lower() in STORED_EXTENSIONS:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+# Entry name inside the course folder, or None for anything that would
+# escape it when extracted ("..", absolute paths, drive letters)
+def safe_arcname(name):
+    name = posixpath.normpath(name.replace("\\", "/"))
+    if name.startswith(("/", "../")) or name in (".", "..") or ":" in name.split("/")[0]:
+        return None
+    return name
+
+
+def zip_date(timestamp):
+    return max(time.localtime(timestamp)[:6], ZIP_EPOCH)
+
+
+# Write-only, non-seekable sink: zipfile appends, the generator drains
+class ChunkBuffer:
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        if data:
+            self._chunks.append(bytes(data))
+            self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    # Whatever was written since the last call (nothing if empty)
+    def drain(self):
+        if self._chunks:
+            data = b"".join(self._chunks)
+            self._chunks = []
+            yield data
+
+
+# 📄 (archive name, local path) of every file belonging to one assignment
+def assignment_files(filename, assignment, base_dir=BASE_DIR):
+    files = []
+    seen = set()
+
+    def add(arcname, path):
+        arcname = safe_arcname(arcname)
+        if arcname is None:
+            print(f"⚠️ Skipping {path} in export: unsafe archive name")
+            return
+        path = os.path.abspath(path)
+        if path not in seen and os.path.isfile(path):
+            seen.add(path)
+            files.append((arcname, path))
+
+    for material in assignment.get("materials", []):
+        drive_file = material.get("driveFile", {}).get("driveFile", {})
+        if drive_file.get("id"):
+            name = safe_name(drive_file.get("title", "Attachment"))
+            add(f"{ASSIGNMENT_FILES_DIR}/{drive_file['id']}/{name}",
+                os.path.join(base_dir, ASSIGNMENT_FILES_DIR, drive_file["id"], name))
+
+    # Older assignments point at a single flat file
+    legacy = assignment.get("local_attachment_path", "")
+    if legacy:
+        add(legacy, os.path.join(base_dir, legacy))
+
+    response = assignment.get("ai_response_file") or \
+        f"Generated_Responses/{filename.replace('.json', '_response.md')}"
+    add(response, os.path.join(base_dir, response))
+    return files
+
+
+# ✅ Generator of ZIP bytes for every assignment of `course_id`
+def export_course(storage, course_id, course_name=None, base_dir=BASE_DIR):
+    assignments = storage.assignments_by_course(course_id)
+    root = safe_name(course_name or course_id)
+    sink = ChunkBuffer()
+    with zipfile.ZipFile(sink, "w", compresslevel=COMPRESS_LEVEL) as archive:
+        for filename, assignment in sorted(assignments):
+            archive.writestr(f"{root}/Assignments/{safe_name(filename)}",
+                             json.dumps(assignment, indent=2), zipfile.ZIP_DEFLATED)
+            yield from sink.drain()
+
+            for arcname, path in assignment_files(filename, assignment, base_dir):
+                try:
+                    source = open(path, "rb")
+                except OSError as e:
+                    print(f"⚠️ Skipping {path} in export: {e}")
+                    continue
+                with source:
+                    st = os.fstat(source.fileno())
+                    info = zipfile.ZipInfo(f"{root}/{arcname}", zip_date(st.st_mtime))
+                    info.compress_type = compress_type(arcname)
+                    info.file_size = st.st_size  # lets zipfile pick ZIP64 for >2 GiB up front
+                    with archive.open(info, "w") as entry:
+                        for chunk in iter(lambda: source.read(READ_CHUNK), b""):
+                            entry.write(chunk)
+                            yield from sink.drain()
+                yield from sink.drain()
+    # Central directory
+    yield from sink.drain()
@@ -0,0 +1,228 @@
+# ⬇️ Drive Download Manager
+#
+# Attachments are stored by Drive file id:
+#   Assignment_Files/<file id>/<title>       the file
+#   Assignment_Files/<file id>/.meta.json    md5Checksum / modifiedTime / size
+# so two attachments with the same title no longer overwrite each other.
+#
+# Before downloading, the file's Drive metadata is compared with the local
+# copy and unchanged files are skipped. Downloads use ranged requests in
+# large chunks, and are verified against md5Checksum. A partial download
+# (<title>.part) resumes where it stopped, as long as the remote file has
+# not changed. Several files download in parallel, and the same file id
+# is never downloaded twice at once.
+
+import os
+import re
+import json
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+
+from classroom_sync import get_rate_limiter, build
+from metrics import timer
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ASSIGNMENT_FILES_DIR = "Assignment_Files"
+STORE_DIR = os.path.join(BASE_DIR, ASSIGNMENT_FILES_DIR)
+
+# Above googleapiclient's 100 MB default (MediaIoBaseDownload), so no file takes
+# more requests than before. A chunk is held in memory while it is written.
+CHUNK_SIZE = 128 * 1024 * 1024
+MAX_WORKERS = 4
+METADATA_FIELDS = "id,name,md5Checksum,modifiedTime,size"
+
+
+def safe_name(name):
+    return re.sub(r'[^\w\-_\. ()]', '_', name) or "Attachment"
+
+
+def md5_of(path):
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_meta(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def write_meta(path, meta):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, path)
+
+
+def version_fields(remote):
+    return {k: remote.get(k) for k in ("md5Checksum", "modifiedTime", "size")}
+
+
+def same_version(meta, remote):
+    if not meta:
+        return False
+    if remote.get("md5Checksum"):
+        return meta.get("md5Checksum") == remote["md5Checksum"]
+    return (meta.get("modifiedTime") == remote.get("modifiedTime")
+            and str(meta.get("size")) == str(remote.get("size")))
+
+
+class DriveDownloadManager:
+    # Pass `credentials` to give each worker thread its own service (httplib2
+    # is not thread-safe); with only `drive_service`, requests are serialized.
+    def __init__(self, drive_service=None, credentials=None, store_dir=None,
+                 workers=MAX_WORKERS, chunk_size=CHUNK_SIZE):
+        self.drive_service = drive_service
+        self.credentials = credentials
+        self.store_dir = store_dir or STORE_DIR
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.limiter = get_rate_limiter("drive")
+        self._local = threading.local()
+        self._service_lock = threading.Lock() if credentials is None else None
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _service(self):
+        if self.credentials is None:
+            return self.drive_service
+        service = getattr(self._local, "service", None)
+        if service is None:
+            service = build('drive', 'v3', credentials=self.credentials, cache_discovery=False)
+            self._local.service = service
+        return service
+
+    # 📍 Paths (relative form is what gets stored in assignment JSON)
+    def relative_path(self, file_id, title):
+        return os.path.join(ASSIGNMENT_FILES_DIR, file_id, safe_name(title))
+
+    def local_path(self, file_id, title):
+        return os.path.join(self.store_dir, file_id, safe_name(title))
+
+    def _meta_path(self, file_id):
+        return os.path.join(self.store_dir, file_id, ".meta.json")
+
+    # ✅ Download one file unless the local copy is current -> absolute path
+    def download(self, file_id, title):
+        with self._inflight_lock:
+            future = self._inflight.get(file_id)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[file_id] = future
+        if not owner:
+            return future.result()
+
+        try:
+            with timer("drive_download"):
+                if self._service_lock is not None:
+                    with self._service_lock:
+                        path = self._download(file_id, title)
+                else:
+                    path = self._download(file_id, title)
+            future.set_result(path)
+            return path
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(file_id, None)
+
+    # ⚡ Many files in parallel -> {file_id: path or Exception}. The pool lives
+    # as long as the manager, so per-thread services are built only once.
+    def download_many(self, files):
+        unique = dict(files)  # file_id -> title
+        results = {}
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=max(1, self.workers), thread_name_prefix="drive")
+            pool = self._pool
+        futures = {file_id: pool.submit(self.download, file_id, title)
+                   for file_id, title in unique.items()}
+        for file_id, future in futures.items():
+            try:
+                results[file_id] = future.result()
+            except Exception as e:
+                results[file_id] = e
+        return results
+
+    def close(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+
+    def _download(self, file_id, title):
+        service = self._service()
+        folder = os.path.join(self.store_dir, file_id)
+        os.makedirs(folder, exist_ok=True)
+        target = self.local_path(file_id, title)
+        partial = f"{target}.part"
+        meta_path = self._meta_path(file_id)
+        meta = read_meta(meta_path)
+
+        self.limiter.acquire()
+        remote = service.files().get(fileId=file_id, fields=METADATA_FIELDS).execute()
+
+        if os.path.exists(target) and same_version(meta.get("complete"), remote):
+            return target
+
+        # ↩️ Resume only if the partial file belongs to the same remote version
+        offset = 0
+        if os.path.exists(partial) and same_version(meta.get("partial"), remote):
+            offset = os.path.getsize(partial)
+        meta["partial"] = version_fields(remote)
+        write_meta(meta_path, meta)
+
+        request = service.files().get_media(fileId=file_id)
+        total = int(remote["size"]) if remote.get("size") else None
+        mode = 'ab' if offset else 'wb'
+        if offset:
+            print(f"↩️ Resuming {title} at {offset} bytes")
+
+        with open(partial, mode) as fh:
+            while total is None or offset < total:
+                end = offset + self.chunk_size - 1
+                self.limiter.acquire()
+                resp, content = request.http.request(
+                    request.uri, headers={"range": f"bytes={offset}-{end}"})
+                if resp.status not in (200, 206):
+                    raise RuntimeError(f"Drive download of {title} failed with HTTP {resp.status}")
+                if resp.status == 200 and offset:
+                    # Range ignored: the server sent the whole file again
+                    fh.truncate(0)
+                    offset = 0
+                fh.write(content)
+                offset += len(content)
+                if total is None:
+                    content_range = resp.get("content-range", "")
+                    if "/" in content_range and content_range.split("/")[1] != "*":
+                        total = int(content_range.split("/")[1])
+                    else:
+                        total = offset
+                if total:
+                    print(f"⬇️ Downloading {title}... {int(offset * 100 / total)}%")
+                if resp.status == 200 or not content:
+                    break
+
+        # 🔐 Verify before the file replaces the previous version
+        if remote.get("md5Checksum") and md5_of(partial) != remote["md5Checksum"]:
+            os.remove(partial)
+            meta.pop("partial", None)
+            write_meta(meta_path, meta)
+            raise RuntimeError(f"Checksum mismatch for {title} ({file_id})")
+
+        os.replace(partial, target)
+        meta.pop("partial", None)
+        meta["complete"] = dict(version_fields(remote), title=title)
+        write_meta(meta_path, meta)
+        return target
@@ -1,76 +1,179 @@
 import smtplib
-import json
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime
-import os
-
-NOTIFICATION_LOG_FILE = "notifications.json"
-
-def log_notification(subject, course, channel="email"):
-    new_entry = {
-        "id": str(int(datetime.now().timestamp())),
-        "assignment": subject,
-        "course": course,
-        "channel": channel,
-        "sentTime": datetime.now().isoformat()
-    }
-
-    try:
-        with open(NOTIFICATION_LOG_FILE, 'r') as f:
-            data = json.load(f)
-    except FileNotFoundError:
-        data = []
-
-    data.append(new_entry)
-
-    with open(NOTIFICATION_LOG_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
-
+import queue
+import threading
+import time
+from storage import get_storage
+from metrics import timer
+
+# ✉️ SMTP settings (config.json -> "smtp" overrides any of these)
+SENDER_EMAIL = "sender_email@example.com"
+APP_PASSWORD = "Your gmail app password"
+SMTP_DEFAULTS = {
+    "host": "smtp.gmail.com",
+    "port": 587,
+    "starttls": True,
+    "username": SENDER_EMAIL,
+    "password": APP_PASSWORD,
+    "sender": SENDER_EMAIL,
+    "timeout": 30,
+}
+MAX_SEND_ATTEMPTS = 4
+RETRY_BASE_SECONDS = 2       # 2s, 4s, 8s
+IDLE_DISCONNECT_SECONDS = 60  # drop the connection before the server does
+ERROR_LOG = "email_errors.log"
+
+
+def log_email_error(error_message):
+    print(error_message)
+    with open(ERROR_LOG, "a", encoding="utf-8") as log_file:
+        log_file.write(f"{datetime.now()} - {error_message}\n")
+
+
+# 📮 Background sender: one reusable, authenticated SMTP connection, retry
+# with backoff, and an optional digest that merges a whole sync into one email
+class NotificationDispatcher:
+    def __init__(self, settings=None):
+        self.settings = dict(SMTP_DEFAULTS, **(settings or {}))
+        self._queue = queue.Queue()
+        self._server = None
+        self._last_used = 0.0
+        self._digest = None          # list of pending messages while digest mode is on
+        self._digest_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="email-sender", daemon=True)
+        self._thread.start()
+
+    # 📨 Non-blocking: queue one message (or hold it for the digest)
+    def submit(self, subject, body, to_email, course_info):
+        message = {"subject": subject, "body": body, "to": to_email, "course": course_info}
+        with self._digest_lock:
+            if self._digest is not None:
+                self._digest.append(message)
+                return
+        self._queue.put(("single", [message]))
+
+    def begin_digest(self):
+        with self._digest_lock:
+            if self._digest is None:
+                self._digest = []
+
+    # Send everything collected since begin_digest() as one email per recipient
+    def end_digest(self):
+        with self._digest_lock:
+            messages, self._digest = self._digest or [], None
+        by_recipient = {}
+        for message in messages:
+            by_recipient.setdefault(message["to"], []).append(message)
+        for batch in by_recipient.values():
+            self._queue.put(("single" if len(batch) == 1 else "digest", batch))
+
+    # Block until every queued email has been handled (call before exiting)
+    def flush(self):
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            try:
+                kind, messages = self._queue.get(timeout=IDLE_DISCONNECT_SECONDS)
+            except queue.Empty:
+                self._disconnect()
+                continue
+            try:
+                self._deliver(kind, messages)
+            except Exception as e:
+                # One bad message must not stop the sender thread
+                log_email_error(f"❌ Failed to handle email notification: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _deliver(self, kind, messages):
+        if kind == "digest":
+            subject = f"📢 {len(messages)} New Assignments"
+            body = "\n\n" + ("-" * 40 + "\n\n").join(
+                f"{m['subject']}\n{m['body']}\n" for m in messages)
+        else:
+            subject, body = messages[0]["subject"], messages[0]["body"]
+
+        msg = MIMEMultipart()
+        msg['From'] = self.settings["sender"]
+        msg['To'] = messages[0]["to"]
+        msg['Subject'] = subject
+        msg.attach(MIMEText(body, 'plain'))
+
+        for attempt in range(1, MAX_SEND_ATTEMPTS + 1):
+            try:
+                with timer("smtp"):
+                    self._connection().send_message(msg)
+                self._last_used = time.monotonic()
+                break
+            except Exception as e:
+                # Broken or timed-out connection: reconnect on the next attempt
+                self._disconnect()
+                if attempt == MAX_SEND_ATTEMPTS:
+                    log_email_error(f"❌ Failed to send email: {e}")
+                    return
+                time.sleep(RETRY_BASE_SECONDS * (2 ** (attempt - 1)))
 
-def send_email(subject, body, to_email, course_info):
-    sender_email = "sender_email@example.com"
-    app_password = "Your gmail app password"
-
-    msg = MIMEMultipart()
-    msg['From'] = sender_email
-    msg['To'] = to_email
-    msg['Subject'] = subject
-    msg.attach(MIMEText(body, 'plain'))
-
-    try:
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()
-        server.login(sender_email, app_password)
-        server.send_message(msg)
-        server.quit()
         print("✅ Email sent successfully!")
 
-        # --- UPDATE backend/notifications.json ---
-        notification_data = {
-            "id": str(int(datetime.now().timestamp())),
-            "assignment": subject,
-            "course": course_info.get("name", "Unknown"),
-            "channel": "email",
-            "sentTime": datetime.now().isoformat()
-        }
-
-
-        notifications_path = os.path.join("backend", "notifications.json")
-
-        if os.path.exists(notifications_path):
-            with open(notifications_path, "r") as f:
-                notifications = json.load(f)
-        else:
-            notifications = []
-
-        notifications.append(notification_data)
+        # --- Record in the notification log (one entry per assignment) ---
+        for message in messages:
+            # id and seq are assigned by the notification log
+            notification_data = {
+                "assignment": message["subject"],
+                "course": message["course"].get("name", "Unknown"),
+                "channel": "email",
+                "sentTime": datetime.now().isoformat()
+            }
+            get_storage().add_notification(notification_data)
+
+    def _connection(self):
+        if self._server is not None and time.monotonic() - self._last_used > IDLE_DISCONNECT_SECONDS:
+            self._disconnect()
+        if self._server is None:
+            server = smtplib.SMTP(self.settings["host"], self.settings["port"],
+                                  timeout=self.settings["timeout"])
+            if self.settings["starttls"]:
+                server.starttls()
+            if self.settings["username"]:
+                server.login(self.settings["username"], self.settings["password"])
+            self._server = server
+            self._last_used = time.monotonic()
+        return self._server
+
+    def _disconnect(self):
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except Exception:
+            pass
+        self._server = None
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = NotificationDispatcher(get_storage().get_setting("smtp", {}) or {})
+        return _dispatcher
+
+
+# Same signature as before; the email now goes out from the background sender
+def send_email(subject, body, to_email, course_info):
+    get_dispatcher().submit(subject, body, to_email, course_info)
 
-        with open(notifications_path, "w") as f:
-            json.dump(notifications, f, indent=2)
 
-    except Exception as e:
-        error_message = f"❌ Failed to send email: {e}"
-        print(error_message)
-        with open("email_errors.log", "a", encoding="utf-8") as log_file:
-            log_file.write(f"{datetime.now()} - {error_message}\n")
\ No newline at end of file
+# Wait for queued emails before a short-lived script exits
+def flush_notifications():
+    with _dispatcher_lock:
+        dispatcher = _dispatcher
+    if dispatcher is not None:
+        dispatcher.end_digest()
+        dispatcher.flush()
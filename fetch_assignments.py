@@ -1,27 +1,20 @@
 # 🚀 Auto Fetch & Process Assignments 
 
 import os
-import json
+import sys
 import re
-import io
-from datetime import datetime
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
-
-# ✅ Import response processor
-from chatgpt_generate import process_assignment_file
-
-COURSES_FILE = "courses.json"
-
-# 1. Load existing courses from file
-if os.path.exists(COURSES_FILE):
-    with open(COURSES_FILE, "r") as f:
-        courses_data = json.load(f)
-else:
-    courses_data = {}
+import time
+from datetime import datetime, timedelta, timezone
+
+# ✅ Generation happens in job_queue workers, not inline
+from job_queue import get_queue, WorkerPool, default_handlers, GENERATE_RESPONSE, DEFAULT_WORKERS
+from storage import get_storage, write_atomic
+from email_notifier import get_dispatcher, flush_notifications
+from classroom_sync import (ClassroomSync, configure_rate_limits, MAX_WORKERS, BATCH_SIZE,
+                            COURSE_FIELDS, COURSEWORK_FIELDS)
+from drive_downloads import DriveDownloadManager, MAX_WORKERS as DRIVE_WORKERS
+from metrics import timed, stage_summary, write_snapshot
+from search_index import index_quietly
 
 # 📁 Paths
 ASSIGNMENTS_DIR = "Assignments"
@@ -29,10 +22,16 @@ FETCHED_IDS_PATH = "fetched_ids.json"
 TOKEN_PATH = "token.json"
 CREDENTIALS_PATH = "credentials.json"
 ASSIGNMENT_FILES_DIR = "Assignment_Files"
+LAST_RUN_LOG = "last_run_log.txt"
 
 # 📅 Only fetch assignments created ON or AFTER this date
+# (override in config.json: "cutoffDate": "YYYY-MM-DD")
 CUTOFF_DATE = datetime(2025, 7, 13) # set date which u want
 
+# 🧹 fetched_ids.json entries whose updateTime is older than this are dropped
+# (override in config.json: "fetchedIdsRetentionDays")
+FETCHED_IDS_RETENTION_DAYS = 180
+
 # 🔐 Required Scopes
 SCOPES = [
     'https://www.googleapis.com/auth/classroom.courses.readonly',
@@ -42,7 +41,13 @@ SCOPES = [
 ]
 
 # ✅ Authenticate with Google APIs
+@timed("authenticate")
 def authenticate():
+    # Imported here: google-auth is only needed once per run
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from google.auth.transport.requests import Request
+
     creds = None
     if os.path.exists(TOKEN_PATH):
         creds = Credentials.from_authorized_user_file(TOKEN_PATH, SCOPES)
@@ -58,40 +63,20 @@ def authenticate():
 
 # ✅ Load fetched assignment IDs
 def load_fetched_ids():
-    if not os.path.exists(FETCHED_IDS_PATH):
-        return {}
-    try:
-        with open(FETCHED_IDS_PATH, 'r') as f:
-            return json.load(f)
-    except json.JSONDecodeError:
-        print("⚠️ fetched_ids.json is invalid or empty. Resetting...")
-        return {}
+    return get_storage().fetched_ids()
 
 # ✅ Sanitize filenames
 def sanitize_filename(name):
     return re.sub(r'[^\w\-_\. ]', '_', name)
 
-# ✅ Download attachment from Google Drive
-def download_file_from_drive(service, file_id, file_name):
-    if not os.path.exists(ASSIGNMENT_FILES_DIR):
-        os.makedirs(ASSIGNMENT_FILES_DIR)
-    request = service.files().get_media(fileId=file_id)
-    filepath = os.path.join(ASSIGNMENT_FILES_DIR, file_name)
-    fh = io.FileIO(filepath, 'wb')
-    downloader = MediaIoBaseDownload(fh, request)
-    done = False
-    while not done:
-        status, done = downloader.next_chunk()
-        print(f"⬇️ Downloading {file_name}... {int(status.progress() * 100)}%")
-
-# ✅ Save assignment and download attached file (if available)
-def save_assignment(course_name, assignment, drive_service, course_id):
+# ✅ Save assignment and download attached files (if available). `downloads`
+# is a DriveDownloadManager: unchanged files are skipped, the rest fetched in parallel
+def save_assignment(course_name, assignment, downloads, course_id):
     
     sanitized_course = sanitize_filename(course_name)
     sanitized_title = sanitize_filename(assignment['title'])
 
     filename = f"{sanitized_course}_{sanitized_title}.json"
-    filepath = os.path.join(ASSIGNMENTS_DIR, filename)
 
     # Add AI-generated response path
     assignment["ai_response_file"] = f"Generated_Responses/{sanitized_course}_{sanitized_title}_response.md"
@@ -101,33 +86,154 @@ def save_assignment(course_name, assignment, drive_service, course_id):
    
 
     materials = assignment.get("materials", [])
+    files = []
     for material in materials:
         drive_info = material.get("driveFile", {}).get("driveFile", {}) 
         file_id = drive_info.get("id")
         file_title = drive_info.get("title", "Attachment")
-        if file_id and drive_service:
-            download_file_from_drive(drive_service, file_id, file_title)
-            assignment['local_attachment_path'] = os.path.join(ASSIGNMENT_FILES_DIR, file_title)
+        if file_id:
+            files.append((file_id, file_title))
+
+    if files and downloads:
+        results = downloads.download_many(files)
+        for file_id, file_title in files:
+            if isinstance(results.get(file_id), Exception):
+                print(f"  ⚠️ Could not download {file_title}: {results[file_id]}")
+                continue
+            assignment['local_attachment_path'] = downloads.relative_path(file_id, file_title)
+
+    get_storage().write_assignment(filename, assignment)
+    index_quietly(filename, assignment)
+
+    # 🧠 Queue AI response generation (one pending job per assignment file)
+    get_queue().enqueue(GENERATE_RESPONSE, {"filename": filename}, key=filename)
+
+# 📝 One line per run: when, how long, what it did and where the time went
+def write_run_log(started_at, stats, stages=None):
+    summary = ", ".join(f"{key}={value}" for key, value in stats.items())
+    line = f"Ran at {started_at.isoformat()} | {summary}"
+    if stages:
+        line += " | stages: " + ", ".join(
+            f"{stage}={s['seconds']}s/{s['calls']}" + (f" ({s['errors']} errors)" if s["errors"] else "")
+            for stage, s in stages.items())
+    write_atomic(LAST_RUN_LOG, line + "\n")
+
+
+def new_stats():
+    return {"courses": 0, "listed": 0, "saved": 0, "unchanged": 0, "beforeCutoff": 0,
+            "failed": 0, "courseErrors": 0, "pruned": 0}
+
+
+def cutoff_date_setting():
+    cutoff_setting = get_storage().get_setting("cutoffDate")
+    return datetime.strptime(cutoff_setting, "%Y-%m-%d") if cutoff_setting else CUTOFF_DATE
+
+
+# 🔌 Authenticated, rate-limited Classroom + Drive clients (reused by the daemon)
+def connect(creds):
+    storage = get_storage()
+    configure_rate_limits(storage.get_setting("rateLimits"))
+    sync = ClassroomSync(creds,
+                         max_workers=storage.get_setting("syncWorkers", MAX_WORKERS),
+                         batch_size=storage.get_setting("syncBatchSize", BATCH_SIZE))
+    downloads = DriveDownloadManager(credentials=creds,
+                                     workers=storage.get_setting("downloadWorkers", DRIVE_WORKERS))
+    return sync, downloads
+
+
+# 📘 Save the new/updated courseWork of one course -> its new watermark
+# (or None). Raises if the course could not be listed.
+def sync_course(course, assignments, watermark, fetched_records, cutoff_date, downloads, stats):
+    storage = get_storage()
+    course_id = course['id']
+    course_name = course['name']
+    stats["listed"] += len(assignments)
+    print(f"  🔍 Found {len(assignments)} new or updated assignments in course '{course_name}'")
+
+    seen_times = [watermark or ""]
+    oldest_failure = None
+    saved = {}  # written to fetched_ids in one go after the loop
+    for assignment in assignments:
+        assignment_id = assignment['id']
+        last_updated = assignment.get('updateTime')
+        previous_update = fetched_records.get(assignment_id)
+        if last_updated:
+            seen_times.append(last_updated)
+
+        # Skip if old
+        created_at_str = assignment.get("creationTime", "")[:19]
+        if created_at_str:
+            try:
+                created_at = datetime.strptime(created_at_str, "%Y-%m-%dT%H:%M:%S")
+                if created_at < cutoff_date:
+                    stats["beforeCutoff"] += 1
+                    continue
+            except Exception as e:
+                print(f"⚠️ Invalid creationTime: {e}")
+                continue
 
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(assignment, f, indent=2)
+        if previous_update == last_updated:
+            stats["unchanged"] += 1
+            continue
+        try:
+            save_assignment(course_name, assignment, downloads, course_id)
+            print(f"  ➕ Saved: {assignment['title']}")
+            saved[assignment_id] = last_updated
+            fetched_records[assignment_id] = last_updated
+            stats["saved"] += 1
+        except Exception as e:
+            if last_updated and (oldest_failure is None or last_updated < oldest_failure):
+                oldest_failure = last_updated
+            stats["failed"] += 1
+            print(f"  ❌ Failed to save: {assignment['title']} | Error: {e}")
+    storage.mark_fetched_many(saved)
+
+    # Advance the mark only up to the oldest failed item, so failed
+    # items are listed again next run
+    if oldest_failure is not None:
+        seen_times = [t for t in seen_times if t < oldest_failure]
+    return max(seen_times) or None
+
+
+# 🧹 Forget ids older than the retention window (they are below every
+# watermark, so they are never listed again)
+def prune_fetched_ids():
+    storage = get_storage()
+    retention_days = storage.get_setting("fetchedIdsRetentionDays", FETCHED_IDS_RETENTION_DAYS)
+    before = (datetime.now(timezone.utc) - timedelta(days=retention_days)).strftime("%Y-%m-%dT%H:%M:%S")
+    return storage.prune_fetched(before)
 
-    # 🧠 Generate AI response immediately
-    process_assignment_file(filepath, drive_service)
 
-# ✅ Main function
-def main():
+# ✅ Main function. Incremental by default: each course only lists courseWork
+# updated since its stored watermark. `full=True` (or --full) re-lists all.
+def main(full=False):
+    started_at = datetime.now()
+    started = time.monotonic()
+    stats = new_stats()
+
     creds = authenticate()
-    classroom_service = build('classroom', 'v1', credentials=creds)
-    drive_service = build('drive', 'v3', credentials=creds)
+    sync, downloads = connect(creds)
 
     if not os.path.exists(ASSIGNMENTS_DIR):
         os.makedirs(ASSIGNMENTS_DIR)
 
+    storage = get_storage()
+    courses_data = dict(storage.courses())
+
+    # 📮 Digest mode: every assignment of this run goes out in one email
+    if storage.get_setting("emailDigest", False):
+        get_dispatcher().begin_digest()
+
+    cutoff_date = cutoff_date_setting()
     fetched_records = load_fetched_ids()
-    updated_records = fetched_records.copy()
+    watermarks = {} if full else storage.sync_cursor()
+    new_watermarks = {}
 
-    courses = classroom_service.courses().list().execute().get('courses', [])
+    # ⚡ Active courses only; courseWork newer than each watermark, concurrently
+    courses = sync.list_courses(courseStates=["ACTIVE"], fields=COURSE_FIELDS)
+    coursework, errors = sync.list_coursework([course['id'] for course in courses],
+                                              since=watermarks, fields=COURSEWORK_FIELDS)
+    stats["courses"] = len(courses)
 
     for course in courses:
         course_id = course['id']
@@ -137,49 +243,42 @@ def main():
         if course_id not in courses_data:
             courses_data[course_id] = course_name
 
-
         try:
-            assignments = classroom_service.courses().courseWork().list(courseId=course_id).execute().get('courseWork', [])
-            print(f"  🔍 Found {len(assignments)} assignments in course '{course_name}'")
-            
-            for assignment in assignments:
-                assignment_id = assignment['id']
-                last_updated = assignment.get('updateTime')
-                previous_update = fetched_records.get(assignment_id)
-
-                # Skip if old
-                created_at_str = assignment.get("creationTime", "")[:19]
-                if created_at_str:
-                    try:
-                        created_at = datetime.strptime(created_at_str, "%Y-%m-%dT%H:%M:%S")
-                        if created_at < CUTOFF_DATE:
-                            continue
-                    except Exception as e:
-                        print(f"⚠️ Invalid creationTime: {e}")
-                        continue
-
-                if previous_update != last_updated:
-                    try:
-                        save_assignment(course_name, assignment, drive_service, course_id)
-                        print(f"  ➕ Saved: {assignment['title']}")
-                        updated_records[assignment_id] = last_updated
-                    except Exception as e:
-                        print(f"  ❌ Failed to save: {assignment['title']} | Error: {e}")
-
+            if course_id in errors:
+                raise errors[course_id]
+            watermark = sync_course(course, coursework.get(course_id, []), watermarks.get(course_id),
+                                    fetched_records, cutoff_date, downloads, stats)
+            if watermark:
+                new_watermarks[course_id] = watermark
         except Exception as e:
+            stats["courseErrors"] += 1
             print(f"⚠️ Error fetching from {course_name}: {e}")
 
-    
-    # Save updated assignment ID list
-    with open(FETCHED_IDS_PATH, 'w') as f:
-        json.dump(updated_records, f, indent=2)
-        print(f"📝 Saving {len(updated_records)} fetched assignment IDs to fetched_ids.json")
-        
-    # 💾 Save updated courses.json
-    with open("backend/courses.json", "w", encoding="utf-8") as f:
-        json.dump(courses_data, f, indent=2)
-        print(f"✅ Updated backend/courses.json with {len(courses_data)} courses")
+    storage.save_sync_cursor(new_watermarks)
+    sync.close()
+    downloads.close()
+
+    stats["pruned"] = prune_fetched_ids()
+    print(f"📝 Saved {stats['saved']} assignments, pruned {stats['pruned']} old fetched IDs")
+
+    # 💾 Save updated course list
+    storage.save_courses(courses_data)
+    print(f"✅ Updated course list with {len(courses_data)} courses")
+
+    stats["syncSeconds"] = round(time.monotonic() - started, 2)
+
+    # 🧠 Drain queued generation jobs (set "drainQueueAfterSync": false to leave
+    # them to a separate `python job_queue.py work` process)
+    if storage.get_setting("drainQueueAfterSync", True):
+        workers = storage.get_setting("generationWorkers", DEFAULT_WORKERS)
+        WorkerPool(get_queue(), default_handlers(), workers=workers).run(until_empty=True)
+
+    flush_notifications()
+
+    stats["durationSeconds"] = round(time.monotonic() - started, 2)
+    write_run_log(started_at, stats, stage_summary())
+    write_snapshot("fetcher")  # served by the backend at /api/metrics
     
 
 if __name__ == '__main__':
-    main()
+    main(full="--full" in sys.argv)
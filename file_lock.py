@@ -0,0 +1,80 @@
+# 🔒 Cross-Process File Lock
+#
+# Exclusive advisory lock on a side file ("<path>.lock"), usable across
+# processes (fetcher, workers, backend) on Linux/macOS (fcntl) and Windows
+# (msvcrt). Also serializes threads of the same process.
+
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+def _thread_lock(path):
+    with _thread_locks_guard:
+        if path not in _thread_locks:
+            _thread_locks[path] = threading.RLock()
+        return _thread_locks[path]
+
+
+class FileLock:
+    def __init__(self, path, timeout=30.0):
+        self.path = os.path.abspath(path)
+        self.timeout = timeout
+        self._fh = None
+        self._depth = 0
+        self._rlock = _thread_lock(self.path)
+
+    def acquire(self):
+        self._rlock.acquire()
+        if self._depth:
+            self._depth += 1
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fh = open(self.path, 'a+')
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                if fcntl:
+                    fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    fh.seek(0)
+                    msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    fh.close()
+                    self._rlock.release()
+                    raise TimeoutError(f"Timed out waiting for lock {self.path}")
+                time.sleep(0.01)
+        self._fh = fh
+        self._depth = 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            try:
+                if fcntl:
+                    fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+                else:
+                    self._fh.seek(0)
+                    msvcrt.locking(self._fh.fileno(), msvcrt.LK_UNLCK, 1)
+            finally:
+                self._fh.close()
+                self._fh = None
+        self._rlock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
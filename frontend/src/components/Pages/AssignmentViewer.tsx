@@ -1,7 +1,7 @@
 import React from 'react';
 import { ArrowLeft, Download, FileText, Calendar, Clock, BookOpen } from 'lucide-react';
 import { Assignment } from '../../types';
-import { useEffect, useState } from "react";
+import { useEffect, useRef, useState } from "react";
 
 interface AssignmentViewerProps {
   assignment: Assignment | null;
@@ -13,27 +13,54 @@ export const AssignmentViewer: React.FC<AssignmentViewerProps> = ({ assignment,
 
   const [aiContent, setAiContent] = useState<string | null>(null);
 
+  // Pre-rendered by the backend when the answer was generated
+  const [aiHtml, setAiHtml] = useState<string | null>(null);
+
   const fetchAiResponse = async (assignmentId: string) => {
     try {
       const encodedId = encodeURIComponent(assignmentId); // handles spaces, etc.
-      const response = await fetch(`http://localhost:5000/api/assignments/${encodedId}/ai-response`);
+      const response = await fetch(`http://localhost:5000/api/assignments/${encodedId}/ai-response?format=html`);
 
       if (!response.ok) {
         console.error(`Server responded with status ${response.status}`);
         return;
       }
 
-      const data = await response.json();
-      if (data.content) {
-        setAiContent(data.content);
-      } else {
-        console.error("AI response not found in content.");
-      }
+      setAiHtml(await response.text());
     } catch (error) {
       console.error("Error fetching AI response:", error);
     }
   };
 
+  // 🌊 Show the answer live while it is generated, then the final file
+  const streamRef = useRef<EventSource | null>(null);
+
+  const streamAiResponse = (assignmentId: string) => {
+    streamRef.current?.close();
+    const encodedId = encodeURIComponent(assignmentId);
+    const source = new EventSource(`http://localhost:5000/api/assignments/${encodedId}/ai-response/stream`);
+    streamRef.current = source;
+    setAiContent("");
+    setAiHtml(null);
+
+    source.addEventListener('delta', (event) => {
+      const { text } = JSON.parse((event as MessageEvent).data);
+      setAiContent((previous) => (previous || "") + text);
+    });
+    source.addEventListener('done', (event) => {
+      setAiContent(JSON.parse((event as MessageEvent).data).content);
+      source.close();
+      fetchAiResponse(assignmentId);
+    });
+    source.onerror = () => {
+      // Stream unavailable or gave up: fall back to the saved file
+      source.close();
+      fetchAiResponse(assignmentId);
+    };
+  };
+
+  useEffect(() => () => streamRef.current?.close(), []);
+
   const [courseName, setCourseName] = useState<string>("");
 
   useEffect(() => {
@@ -214,10 +241,12 @@ export const AssignmentViewer: React.FC<AssignmentViewerProps> = ({ assignment,
         {/* Sidebar */}
         <div className="space-y-6">
           {/* Quick Actions */}
-          {aiContent && (
+          {(aiHtml || aiContent) && (
             <div className="bg-white rounded-2xl shadow-sm p-6 border border-gray-100 mt-6">
               <h3 className="text-lg font-semibold text-gray-900 mb-4">AI Generated Response</h3>
-              <div>{renderMarkdown(aiContent)}</div>
+              {aiHtml
+                ? <div className="prose max-w-none" dangerouslySetInnerHTML={{ __html: aiHtml }} />
+                : <div>{renderMarkdown(aiContent || "")}</div>}
             </div>
           )}
 
@@ -240,7 +269,7 @@ export const AssignmentViewer: React.FC<AssignmentViewerProps> = ({ assignment,
               {assignment.id && (
                 <button
                   onClick={() => {
-                    fetchAiResponse(assignment.id); // ✅ pass the assignment ID
+                    streamAiResponse(assignment.id); // ✅ pass the assignment ID
                   }}
 
 
@@ -30,6 +30,27 @@ export const Dashboard: React.FC<DashboardProps> = ({ onViewAssignment }) => {
     };
 
     fetchAssignments();
+
+    // 📰 Reload only when the change feed reports something (the ETag keeps
+    // unchanged reloads cheap). A sync reports many changes at once: wait
+    // until they stop for a moment and reload once.
+    let reloadTimer: ReturnType<typeof setTimeout> | undefined;
+    const scheduleReload = () => {
+      clearTimeout(reloadTimer);
+      reloadTimer = setTimeout(fetchAssignments, 300);
+    };
+    const changes = new EventSource("http://localhost:5000/api/changes/stream");
+    changes.addEventListener('change', (event) => {
+      const { kind } = JSON.parse((event as MessageEvent).data);
+      if (kind !== 'notification') {
+        scheduleReload();
+      }
+    });
+    changes.addEventListener('reset', scheduleReload);
+    return () => {
+      clearTimeout(reloadTimer);
+      changes.close();
+    };
   }, []);
 
 
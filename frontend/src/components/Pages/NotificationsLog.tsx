@@ -31,6 +31,16 @@ export const NotificationsLog: React.FC = () => {
     };
 
     fetchNotifications();
+
+    // 📰 Refresh when a notification is logged
+    const changes = new EventSource('http://localhost:5000/api/changes/stream');
+    changes.addEventListener('change', (event) => {
+      if (JSON.parse((event as MessageEvent).data).kind === 'notification') {
+        fetchNotifications();
+      }
+    });
+    changes.addEventListener('reset', () => fetchNotifications());
+    return () => changes.close();
   }, []);
 
   
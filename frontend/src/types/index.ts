@@ -4,7 +4,7 @@ export interface Assignment {
   course: string;
   description: string;
   dueDate: Date;
-  status: 'pending' | 'completed';
+  status: 'pending' | 'in_progress' | 'submitted' | 'completed' | 'archived';
   priority: 'low' | 'medium' | 'high';
   downloadLink?: string;
   aiResponseFile?: string;
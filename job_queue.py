@@ -0,0 +1,269 @@
+# 📬 Durable Job Queue + Worker Pool
+#
+# The fetcher only enqueues "generate response" jobs; workers drain them.
+# Jobs live in a small SQLite database, so a crash never loses work:
+#   queued -> running -> done
+#                     -> queued again (retry with backoff)
+#                     -> dead (after max attempts, kept for inspection)
+# Enqueueing a key that is already queued is a no-op; enqueueing one whose
+# job is running queues a second job, claimed once the first one finishes
+# (it may have read the old assignment).
+# Jobs left "running" by a crashed worker are re-queued once their lease
+# expires.
+#
+#   python job_queue.py work [workers]   # drain the queue, then exit
+#   python job_queue.py status           # counts per state
+#   python job_queue.py retry-dead       # move dead jobs back to the queue
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import threading
+import traceback
+import uuid
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+QUEUE_PATH = os.path.join(BASE_DIR, "job_queue.db")
+
+GENERATE_RESPONSE = "generate_response"
+
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 30     # 30s, 60s, 120s, ...
+LEASE_SECONDS = 15 * 60     # a running job older than this is presumed crashed
+POLL_SECONDS = 2.0
+DEFAULT_WORKERS = 4
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind          TEXT NOT NULL,
+    dedupe_key    TEXT,
+    payload       TEXT NOT NULL,
+    status        TEXT NOT NULL DEFAULT 'queued',
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    max_attempts  INTEGER NOT NULL,
+    available_at  REAL NOT NULL,
+    locked_by     TEXT,
+    locked_at     REAL,
+    last_error    TEXT,
+    created_at    REAL NOT NULL,
+    updated_at    REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs(status, available_at);
+-- Re-syncing the same assignment while its job is still queued is a no-op
+DROP INDEX IF EXISTS idx_jobs_pending_key;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_queued_key ON jobs(kind, dedupe_key)
+    WHERE status = 'queued' AND dedupe_key IS NOT NULL;
+"""
+
+# Another job with the same key (SQL, `jobs` being the row at hand)
+SIBLING = ("jobs.dedupe_key IS NOT NULL AND EXISTS (SELECT 1 FROM jobs other WHERE "
+           "other.kind = jobs.kind AND other.dedupe_key = jobs.dedupe_key AND other.status = '{}')")
+
+
+class JobQueue:
+    def __init__(self, path=QUEUE_PATH):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            conn.executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None: we issue BEGIN IMMEDIATE ourselves
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, kind, payload, key=None, max_attempts=MAX_ATTEMPTS):
+        now = time.time()
+        conn = self._conn()
+        cur = conn.execute(
+            "INSERT OR IGNORE INTO jobs (kind, dedupe_key, payload, max_attempts, "
+            "available_at, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (kind, key, json.dumps(payload), max_attempts, now, now, now))
+        return cur.lastrowid if cur.rowcount else None
+
+    # 🔒 Atomically take the oldest ready job
+    def claim(self, worker_id):
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id, kind, payload, attempts FROM jobs "
+                f"WHERE status = 'queued' AND available_at <= ? AND NOT ({SIBLING.format('running')}) "
+                "ORDER BY available_at, id LIMIT 1", (now,)).fetchone()
+            if row:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', locked_by = ?, locked_at = ?, "
+                    "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    (worker_id, now, now, row[0]))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if not row:
+            return None
+        return {"id": row[0], "kind": row[1], "payload": json.loads(row[2]), "attempts": row[3] + 1}
+
+    def complete(self, job_id):
+        self._conn().execute(
+            "UPDATE jobs SET status = 'done', locked_by = NULL, last_error = NULL, "
+            "updated_at = ? WHERE id = ?", (time.time(), job_id))
+
+    def fail(self, job_id, error):
+        now = time.time()
+        conn = self._conn()
+        attempts, max_attempts = conn.execute(
+            "SELECT attempts, max_attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if self._superseded(conn, job_id, error):
+            return "superseded"
+        if attempts >= max_attempts:
+            conn.execute(
+                "UPDATE jobs SET status = 'dead', locked_by = NULL, last_error = ?, "
+                "updated_at = ? WHERE id = ?", (error, now, job_id))
+            return "dead"
+        delay = RETRY_BASE_SECONDS * (2 ** (attempts - 1))
+        conn.execute(
+            "UPDATE jobs SET status = 'queued', locked_by = NULL, last_error = ?, "
+            "available_at = ?, updated_at = ? WHERE id = ?", (error, now + delay, now, job_id))
+        return "queued"
+
+    # A newer job for the same key is already queued: it replaces this one
+    def _superseded(self, conn, job_id, error=None):
+        cur = conn.execute(
+            "UPDATE jobs SET status = 'done', locked_by = NULL, last_error = ?, updated_at = ? "
+            f"WHERE id = ? AND {SIBLING.format('queued')}",
+            (error or "superseded by a newer job", time.time(), job_id))
+        return cur.rowcount > 0
+
+    # ♻️ Crash-safe resume: expired leases go back to the queue
+    def recover_stale(self, lease_seconds=LEASE_SECONDS):
+        now = time.time()
+        conn = self._conn()
+        stale = [r[0] for r in conn.execute(
+            "SELECT id FROM jobs WHERE status = 'running' AND locked_at < ?", (now - lease_seconds,))]
+        for job_id in stale:
+            self._superseded(conn, job_id)
+        cur = conn.execute(
+            "UPDATE jobs SET status = 'queued', locked_by = NULL, available_at = ?, "
+            "updated_at = ? WHERE status = 'running' AND locked_at < ?",
+            (now, now, now - lease_seconds))
+        return cur.rowcount
+
+    def retry_dead(self):
+        now = time.time()
+        # OR IGNORE: a key that is queued again already has its job
+        cur = self._conn().execute(
+            "UPDATE OR IGNORE jobs SET status = 'queued', attempts = 0, available_at = ?, updated_at = ? "
+            "WHERE status = 'dead'", (now, now))
+        return cur.rowcount
+
+    def counts(self):
+        return dict(self._conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"))
+
+    # Work that can still finish in this run (delayed retries wait for the next one)
+    def pending(self):
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = 'running' "
+            "OR (status = 'queued' AND available_at <= ?)", (time.time(),)).fetchone()[0]
+
+
+    # Is a job for `key` still waiting or running?
+    def is_pending(self, kind, key):
+        return self._conn().execute(
+            "SELECT 1 FROM jobs WHERE kind = ? AND dedupe_key = ? AND status IN ('queued', 'running') "
+            "LIMIT 1", (kind, key)).fetchone() is not None
+
+
+class WorkerPool:
+    def __init__(self, queue, handlers, workers=DEFAULT_WORKERS, poll_seconds=POLL_SECONDS):
+        self.queue = queue
+        self.handlers = handlers
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    # until_empty=True: return once nothing is ready or running (cron style)
+    def run(self, until_empty=False):
+        threads = [threading.Thread(target=self._work, args=(until_empty,), daemon=True)
+                   for _ in range(self.workers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    def _work(self, until_empty):
+        worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        while not self._stop.is_set():
+            job = self.queue.claim(worker_id)
+            if job is None:
+                # Checked on every idle poll, not just at start: a job left
+                # running by a crashed worker would otherwise count as
+                # pending forever and keep `until_empty` from returning
+                recovered = self.queue.recover_stale()
+                if recovered:
+                    print(f"♻️ Re-queued {recovered} job(s) left running by a crashed worker")
+                    continue
+                if until_empty and self.queue.pending() == 0:
+                    return
+                self._stop.wait(self.poll_seconds)
+                continue
+
+            handler = self.handlers.get(job["kind"])
+            try:
+                if handler is None:
+                    raise ValueError(f"No handler for job kind '{job['kind']}'")
+                handler(job["payload"])
+                self.queue.complete(job["id"])
+            except Exception as e:
+                error = f"{e}\n{traceback.format_exc()}"
+                state = self.queue.fail(job["id"], error)
+                print(f"❌ Job {job['id']} ({job['kind']}) failed on attempt "
+                      f"{job['attempts']}: {e} -> {state}")
+
+
+def default_handlers():
+    from chatgpt_generate import handle_generate_job
+    return {GENERATE_RESPONSE: handle_generate_job}
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else "work"
+    queue = get_queue()
+    if command == "work":
+        workers = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_WORKERS
+        WorkerPool(queue, default_handlers(), workers=workers).run(until_empty=True)
+        from email_notifier import flush_notifications
+        flush_notifications()
+        from metrics import write_snapshot
+        write_snapshot("worker")
+        print(f"✅ Queue drained: {queue.counts()}")
+    elif command == "status":
+        print(json.dumps(queue.counts(), indent=2))
+    elif command == "retry-dead":
+        print(f"♻️ Re-queued {queue.retry_dead()} dead job(s)")
+    else:
+        print("Usage: python job_queue.py [work [workers] | status | retry-dead]")
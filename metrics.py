@@ -0,0 +1,183 @@
+# 📈 Metrics: Stage Timers, Counters and Prometheus Output
+#
+# Every slow stage (Google auth, Classroom listing, Drive downloads, text
+# extraction, OpenAI, SMTP) and every Flask route records into a
+# process-wide registry: latency histograms plus counters (errors, OpenAI
+# tokens and retries).
+#
+#   with timer("drive_download"): ...        or   @timed("authenticate")
+#
+# The fetcher and the generator are short-lived processes, so at the end
+# of a run they write a snapshot to metrics/<process>.json. The backend
+# serves its own live registry plus those snapshots at /api/metrics in
+# Prometheus text format, labelled by process.
+
+import os
+import time
+import json
+import threading
+import functools
+from contextlib import contextmanager
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+METRICS_DIR = os.path.join(BASE_DIR, "metrics")
+PREFIX = "classroom_assistant_"
+
+# Seconds; Drive downloads and OpenAI answers can take minutes
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+HELP = {
+    "stage_seconds": ("histogram", "Time spent in each pipeline stage"),
+    "stage_errors_total": ("counter", "Stage calls that raised"),
+    "http_request_seconds": ("histogram", "Backend request latency by route"),
+    "openai_tokens_total": ("counter", "OpenAI tokens reported in API responses"),
+    "openai_retries_total": ("counter", "OpenAI calls retried after a retryable error"),
+    "similar_reuses_total": ("counter", "AI answers reused from a near-duplicate assignment"),
+    "snapshot_age_seconds": ("gauge", "Seconds since the process wrote its snapshot"),
+}
+
+
+def _key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}      # (name, labels) -> value
+        self.histograms = {}    # (name, labels) -> [bucket counts..., sum, count]
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, _key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, seconds, **labels):
+        key = (name, _key(labels))
+        with self._lock:
+            values = self.histograms.get(key)
+            if values is None:
+                values = self.histograms[key] = [0] * (len(BUCKETS) + 2)
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    values[i] += 1
+            values[-2] += seconds
+            values[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "time": time.time(),
+                "counters": [[name, dict(labels), value] for (name, labels), value in self.counters.items()],
+                "histograms": [[name, dict(labels), list(values)]
+                               for (name, labels), values in self.histograms.items()],
+            }
+
+    # {stage: {"calls", "errors", "seconds"}} for run logs
+    def stage_summary(self):
+        with self._lock:
+            summary = {}
+            for (name, labels), values in self.histograms.items():
+                if name == "stage_seconds":
+                    stage = dict(labels)["stage"]
+                    summary[stage] = {"calls": values[-1], "errors": 0, "seconds": round(values[-2], 3)}
+            for (name, labels), value in self.counters.items():
+                if name == "stage_errors_total":
+                    stage = dict(labels)["stage"]
+                    summary.setdefault(stage, {"calls": 0, "errors": 0, "seconds": 0.0})["errors"] = value
+            return dict(sorted(summary.items()))
+
+
+registry = Registry()
+
+
+# ⏱️ Time one stage; exceptions are counted and re-raised
+@contextmanager
+def timer(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        registry.inc("stage_errors_total", stage=stage)
+        raise
+    finally:
+        registry.observe("stage_seconds", time.perf_counter() - start, stage=stage)
+
+
+def timed(stage):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_tokens(prompt_tokens, completion_tokens):
+    registry.inc("openai_tokens_total", prompt_tokens or 0, kind="prompt")
+    registry.inc("openai_tokens_total", completion_tokens or 0, kind="completion")
+
+
+def stage_summary():
+    return registry.stage_summary()
+
+
+# 💾 Snapshots of short-lived processes (fetcher, generator, worker)
+def write_snapshot(process, metrics_dir=None):
+    from storage import write_atomic
+    metrics_dir = metrics_dir or METRICS_DIR
+    os.makedirs(metrics_dir, exist_ok=True)
+    write_atomic(os.path.join(metrics_dir, f"{process}.json"), json.dumps(registry.snapshot()))
+
+
+def load_snapshots(metrics_dir=None):
+    from storage import read_json
+    metrics_dir = metrics_dir or METRICS_DIR
+    snapshots = {}
+    if os.path.isdir(metrics_dir):
+        for name in sorted(os.listdir(metrics_dir)):
+            if name.endswith(".json"):
+                snapshot = read_json(os.path.join(metrics_dir, name), None)
+                if snapshot:
+                    snapshots[name[:-len(".json")]] = snapshot
+    return snapshots
+
+
+# 📤 Prometheus text exposition format (version 0.0.4)
+def _labels(labels, **extra):
+    merged = dict(labels, **extra)
+    if not merged:
+        return ""
+    escape = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in sorted(merged.items())) + "}"
+
+
+def _bound(value):
+    return f"{value:g}"
+
+
+def render_prometheus(snapshots):
+    series = {}  # metric name -> lines
+    for process, snapshot in snapshots.items():
+        age = time.time() - snapshot.get("time", time.time())
+        series.setdefault("snapshot_age_seconds", []).append(
+            f"{PREFIX}snapshot_age_seconds{_labels({}, process=process)} {age:.3f}")
+        for name, labels, value in snapshot["counters"]:
+            series.setdefault(name, []).append(
+                f"{PREFIX}{name}{_labels(labels, process=process)} {value}")
+        for name, labels, values in snapshot["histograms"]:
+            lines = series.setdefault(name, [])
+            for bound, count in zip(BUCKETS, values):
+                lines.append(f"{PREFIX}{name}_bucket{_labels(labels, process=process, le=_bound(bound))} {count}")
+            lines.append(f"{PREFIX}{name}_bucket{_labels(labels, process=process, le='+Inf')} {values[-1]}")
+            lines.append(f"{PREFIX}{name}_sum{_labels(labels, process=process)} {values[-2]:.6f}")
+            lines.append(f"{PREFIX}{name}_count{_labels(labels, process=process)} {values[-1]}")
+
+    out = []
+    for name, lines in sorted(series.items()):
+        kind, text = HELP.get(name, ("untyped", name))
+        out.append(f"# HELP {PREFIX}{name} {text}")
+        out.append(f"# TYPE {PREFIX}{name} {kind}")
+        out.extend(lines)
+    return "\n".join(out) + "\n"
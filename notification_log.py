@@ -0,0 +1,181 @@
+# 🔔 Append-Only Notification Log
+#
+# Sent notifications are appended to JSONL segment files instead of
+# rewriting one growing notifications.json:
+#   backend/notifications/notifications-<first seq>.jsonl   one entry per line
+#   backend/notifications/notifications-<first seq>.idx     (seq, byte offset)
+# A segment is closed once it reaches SEGMENT_BYTES and a new one is started,
+# so an append only ever touches the tail of a small file. The .idx file lets
+# a page "since seq N" seek straight to its first line instead of scanning.
+#
+# Every entry gets a monotonically increasing "seq" (the pagination cursor)
+# and a random "id", so two notifications sent in the same second no longer
+# share an id. Appends from several processes are serialized by a file lock.
+#
+# An existing backend/notifications.json is imported once on first use and
+# left as it is; once segments exist it is never read again.
+
+import os
+import json
+import uuid
+import struct
+import threading
+
+from file_lock import FileLock
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LOG_DIR = os.path.join(BASE_DIR, "backend", "notifications")
+LEGACY_PATH = os.path.join(BASE_DIR, "backend", "notifications.json")
+
+SEGMENT_BYTES = 1024 * 1024
+INDEX_RECORD = struct.Struct("<QQ")  # seq, byte offset of its line
+PREFIX = "notifications-"
+
+
+def new_id():
+    return uuid.uuid4().hex
+
+
+class NotificationLog:
+    def __init__(self, log_dir=LOG_DIR, legacy_path=LEGACY_PATH, segment_bytes=SEGMENT_BYTES):
+        self.log_dir = log_dir
+        self.legacy_path = legacy_path
+        self.segment_bytes = segment_bytes
+        self.lock = FileLock(os.path.join(log_dir, ".lock"))
+        self._migrated = False
+        self._migrate_lock = threading.Lock()
+
+    # 📍 Segments, oldest first: [(first seq, base path without extension)]
+    def _segments(self):
+        if not os.path.isdir(self.log_dir):
+            return []
+        segments = []
+        for name in os.listdir(self.log_dir):
+            if name.startswith(PREFIX) and name.endswith(".jsonl"):
+                first = int(name[len(PREFIX):-len(".jsonl")])
+                segments.append((first, os.path.join(self.log_dir, name[:-len(".jsonl")])))
+        return sorted(segments)
+
+    def _segment_base(self, first_seq):
+        return os.path.join(self.log_dir, f"{PREFIX}{first_seq:012d}")
+
+    def _index_count(self, base):
+        try:
+            return os.path.getsize(f"{base}.idx") // INDEX_RECORD.size
+        except FileNotFoundError:
+            return 0
+
+    def _index_record(self, base, position):
+        with open(f"{base}.idx", 'rb') as f:
+            f.seek(position * INDEX_RECORD.size)
+            return INDEX_RECORD.unpack(f.read(INDEX_RECORD.size))
+
+    # 🩹 Drop a line (or half an index record) left behind by a crash
+    # mid-append, so the data and index files agree again. Lock held.
+    def _repair(self, base):
+        idx_path = f"{base}.idx"
+        data_path = f"{base}.jsonl"
+        count = self._index_count(base)
+        if os.path.exists(idx_path) and os.path.getsize(idx_path) != count * INDEX_RECORD.size:
+            with open(idx_path, 'r+b') as f:
+                f.truncate(count * INDEX_RECORD.size)
+        end = 0
+        if count:
+            _, offset = self._index_record(base, count - 1)
+            with open(data_path, 'rb') as f:
+                f.seek(offset)
+                end = offset + len(f.readline())
+        if os.path.getsize(data_path) != end:
+            with open(data_path, 'r+b') as f:
+                f.truncate(end)
+        return count
+
+    def _migrate(self):
+        with self._migrate_lock:
+            if self._migrated:
+                return
+            self._migrated = True
+            if not os.path.exists(self.legacy_path):
+                return
+            with self.lock:
+                if self._segments() or not os.path.exists(self.legacy_path):
+                    return
+                try:
+                    with open(self.legacy_path, 'r', encoding='utf-8') as f:
+                        legacy = json.load(f)
+                except json.JSONDecodeError:
+                    legacy = []
+                # Old ids were int(timestamp) and may collide: issue new ones
+                self._append_locked([dict(entry, id=new_id()) for entry in legacy])
+                print(f"📦 Imported {len(legacy)} notifications into {self.log_dir}")
+
+    # ✅ Append entries -> the stored entries (with seq and id)
+    def append(self, entries):
+        self._migrate()
+        with self.lock:
+            return self._append_locked(entries)
+
+    def _append_locked(self, entries):
+        os.makedirs(self.log_dir, exist_ok=True)
+        segments = self._segments()
+        if segments:
+            first, base = segments[-1]
+            count = self._repair(base)
+            next_seq = first + count
+        else:
+            next_seq = 1
+            base = self._segment_base(next_seq)
+            open(f"{base}.jsonl", 'ab').close()
+
+        stored = []
+        data = open(f"{base}.jsonl", 'ab')
+        idx = open(f"{base}.idx", 'ab')
+        try:
+            for entry in entries:
+                # 🔄 Rotate: start a new segment once this one is full
+                if data.tell() >= self.segment_bytes:
+                    data.close()
+                    idx.close()
+                    base = self._segment_base(next_seq)
+                    data = open(f"{base}.jsonl", 'ab')
+                    idx = open(f"{base}.idx", 'ab')
+                entry = dict(entry, seq=next_seq, id=entry.get("id") or new_id())
+                offset = data.tell()
+                data.write((json.dumps(entry, ensure_ascii=False) + "\n").encode('utf-8'))
+                data.flush()
+                # Index last: a record only exists once its line is complete
+                idx.write(INDEX_RECORD.pack(next_seq, offset))
+                idx.flush()
+                stored.append(entry)
+                next_seq += 1
+        finally:
+            data.close()
+            idx.close()
+        return stored
+
+    # 📄 Up to `limit` entries with seq > `since`, oldest first
+    def page(self, since=0, limit=None):
+        self._migrate()
+        results = []
+        segments = self._segments()
+        for i, (first, base) in enumerate(segments):
+            if i + 1 < len(segments) and segments[i + 1][0] <= since + 1:
+                continue  # every seq in this segment is <= since
+            count = self._index_count(base)
+            position = max(0, since + 1 - first)
+            if position >= count:
+                continue
+            _, offset = self._index_record(base, position)
+            with open(f"{base}.jsonl", 'rb') as f:
+                f.seek(offset)
+                for _ in range(count - position):
+                    if limit is not None and len(results) >= limit:
+                        return results
+                    line = f.readline()
+                    if not line.endswith(b"\n"):
+                        break  # append in progress
+                    results.append(json.loads(line))
+        return results
+
+    def all(self):
+        return self.page(0)
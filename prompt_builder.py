@@ -0,0 +1,236 @@
+# 🧮 Token-Budgeted Prompt Builder
+#
+# Assembles the assignment description plus attachment text within a token
+# budget. Attachment text is streamed line by line from the extraction cache
+# (text_extraction.py) and measured with a local token estimate, so peak
+# memory is bounded by the budget, not by the attachment size.
+#
+# If everything fits, the text is inlined exactly as before. If it does not,
+# the builder switches to map-reduce: every chunk is summarized concurrently
+# (through the response cache), then the summaries are combined, and merged
+# again if they still exceed the budget. Only that condensed text goes into
+# the final answer prompt.
+#
+# Settings come from config.json -> "promptBudget" (see DEFAULTS).
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from ai_engine import estimate_tokens
+
+DEFAULTS = {
+    "maxPromptTokens": 6000,   # whole final prompt, template included
+    "chunkTokens": 2000,       # size of one map-step chunk
+    "summaryWords": 250,       # requested length of each chunk summary
+    "maxChunks": 60,           # chunks beyond this are dropped (with a note)
+    "reduceRounds": 3,         # how often summaries may be merged again
+}
+
+ATTACHMENT_HEADER = "\n\n---\n📂 **Attached File Content:**\n\n"
+ATTACHMENT_SEPARATOR = "\n\n---\n"
+TRUNCATION_NOTE = "\n\n(… truncated to fit the prompt budget …)"
+MIN_BUDGET_TOKENS = 1000   # floor for description + attachments, whatever maxPromptTokens says
+
+
+def load_settings():
+    try:
+        from storage import get_storage
+        return dict(DEFAULTS, **(get_storage().get_setting("promptBudget", {}) or {}))
+    except Exception:
+        return dict(DEFAULTS)
+
+
+def truncate_to_tokens(text, tokens):
+    # estimate_tokens is ~4 chars per token, so cut on characters
+    if estimate_tokens(text) <= tokens:
+        return text
+    return text[:max(0, tokens * 4 - len(TRUNCATION_NOTE))] + TRUNCATION_NOTE
+
+
+def error_section(filename, error):
+    if filename is None:
+        return error or ""
+    return f"📎 **{filename}**:\n{error or ''}"
+
+
+# 🌊 Stream a cached text file as chunks of roughly `chunk_tokens`
+def iter_chunks(cache_file, chunk_tokens):
+    buffer = []
+    size = 0
+    with open(cache_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            # Very long lines (no newlines in the source) are split hard
+            while estimate_tokens(line) > chunk_tokens:
+                head, line = line[:chunk_tokens * 4], line[chunk_tokens * 4:]
+                if buffer:
+                    yield "".join(buffer)
+                    buffer, size = [], 0
+                yield head
+            tokens = estimate_tokens(line)
+            if buffer and size + tokens > chunk_tokens:
+                yield "".join(buffer)
+                buffer, size = [], 0
+            buffer.append(line)
+            size += tokens
+    if buffer:
+        yield "".join(buffer)
+
+
+def chunk_summary_prompt(title, filename, index, chunk, words):
+    return f"""You are condensing course material for an assignment titled "{title}".
+Summarize part {index} of the attached file "{filename}" in at most {words} words.
+Keep every requirement, formula, dataset detail, deadline and question; drop filler.
+
+---
+{chunk}
+---
+"""
+
+
+def merge_summary_prompt(title, summaries, words):
+    joined = "\n\n---\n".join(summaries)
+    return f"""Merge these partial summaries of the material for the assignment "{title}"
+into one summary of at most {words} words. Keep every requirement and question.
+
+---
+{joined}
+---
+"""
+
+
+class PromptBuilder:
+    # generate(prompt) -> (content, from_cache, ...), e.g. chatgpt_generate.generate_with_cache
+    def __init__(self, generate, settings=None, concurrency=4):
+        self.generate = generate
+        self.settings = dict(DEFAULTS, **(settings or {}))
+        self.concurrency = concurrency
+
+    # attachments: [(filename, cache file or None, error text or None)]
+    # template_tokens: size of the prompt template around the description
+    def build_description(self, title, description, attachments, template_tokens=0):
+        budget = self.settings["maxPromptTokens"] - template_tokens
+        if budget < MIN_BUDGET_TOKENS:
+            print(f"⚠️ promptBudget.maxPromptTokens ({self.settings['maxPromptTokens']}) leaves no room "
+                  f"next to the {template_tokens}-token template, using {MIN_BUDGET_TOKENS} tokens")
+            budget = MIN_BUDGET_TOKENS
+        description = truncate_to_tokens(description, budget // 2)
+        available = budget - estimate_tokens(description) - estimate_tokens(ATTACHMENT_HEADER)
+
+        if not attachments:
+            return description
+
+        sections = self._inline(attachments, available)
+        if sections is None:
+            print(f"✂️ Attachments exceed the {self.settings['maxPromptTokens']}-token budget, "
+                  f"summarizing in chunks...")
+            sections = self._map_reduce(title, attachments, available)
+
+        if not sections:
+            return description
+        return description + ATTACHMENT_HEADER + ATTACHMENT_SEPARATOR.join(sections)
+
+    # 📥 Fast path: everything fits. Returns None as soon as it does not.
+    def _inline(self, attachments, available):
+        sections = []
+        used = 0
+        for filename, cache_file, error in attachments:
+            if cache_file is None:
+                text = error_section(filename, error)
+                used += estimate_tokens(text)
+                if used > available:
+                    return None
+                sections.append(text)
+                continue
+
+            parts = []
+            for chunk in iter_chunks(cache_file, self.settings["chunkTokens"]):
+                used += estimate_tokens(chunk)
+                if used > available:
+                    return None
+                parts.append(chunk)
+            text = "".join(parts).strip()
+            if text:
+                sections.append(f"📎 **{filename}**:\n{text}")
+        return sections
+
+    # 🗺️ Map: summarize every chunk concurrently; 🧩 reduce: merge until it fits
+    def _map_reduce(self, title, attachments, available):
+        words = self.settings["summaryWords"]
+        max_chunks = self.settings["maxChunks"]
+        in_flight = threading.BoundedSemaphore(self.concurrency * 2)
+        jobs = []  # (filename, future | error text)
+        submitted = 0
+        dropped = 0
+
+        def summarize(prompt):
+            try:
+                return self.generate(prompt)[0]
+            finally:
+                in_flight.release()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for filename, cache_file, error in attachments:
+                if cache_file is None:
+                    jobs.append((None, error_section(filename, error)))
+                    continue
+                for index, chunk in enumerate(iter_chunks(cache_file, self.settings["chunkTokens"]), 1):
+                    if submitted >= max_chunks:
+                        dropped += 1
+                        continue
+                    submitted += 1
+                    # Bounded look-ahead keeps only a few chunks in memory at once
+                    in_flight.acquire()
+                    prompt = chunk_summary_prompt(title, filename, index, chunk, words)
+                    jobs.append((filename, pool.submit(summarize, prompt)))
+
+            summaries = {}
+            order = []
+            for filename, job in jobs:
+                text = job if isinstance(job, str) else job.result().strip()
+                if filename not in summaries:
+                    summaries[filename] = []
+                    order.append(filename)
+                summaries[filename].append(text)
+
+        # Error sections and the "omitted" note are not summaries: they are
+        # kept word for word and never sent to a merge request
+        sections, notes = [], []
+        for filename in order:
+            if filename is None:
+                notes.extend(summaries[filename])
+            else:
+                sections.append(f"📎 **{filename}** (summary):\n" + "\n\n".join(summaries[filename]))
+        if dropped:
+            notes.append(f"(… {dropped} more chunk(s) omitted to stay within the budget …)")
+        if notes:
+            available = max(0, available - estimate_tokens(ATTACHMENT_SEPARATOR.join(notes + [""])))
+
+        rounds = 0
+        while estimate_tokens(ATTACHMENT_SEPARATOR.join(sections)) > available \
+                and rounds < self.settings["reduceRounds"] and len(sections) > 0:
+            rounds += 1
+            sections = self._merge(title, sections, available)
+
+        joined = ATTACHMENT_SEPARATOR.join(sections)
+        if estimate_tokens(joined) > available:
+            sections = [truncate_to_tokens(joined, available)]
+        return [s for s in sections if s] + notes
+
+    # Merge neighbouring sections in groups that fit one request
+    def _merge(self, title, sections, available):
+        words = self.settings["summaryWords"]
+        groups, group, size = [], [], 0
+        for section in sections:
+            tokens = estimate_tokens(section)
+            if group and size + tokens > self.settings["chunkTokens"] * 2:
+                groups.append(group)
+                group, size = [], 0
+            group.append(section)
+            size += tokens
+        if group:
+            groups.append(group)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = [pool.submit(self.generate, merge_summary_prompt(title, g, words))
+                       for g in groups]
+            return [f.result()[0].strip() for f in futures]
@@ -0,0 +1,152 @@
+# ♻️ Content-Addressed AI Response Cache
+#
+# Responses are stored under sha256(model + prompt). When an assignment is
+# re-synced but its final prompt is unchanged (the teacher only moved the due
+# date or points), the cached answer is reused instead of calling OpenAI.
+# The cache is bounded by entry count and total size; the least recently
+# used entries are evicted first. Hits and misses are counted.
+#
+#   python response_cache.py stats
+#   python response_cache.py clear
+#
+# Limits come from config.json -> "responseCache": {"maxEntries", "maxBytes"}.
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_PATH = os.path.join(BASE_DIR, "response_cache.db")
+
+MAX_ENTRIES = 5000
+MAX_BYTES = 200 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key        TEXT PRIMARY KEY,
+    model      TEXT NOT NULL,
+    content    TEXT NOT NULL,
+    size       INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used  REAL NOT NULL,
+    hits       INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses(last_used);
+CREATE TABLE IF NOT EXISTS stats (
+    name   TEXT PRIMARY KEY,
+    value  INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO stats (name, value) VALUES ('hits', 0), ('misses', 0), ('evictions', 0);
+"""
+
+
+def cache_key(prompt, model):
+    return hashlib.sha256(f"{model}\0{prompt}".encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path=CACHE_PATH, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            conn.executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, conn, name):
+        conn.execute("UPDATE stats SET value = value + 1 WHERE name = ?", (name,))
+
+    def get(self, prompt, model):
+        key = cache_key(prompt, model)
+        with self._conn() as conn:
+            row = conn.execute("SELECT content FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._count(conn, "misses")
+                return None
+            conn.execute("UPDATE responses SET last_used = ?, hits = hits + 1 WHERE key = ?",
+                         (time.time(), key))
+            self._count(conn, "hits")
+            return row[0]
+
+    def put(self, prompt, model, content):
+        key = cache_key(prompt, model)
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, content, size, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, content, len(content.encode('utf-8')), now, now))
+            self._evict(conn)
+        return key
+
+    # 🧹 Drop least recently used entries until both limits hold
+    def _evict(self, conn):
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            count -= 1
+            total -= size
+            evicted += 1
+        conn.execute("UPDATE stats SET value = value + ? WHERE name = 'evictions'", (evicted,))
+
+    def stats(self):
+        conn = self._conn()
+        stats = dict(conn.execute("SELECT name, value FROM stats"))
+        stats["entries"], stats["bytes"] = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        lookups = stats["hits"] + stats["misses"]
+        stats["hitRate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        return stats
+
+    def clear(self):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM responses")
+            conn.execute("UPDATE stats SET value = 0")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            try:
+                from storage import get_storage
+                settings = get_storage().get_setting("responseCache", {}) or {}
+            except Exception:
+                settings = {}
+            _cache = ResponseCache(max_entries=settings.get("maxEntries", MAX_ENTRIES),
+                                   max_bytes=settings.get("maxBytes", MAX_BYTES))
+        return _cache
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    if command == "stats":
+        print(json.dumps(get_response_cache().stats(), indent=2))
+    elif command == "clear":
+        get_response_cache().clear()
+        print("🧹 Response cache cleared")
+    else:
+        print("Usage: python response_cache.py [stats | clear]")
@@ -0,0 +1,231 @@
+# 📝 AI Response Files: Markdown + Pre-Rendered HTML
+#
+# Every Generated_Responses/<name>_response.md gets a sibling
+# <name>_response.html, rendered once when the answer is written instead of
+# in the browser on every view. The renderer covers what the answers use
+# (headings, lists, code blocks, bold/italic/code, links, paragraphs) and
+# escapes everything else, so model output cannot inject markup.
+#
+# ResponseFileCache keeps the hottest files in memory together with their
+# ETag, Last-Modified and gzip/brotli encodings, revalidated with one stat().
+
+import os
+import re
+import gzip
+import html
+import hashlib
+import threading
+from collections import OrderedDict
+
+from storage import write_atomic
+
+try:
+    import brotli  # optional: pip install brotli
+except ImportError:
+    brotli = None
+
+MAX_ENTRIES = 64
+MAX_BYTES = 32 * 1024 * 1024
+MIN_COMPRESS_BYTES = 512
+
+
+def html_path_for(md_path):
+    return os.path.splitext(md_path)[0] + ".html"
+
+
+# 🎨 Markdown -> HTML
+_INLINE_CODE = re.compile(r"`([^`]+)`")
+_BOLD = re.compile(r"\*\*(.+?)\*\*|__(.+?)__")
+_ITALIC = re.compile(r"(?<![\w*])\*(?!\s)(.+?)(?<!\s)\*(?![\w*])|(?<!\w)_(?!\s)(.+?)(?<!\s)_(?!\w)")
+_LINK = re.compile(r"\[([^\]]+)\]\((https?://[^)\s]+)\)")
+_HEADING = re.compile(r"^(#{1,6})\s+(.*)$")
+_BULLET = re.compile(r"^\s*[-*+]\s+(.*)$")
+_NUMBERED = re.compile(r"^\s*\d+[.)]\s+(.*)$")
+_RULE = re.compile(r"^\s*([-*_])(\s*\1){2,}\s*$")
+
+
+def _emphasis(text):
+    text = _BOLD.sub(lambda m: f"<strong>{m.group(1) or m.group(2)}</strong>", text)
+    return _ITALIC.sub(lambda m: f"<em>{m.group(1) or m.group(2)}</em>", text)
+
+
+def render_inline(text):
+    stashed = []
+
+    def stash(fragment):
+        stashed.append(fragment)
+        return f"\0{len(stashed) - 1}\0"
+
+    def restore(text):
+        return re.sub(r"\0(\d+)\0", lambda m: stashed[int(m.group(1))], text)
+
+    def link(match):
+        label = restore(_emphasis(html.escape(match.group(1), quote=False)))
+        return stash(f'<a href="{html.escape(match.group(2))}" target="_blank" '
+                     f'rel="noopener noreferrer">{label}</a>')
+
+    # Code spans and links are finished before escaping and emphasis, so the
+    # URL is escaped exactly once and a "_" or "*" in it stays as it is
+    text = _INLINE_CODE.sub(lambda m: stash(f"<code>{html.escape(m.group(1))}</code>"), text)
+    text = _LINK.sub(link, text)
+    return restore(_emphasis(html.escape(text, quote=False)))
+
+
+def render_html(markdown):
+    out = []
+    paragraph = []
+    list_tag = None
+    code = None  # lines of an open ``` block
+
+    def close_paragraph():
+        if paragraph:
+            out.append(f"<p>{'<br>'.join(render_inline(line) for line in paragraph)}</p>")
+            paragraph.clear()
+
+    def close_list():
+        nonlocal list_tag
+        if list_tag:
+            out.append(f"</{list_tag}>")
+            list_tag = None
+
+    for line in markdown.splitlines():
+        if code is not None:
+            if line.strip().startswith("```"):
+                out.append(f"<pre><code>{html.escape(chr(10).join(code))}</code></pre>")
+                code = None
+            else:
+                code.append(line)
+            continue
+        if line.strip().startswith("```"):
+            close_paragraph()
+            close_list()
+            code = []
+            continue
+        if not line.strip():
+            close_paragraph()
+            close_list()
+            continue
+
+        heading = _HEADING.match(line)
+        bullet = _BULLET.match(line)
+        numbered = _NUMBERED.match(line)
+        if heading:
+            close_paragraph()
+            close_list()
+            level = len(heading.group(1))
+            out.append(f"<h{level}>{render_inline(heading.group(2))}</h{level}>")
+        elif _RULE.match(line):
+            close_paragraph()
+            close_list()
+            out.append("<hr>")
+        elif bullet or numbered:
+            close_paragraph()
+            tag = "ul" if bullet else "ol"
+            if list_tag != tag:
+                close_list()
+                out.append(f"<{tag}>")
+                list_tag = tag
+            out.append(f"<li>{render_inline((bullet or numbered).group(1))}</li>")
+        else:
+            close_list()
+            paragraph.append(line.strip())
+
+    if code is not None:
+        out.append(f"<pre><code>{html.escape(chr(10).join(code))}</code></pre>")
+    close_paragraph()
+    close_list()
+    return "\n".join(out)
+
+
+# ✍️ Write the markdown and its rendered HTML (both atomically)
+def write_response(md_path, content):
+    write_atomic(md_path, content)
+    write_atomic(html_path_for(md_path), render_html(content))
+
+
+# 🧠 In-memory LRU of served files
+class CachedFile:
+    def __init__(self, stat, body):
+        self.stat_key = (stat.st_mtime_ns, stat.st_size)
+        self.mtime = stat.st_mtime
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()[:20]
+        self._encoded = {}
+        self._encode_lock = threading.Lock()  # one compression per encoding
+        self.key = None  # set by ResponseFileCache.get
+
+    def size(self):
+        return len(self.body) + sum(len(b) for b in self._encoded.values())
+
+
+class ResponseFileCache:
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0  # bodies and compressed variants of the cached entries
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # `load(path)` -> bytes builds the body when the file is new or changed
+    # (one entry per path and `variant`); raises FileNotFoundError if the
+    # file does not exist
+    def get(self, path, load=None, variant=None):
+        stat = os.stat(path)
+        key = (os.path.abspath(path), variant)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.stat_key == (stat.st_mtime_ns, stat.st_size):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+        if load is None:
+            with open(path, 'rb') as f:
+                body = f.read()
+        else:
+            body = load(path)
+        entry = CachedFile(stat, body)
+        entry.key = key
+        with self._lock:
+            self.misses += 1
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.size()
+            self._entries[key] = entry
+            self._bytes += entry.size()
+            self._evict()
+        return entry
+
+    # Body of `entry` compressed with `encoding`, made once per entry and
+    # counted against max_bytes like the body itself
+    def encoded(self, entry, encoding):
+        with entry._encode_lock:
+            data = entry._encoded.get(encoding)
+            if data is not None:
+                return data
+            if encoding == "br":
+                data = brotli.compress(entry.body, quality=5)
+            else:
+                data = gzip.compress(entry.body, compresslevel=6)
+            with self._lock:
+                entry._encoded[encoding] = data
+                if self._entries.get(entry.key) is entry:
+                    self._bytes += len(data)
+                    self._evict()
+            return data
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, dropped = self._entries.popitem(last=False)
+            self._bytes -= dropped.size()
+
+
+def pick_encoding(accept_encoding, size):
+    if size < MIN_COMPRESS_BYTES:
+        return None
+    if brotli is not None and "br" in accept_encoding:
+        return "br"
+    if "gzip" in accept_encoding:
+        return "gzip"
+    return None
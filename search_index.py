@@ -0,0 +1,301 @@
+# 🔎 Full-Text Search
+#
+# One SQLite FTS5 index over everything a student might look for: the
+# assignment itself (title, course, description), the text of its
+# attachments (from the extraction cache, see text_extraction.py) and its
+# generated answer. Results are ranked with BM25, title matches first, and
+# come with highlighted snippets.
+#
+# The index is incremental. Each document has a signature (assignment
+# updateTime, attachment, extracted text and response file stats) and is
+# only re-indexed when that changes, e.g. once an attachment's text has
+# been extracted. The fetcher and the generator index an assignment
+# right after writing it; refresh() catches up on everything else.
+#
+#   python search_index.py refresh      # index new/changed assignments
+#   python search_index.py rebuild      # drop the index and start over
+#   python search_index.py "<query>"    # try a search
+
+import os
+import re
+import sys
+import html
+import hashlib
+import time
+import sqlite3
+import threading
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+INDEX_PATH = os.path.join(BASE_DIR, "search.db")
+MAX_ATTACHMENT_CHARS = 200000   # per assignment; keeps huge slide decks from bloating the index
+SNIPPET_TOKENS = 24
+MARK_START, MARK_END = "\x02", "\x03"
+
+SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS documents USING fts5(
+    filename UNINDEXED, assignment_id UNINDEXED, course_id UNINDEXED,
+    title, course, description, attachments, response,
+    tokenize = 'porter unicode61 remove_diacritics 2'
+);
+CREATE TABLE IF NOT EXISTS signatures (
+    filename   TEXT PRIMARY KEY,
+    doc_id     INTEGER NOT NULL,
+    signature  TEXT NOT NULL
+);
+"""
+
+# BM25 weight per column, in table order (the UNINDEXED ones never match)
+WEIGHTS = (0.0, 0.0, 0.0, 10.0, 3.0, 4.0, 1.0, 1.5)
+SNIPPET_COLUMNS = {"description": 5, "attachments": 6, "response": 7}
+
+
+# "photosynthesis lab rep" -> '"photosynthesis" "lab" "rep"*' (all words, last one
+# as a prefix so results show up while typing). Words only: user input can
+# never produce an FTS syntax error.
+def build_query(text):
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return None
+    return " ".join(f'"{w}"' for w in words[:-1]) + (" " if len(words) > 1 else "") + f'"{words[-1]}"*'
+
+
+def render_marks(text):
+    escaped = html.escape(text or "", quote=False)
+    return escaped.replace(MARK_START, "<mark>").replace(MARK_END, "</mark>")
+
+
+def _stat_key(path):
+    if path is None:
+        return "-"
+    try:
+        st = os.stat(path)
+        return f"{st.st_mtime_ns}:{st.st_size}"
+    except OSError:
+        return "-"
+
+
+class SearchIndex:
+    def __init__(self, path=INDEX_PATH, base_dir=BASE_DIR):
+        self.path = path
+        self.base_dir = base_dir
+        self._local = threading.local()
+        self._built = False
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            conn.executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    # 📎 Local attachment files of an assignment (stored by Drive file id)
+    def _attachment_paths(self, assignment):
+        from drive_downloads import ASSIGNMENT_FILES_DIR, safe_name
+        paths = []
+        for material in assignment.get("materials", []):
+            drive_file = material.get("driveFile", {}).get("driveFile", {})
+            if drive_file.get("id") and drive_file.get("title"):
+                paths.append(os.path.join(self.base_dir, ASSIGNMENT_FILES_DIR,
+                                          drive_file["id"], safe_name(drive_file["title"])))
+        return paths
+
+    def _response_path(self, filename, assignment):
+        relative = assignment.get("ai_response_file") or \
+            f"Generated_Responses/{filename.replace('.json', '_response.md')}"
+        return os.path.join(self.base_dir, relative)
+
+    def signature(self, filename, assignment):
+        # Stable across processes (unlike hash()), so restarts do not reindex everything
+        parts = [assignment.get("updateTime") or hashlib.sha1(
+            f"{assignment.get('title')}\0{assignment.get('description')}".encode('utf-8')).hexdigest()]
+        for path in self._attachment_paths(assignment):
+            parts += [_stat_key(path), _stat_key(self._cache_path(path))]
+        parts.append(_stat_key(self._response_path(filename, assignment)))
+        return "|".join(parts)
+
+    # Extraction cache entry of an attachment (None if the file is missing)
+    @staticmethod
+    def _cache_path(path):
+        from text_extraction import cache_path_for
+        try:
+            return cache_path_for(path)
+        except OSError:
+            return None
+
+    # Only text that was already extracted: indexing never parses PDFs
+    def _attachment_text(self, assignment):
+        texts, total = [], 0
+        for path in self._attachment_paths(assignment):
+            try:
+                cached = self._cache_path(path)
+                if cached is None or not os.path.exists(cached):
+                    continue
+                with open(cached, 'r', encoding='utf-8') as f:
+                    text = f.read(MAX_ATTACHMENT_CHARS - total)
+            except OSError:
+                continue
+            texts.append(text)
+            total += len(text)
+            if total >= MAX_ATTACHMENT_CHARS:
+                break
+        return "\n\n".join(texts)
+
+    def _response_text(self, filename, assignment):
+        try:
+            with open(self._response_path(filename, assignment), 'r', encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return ""
+
+    # ✍️ (Re-)index one assignment unless it is unchanged -> True if written
+    def index_assignment(self, filename, assignment, force=False):
+        signature = self.signature(filename, assignment)
+        conn = self._conn()
+        row = conn.execute("SELECT doc_id, signature FROM signatures WHERE filename = ?",
+                           (filename,)).fetchone()
+        if row and row[1] == signature and not force:
+            return False
+
+        values = (
+            filename,
+            str(assignment.get("id", "")),
+            str(assignment.get("courseId") or assignment.get("course") or ""),
+            assignment.get("title", ""),
+            assignment.get("courseName", ""),
+            assignment.get("description", ""),
+            self._attachment_text(assignment),
+            self._response_text(filename, assignment),
+        )
+        with conn:
+            if row:
+                conn.execute("DELETE FROM documents WHERE rowid = ?", (row[0],))
+            cur = conn.execute(
+                "INSERT INTO documents (filename, assignment_id, course_id, title, course, description, "
+                "attachments, response) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", values)
+            conn.execute("INSERT OR REPLACE INTO signatures (filename, doc_id, signature) VALUES (?, ?, ?)",
+                         (filename, cur.lastrowid, signature))
+        return True
+
+    def remove(self, filename):
+        conn = self._conn()
+        with conn:
+            row = conn.execute("SELECT doc_id FROM signatures WHERE filename = ?", (filename,)).fetchone()
+            if row:
+                conn.execute("DELETE FROM documents WHERE rowid = ?", (row[0],))
+                conn.execute("DELETE FROM signatures WHERE filename = ?", (filename,))
+
+    # 🔄 Bring the index in line with storage -> counts
+    def refresh(self, storage):
+        stats = {"indexed": 0, "unchanged": 0, "removed": 0}
+        seen = set()
+        for filename, assignment in storage.all_assignments():
+            seen.add(filename)
+            stats["indexed" if self.index_assignment(filename, assignment) else "unchanged"] += 1
+        indexed = [r[0] for r in self._conn().execute("SELECT filename FROM signatures")]
+        for filename in indexed:
+            if filename not in seen:
+                self.remove(filename)
+                stats["removed"] += 1
+        self._built = True
+        return stats
+
+    # First search on an existing install: build the index once
+    def ensure_built(self, storage):
+        if self._built:
+            return
+        if self._conn().execute("SELECT 1 FROM signatures LIMIT 1").fetchone() is None:
+            self.refresh(storage)
+        self._built = True
+
+    def clear(self):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM documents")
+            conn.execute("DELETE FROM signatures")
+        self._built = False
+
+    # 🔎 Ranked, highlighted page of results
+    def search(self, text, limit=20, offset=0, course_id=None):
+        started = time.perf_counter()
+        query = build_query(text)
+        if query is None:
+            return {"results": [], "total": 0, "offset": offset, "limit": limit, "hasMore": False}
+
+        where = "documents MATCH ?"
+        params = [query]
+        if course_id:
+            where += " AND course_id = ?"
+            params.append(str(course_id))
+
+        conn = self._conn()
+        total = conn.execute(f"SELECT COUNT(*) FROM documents WHERE {where}", params).fetchone()[0]
+        snippets = ", ".join(
+            f"snippet(documents, {col}, '{MARK_START}', '{MARK_END}', '…', {SNIPPET_TOKENS})"
+            for col in SNIPPET_COLUMNS.values())
+        rows = conn.execute(
+            f"SELECT filename, assignment_id, course_id, course, "
+            f"highlight(documents, 3, '{MARK_START}', '{MARK_END}'), {snippets}, "
+            f"bm25(documents, {', '.join(str(w) for w in WEIGHTS)}) AS score "
+            f"FROM documents WHERE {where} ORDER BY score LIMIT ? OFFSET ?",
+            params + [limit, offset]).fetchall()
+
+        results = []
+        for filename, assignment_id, course, course_name, title, *rest in rows:
+            *texts, score = rest
+            matches = {name: render_marks(snippet)
+                       for name, snippet in zip(SNIPPET_COLUMNS, texts) if MARK_START in (snippet or "")}
+            results.append({
+                "id": assignment_id or filename.replace(".json", ""),
+                "filename": filename,
+                "course": course,
+                "courseName": course_name,
+                "title": render_marks(title),
+                "matches": matches,
+                "score": round(-score, 3),
+            })
+        return {
+            "results": results,
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "hasMore": offset + len(results) < total,
+            "tookMs": round((time.perf_counter() - started) * 1000, 2),
+        }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_search_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SearchIndex()
+        return _index
+
+
+# Writers call this: a broken index must never fail a sync or a generation
+def index_quietly(filename, assignment):
+    try:
+        get_search_index().index_assignment(filename, assignment)
+    except Exception as e:
+        print(f"⚠️ Search index not updated for {filename}: {e}")
+
+
+if __name__ == '__main__':
+    from storage import get_storage
+    command = sys.argv[1] if len(sys.argv) > 1 else "refresh"
+    index = get_search_index()
+    if command == "rebuild":
+        index.clear()
+        print(f"✅ Rebuilt search index: {index.refresh(get_storage())}")
+    elif command == "refresh":
+        print(f"✅ Search index refreshed: {index.refresh(get_storage())}")
+    else:
+        for hit in index.search(" ".join(sys.argv[1:]))["results"]:
+            print(f"{hit['score']:>8}  {hit['filename']}  {hit['title']}")
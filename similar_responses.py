@@ -0,0 +1,258 @@
+# 🧬 Near-Duplicate Assignments: Reuse Answers Across Sections
+#
+# Several sections of one course, or a weekly lab that is posted again with
+# a new number, produce prompts that differ in a few words. The exact
+# response cache (response_cache.py) misses those; this index catches them.
+#
+# Each freshly generated answer is stored with MinHash signatures of its
+# assignment: 128 hashes over word 3-grams, whose agreement estimates the
+# Jaccard similarity of two texts. Locality-sensitive hashing (32 bands of
+# 4 rows) over the full text (title + statement + attachment text, without
+# the prompt template) finds candidates with an indexed lookup instead of
+# comparing against every stored answer.
+#
+# A candidate must pass the threshold twice: on the full text, and on the
+# teacher's statement alone. One lab manual attached to every lab would
+# otherwise make "Lab 4" and "Lab 5" look identical. Statements too short to
+# compare ("Lab 4: see handout") must match word for word instead. The best
+# match's answer is reused (with the title adapted) instead of calling
+# OpenAI, and the source is recorded.
+#
+#   python similar_responses.py stats
+#   python similar_responses.py clear
+#
+# Settings: config.json -> "similarResponses": {"enabled", "threshold", "maxEntries"}.
+
+import os
+import re
+import sys
+import json
+import time
+import array
+import random
+import sqlite3
+import hashlib
+import threading
+from collections import namedtuple
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+INDEX_PATH = os.path.join(BASE_DIR, "similar_responses.db")
+
+THRESHOLD = 0.9
+MAX_ENTRIES = 5000
+NUM_PERM = 128
+BANDS = 32            # 32 x 4: pairs above ~0.6 similarity share a band almost surely
+ROWS = NUM_PERM // BANDS
+SHINGLE_WORDS = 3
+MIN_SHINGLES = 20     # shorter texts ("Quiz 3") say nothing about the task
+MERSENNE = (1 << 61) - 1
+
+# Fixed seed: signatures must stay comparable across runs and processes
+_rng = random.Random(20250731)
+PERMUTATIONS = [(_rng.randrange(1, MERSENNE), _rng.randrange(0, MERSENNE)) for _ in range(NUM_PERM)]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    filename   TEXT PRIMARY KEY,
+    model      TEXT NOT NULL,
+    title      TEXT NOT NULL,
+    signature  BLOB NOT NULL,
+    statement  BLOB,
+    statement_key TEXT NOT NULL,
+    content    TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_answers_created_at ON answers(created_at);
+CREATE TABLE IF NOT EXISTS buckets (
+    bucket    TEXT NOT NULL,
+    filename  TEXT NOT NULL,
+    PRIMARY KEY (bucket, filename)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_buckets_filename ON buckets(filename);
+CREATE TABLE IF NOT EXISTS reuses (
+    filename    TEXT PRIMARY KEY,
+    source      TEXT NOT NULL,
+    similarity  REAL NOT NULL,
+    created_at  REAL NOT NULL
+);
+"""
+
+Match = namedtuple("Match", "filename title content similarity")
+
+
+def shingles(text):
+    words = re.findall(r"\w+", text.lower())
+    return {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def minhash(shingle_set):
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest(), 'big') & MERSENNE
+              for s in shingle_set]
+    return [min((a * h + b) % MERSENNE for h in hashes) for a, b in PERMUTATIONS]
+
+
+def similarity(sig_a, sig_b):
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / NUM_PERM
+
+
+def statement_key(text):
+    return hashlib.sha1(" ".join(re.findall(r"\w+", text.lower())).encode('utf-8')).hexdigest()
+
+
+def pack(signature):
+    return array.array('Q', signature).tobytes() if signature is not None else None
+
+
+def band_keys(signature):
+    return [f"{band}:" + hashlib.blake2b(
+                array.array('Q', signature[band * ROWS:(band + 1) * ROWS]).tobytes(), digest_size=8).hexdigest()
+            for band in range(BANDS)]
+
+
+# ✍️ The source's answer, made about the new assignment. Only the first
+# heading is retitled: a short title ("Lab 1") may appear anywhere in the body.
+def adapt_response(content, source_title, title, score):
+    if source_title and title and source_title != title:
+        lines = content.split("\n")
+        for i, line in enumerate(lines):
+            if line.lstrip().startswith("#"):
+                lines[i] = line.replace(source_title, title)
+                break
+        content = "\n".join(lines)
+    return (f"{content.rstrip()}\n\n---\n\n"
+            f"_♻️ Adapted from the answer to “{source_title}” ({score:.0%} similar assignment)._\n")
+
+
+class SimilarityIndex:
+    def __init__(self, path=INDEX_PATH, threshold=THRESHOLD, max_entries=MAX_ENTRIES, enabled=True):
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            conn.executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def signature(text):
+        shingle_set = shingles(text)
+        if len(shingle_set) < MIN_SHINGLES:
+            return None
+        return minhash(shingle_set)
+
+    # 🔍 Most similar answered assignment (other than `filename`) -> Match or None
+    def find(self, filename, model, statement, text):
+        signature = self.signature(text)
+        if signature is None:
+            return None
+        statement_sig, key = self.signature(statement), statement_key(statement)
+        keys = band_keys(signature)
+        conn = self._conn()
+        rows = conn.execute(
+            f"SELECT a.filename, a.title, a.signature, a.statement, a.statement_key, a.content "
+            f"FROM answers a WHERE a.filename IN ("
+            f"SELECT DISTINCT filename FROM buckets WHERE bucket IN ({','.join('?' * len(keys))})) "
+            f"AND a.filename != ? AND a.model = ?", (*keys, filename, model)).fetchall()
+
+        best = None
+        for source, title, blob, statement_blob, source_key, content in rows:
+            score = similarity(signature, array.array('Q', blob))
+            if score < self.threshold:
+                continue
+            if statement_sig is not None and statement_blob is not None:
+                score = min(score, similarity(statement_sig, array.array('Q', statement_blob)))
+            elif key != source_key:
+                continue
+            if score >= self.threshold and (best is None or score > best.similarity):
+                best = Match(source, title, content, score)
+        return best
+
+    # 📥 Remember a freshly generated answer -> False if the text is too short
+    def add(self, filename, model, title, statement, text, content):
+        signature = self.signature(text)
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute("DELETE FROM buckets WHERE filename = ?", (filename,))
+            conn.execute("DELETE FROM reuses WHERE filename = ?", (filename,))
+            if signature is None:
+                conn.execute("DELETE FROM answers WHERE filename = ?", (filename,))
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO answers (filename, model, title, signature, statement, statement_key, "
+                "content, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (filename, model, title, pack(signature), pack(self.signature(statement)),
+                 statement_key(statement), content, now))
+            conn.executemany("INSERT OR IGNORE INTO buckets (bucket, filename) VALUES (?, ?)",
+                             [(key, filename) for key in band_keys(signature)])
+            self._evict(conn)
+        return True
+
+    # 🧹 Oldest answers go first once maxEntries is exceeded
+    def _evict(self, conn):
+        excess = conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0] - self.max_entries
+        if excess <= 0:
+            return
+        old = [r[0] for r in conn.execute(
+            "SELECT filename FROM answers ORDER BY created_at LIMIT ?", (excess,))]
+        conn.executemany("DELETE FROM buckets WHERE filename = ?", [(f,) for f in old])
+        conn.executemany("DELETE FROM answers WHERE filename = ?", [(f,) for f in old])
+
+    def record_reuse(self, filename, source, score):
+        with self._conn() as conn:
+            conn.execute("INSERT OR REPLACE INTO reuses (filename, source, similarity, created_at) "
+                         "VALUES (?, ?, ?, ?)", (filename, source, round(score, 3), time.time()))
+
+    def stats(self):
+        conn = self._conn()
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "answers": conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0],
+            "reuses": conn.execute("SELECT COUNT(*) FROM reuses").fetchone()[0],
+        }
+
+    def clear(self):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM buckets")
+            conn.execute("DELETE FROM answers")
+            conn.execute("DELETE FROM reuses")
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_similarity_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            try:
+                from storage import get_storage
+                settings = get_storage().get_setting("similarResponses", {}) or {}
+            except Exception:
+                settings = {}
+            _index = SimilarityIndex(threshold=settings.get("threshold", THRESHOLD),
+                                     max_entries=settings.get("maxEntries", MAX_ENTRIES),
+                                     enabled=settings.get("enabled", True))
+        return _index
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    if command == "stats":
+        print(json.dumps(get_similarity_index().stats(), indent=2))
+    elif command == "clear":
+        get_similarity_index().clear()
+        print("🧹 Similar-response index cleared")
+    else:
+        print("Usage: python similar_responses.py [stats | clear]")
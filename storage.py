@@ -0,0 +1,642 @@
+# 💾 Storage Layer
+#
+# One place for every piece of state the scripts and the backend share:
+# assignments, courses, fetched ids, notifications and settings.
+#
+#   JsonStorage   — the original layout (Assignments/*.json, backend/*.json,
+#                   fetched_ids.json, config.json). Default.
+#   SqliteStorage — one indexed SQLite database in WAL mode, so lookups hit an
+#                   index and updates touch a single row.
+#
+# Pick the backend in config.json:
+#   { "storage": "sqlite", "databasePath": "classroom.db" }
+#
+# Move existing JSON state into SQLite once with:
+#   python storage.py import
+#
+# JSON files are never rewritten in place: writes go to a temp file that is
+# atomically renamed over the old one, so readers always see a complete
+# file. Read-modify-write updates hold a per-file lock (.locks/), so the
+# backend may run threaded or with several workers while the fetcher writes.
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import contextlib
+import tempfile
+import threading
+
+from assignment_index import AssignmentIndex
+from notification_log import NotificationLog, new_id
+from file_lock import FileLock
+from change_feed import ChangeFeed
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(BASE_DIR, "config.json")
+DEFAULT_DATABASE_PATH = "classroom.db"
+
+# ✅ Assignment workflow states; anything else is rejected by the API
+STATUSES = ("pending", "in_progress", "submitted", "completed", "archived")
+
+
+def read_json(path, default):
+    if not os.path.exists(path):
+        return default
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except json.JSONDecodeError:
+        print(f"⚠️ {os.path.basename(path)} is invalid or empty. Resetting...")
+        return default
+
+
+# ✍️ Write to a temp file in the same directory, then rename over the target
+def write_atomic(path, text):
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=folder)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        for attempt in range(10):
+            try:
+                os.replace(tmp, path)
+                break
+            except PermissionError:
+                # Windows refuses while a reader has the target open
+                if attempt == 9:
+                    raise
+                time.sleep(0.05)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def write_json(path, data):
+    write_atomic(path, json.dumps(data, indent=2))
+
+
+# 🔒 One lock per state file (a "record": one assignment, fetched_ids.json...)
+def lock_for(path, lock_dir=None):
+    name = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()
+    return FileLock(os.path.join(lock_dir or os.path.join(BASE_DIR, ".locks"), f"{name}.lock"))
+
+
+# Read-modify-write under the file's lock; `mutate` changes the data in place
+def update_json(path, default, mutate, lock_dir=None):
+    with lock_for(path, lock_dir):
+        data = read_json(path, default)
+        result = mutate(data)
+        write_json(path, data)
+        return result
+
+
+# ✅ Interface shared by both backends. Assignments are keyed by their file
+# name ("Course_Title.json"), which also names the generated response file.
+class Storage:
+    # --- assignments ---
+    def read_assignment(self, filename):
+        raise NotImplementedError
+
+    def write_assignment(self, filename, assignment):
+        raise NotImplementedError
+
+    def assignment_filenames(self):
+        raise NotImplementedError
+
+    def get_assignment(self, assignment_id):
+        raise NotImplementedError
+
+    def all_assignments(self):
+        raise NotImplementedError
+
+    def assignments_by_course(self, course_id):
+        raise NotImplementedError
+
+    def assignments_by_status(self, status):
+        raise NotImplementedError
+
+    # Apply [(assignment_id, status), ...] as one commit -> {assignment_id: found}
+    def update_statuses(self, updates):
+        raise NotImplementedError
+
+    def update_assignment_status(self, assignment_id, status):
+        return self.update_statuses([(assignment_id, status)])[assignment_id]
+
+    def fingerprint(self):
+        raise NotImplementedError
+
+    # --- courses ---
+    def courses(self):
+        raise NotImplementedError
+
+    def save_courses(self, courses):
+        raise NotImplementedError
+
+    # --- fetched ids ---
+    def fetched_ids(self):
+        raise NotImplementedError
+
+    # {assignment id: updateTime} in one write (a sync records a whole course)
+    def mark_fetched_many(self, records):
+        raise NotImplementedError
+
+    def mark_fetched(self, assignment_id, update_time):
+        self.mark_fetched_many({assignment_id: update_time})
+
+    # Drop ids whose updateTime is older than `before` (ISO string) -> count
+    def prune_fetched(self, before):
+        raise NotImplementedError
+
+    # --- sync cursor: {course_id: highest courseWork updateTime seen} ---
+    def sync_cursor(self):
+        raise NotImplementedError
+
+    def save_sync_cursor(self, cursor):
+        raise NotImplementedError
+
+    # --- notifications ---
+    def notifications(self):
+        raise NotImplementedError
+
+    def add_notification(self, entry):
+        raise NotImplementedError
+
+    # Up to `limit` entries with seq > `since`, oldest first
+    def notifications_page(self, since=0, limit=None):
+        raise NotImplementedError
+
+    # --- change feed (see change_feed.py); subclasses provide `change_feed` ---
+    def record_change(self, kind, entity_id=None, **data):
+        return self.change_feed.record(kind, entity_id, **data)
+
+    # [(entity_id, data), ...] in one transaction
+    def record_changes(self, kind, entries):
+        return self.change_feed.record_many(kind, entries)
+
+    def changes(self, since=0, limit=None):
+        return self.change_feed.since(since, limit)
+
+    def latest_change(self):
+        return self.change_feed.latest()
+
+    # --- settings ---
+    def get_setting(self, key, default=None):
+        raise NotImplementedError
+
+    def set_setting(self, key, value):
+        raise NotImplementedError
+
+
+# 📁 Original JSON-file layout
+class JsonStorage(Storage):
+    def __init__(self, base_dir=BASE_DIR):
+        self.base_dir = base_dir
+        self.assignments_dir = os.path.join(base_dir, "Assignments")
+        self.courses_path = os.path.join(base_dir, "backend", "courses.json")
+        self.notifications_path = os.path.join(base_dir, "backend", "notifications.json")
+        self.notification_log = NotificationLog(os.path.join(base_dir, "backend", "notifications"),
+                                                self.notifications_path)
+        self.fetched_ids_path = os.path.join(base_dir, "fetched_ids.json")
+        self.sync_cursor_path = os.path.join(base_dir, "sync_cursor.json")
+        self.config_path = os.path.join(base_dir, "config.json")
+        self.lock_dir = os.path.join(base_dir, ".locks")
+        self._index = None
+        self._change_feed = None
+        self._courses_cache = (None, {})
+
+    # The index is only built by processes that actually query assignments
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = AssignmentIndex(self.assignments_dir)
+        return self._index
+
+    @property
+    def change_feed(self):
+        if self._change_feed is None:
+            self._change_feed = ChangeFeed(os.path.join(self.base_dir, "changes.db"))
+        return self._change_feed
+
+    def read_assignment(self, filename):
+        path = os.path.join(self.assignments_dir, filename)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def write_assignment(self, filename, assignment):
+        os.makedirs(self.assignments_dir, exist_ok=True)
+        path = os.path.join(self.assignments_dir, filename)
+        with lock_for(path, self.lock_dir):
+            existed = os.path.exists(path)
+            write_json(path, assignment)
+        if self._index is not None:
+            self._index.reload_file(filename)
+        self.record_change("assignment", AssignmentIndex.assignment_id(filename, assignment),
+                           action="updated" if existed else "added", filename=filename,
+                           course=AssignmentIndex.course_id(assignment))
+
+    def assignment_filenames(self):
+        if not os.path.exists(self.assignments_dir):
+            return []
+        return [f for f in os.listdir(self.assignments_dir) if f.endswith(".json")]
+
+    def get_assignment(self, assignment_id):
+        return self.index.get(assignment_id)
+
+    def all_assignments(self):
+        return self.index.all()
+
+    def assignments_by_course(self, course_id):
+        return self.index.by_course(course_id)
+
+    def assignments_by_status(self, status):
+        return self.index.by_status(status)
+
+    def update_statuses(self, updates):
+        updates = dict(updates)  # the last status given for an id wins
+        found = {}
+        targets = {}  # filename -> assignment id
+        for assignment_id in updates:
+            filename, _ = self.index.get(assignment_id)
+            found[assignment_id] = filename is not None
+            if filename:
+                targets[filename] = assignment_id
+
+        # Lock every file involved (in path order, so two batches cannot
+        # deadlock) and re-read under the locks: the fetcher may have just
+        # rewritten one. If a write fails, the files already written are
+        # put back, so the batch is applied completely or not at all.
+        originals = {}
+        with contextlib.ExitStack() as locks:
+            for filename in sorted(targets):
+                locks.enter_context(lock_for(os.path.join(self.assignments_dir, filename), self.lock_dir))
+            for filename, assignment_id in targets.items():
+                assignment = self.read_assignment(filename)
+                if assignment is None:
+                    found[assignment_id] = False
+                else:
+                    originals[filename] = assignment
+            written = []
+            try:
+                for filename, assignment in originals.items():
+                    write_json(os.path.join(self.assignments_dir, filename),
+                               dict(assignment, status=updates[targets[filename]]))
+                    written.append(filename)
+            except BaseException:
+                for filename in written:
+                    write_json(os.path.join(self.assignments_dir, filename), originals[filename])
+                raise
+
+        for filename in originals:
+            self.index.reload_file(filename)
+        self.record_changes("status", [
+            (targets[f], {"status": updates[targets[f]], "filename": f}) for f in originals])
+        return found
+
+    def fingerprint(self):
+        try:
+            courses_mtime = os.stat(self.courses_path).st_mtime_ns
+        except FileNotFoundError:
+            courses_mtime = 0
+        return f"{self.index.fingerprint()}-{courses_mtime}"
+
+    def courses(self):
+        # Only re-read courses.json when it has been rewritten
+        try:
+            mtime = os.stat(self.courses_path).st_mtime_ns
+        except FileNotFoundError:
+            return {}
+        if self._courses_cache[0] != mtime:
+            self._courses_cache = (mtime, read_json(self.courses_path, {}))
+        return self._courses_cache[1]
+
+    def save_courses(self, courses):
+        update_json(self.courses_path, {}, lambda current: current.update(courses), self.lock_dir)
+
+    def fetched_ids(self):
+        return read_json(self.fetched_ids_path, {})
+
+    def mark_fetched_many(self, records):
+        if records:
+            update_json(self.fetched_ids_path, {}, lambda current: current.update(records), self.lock_dir)
+
+    def prune_fetched(self, before):
+        def prune(records):
+            old = [k for k, v in records.items() if not v or v < before]
+            for k in old:
+                del records[k]
+            return len(old)
+        return update_json(self.fetched_ids_path, {}, prune, self.lock_dir)
+
+    def sync_cursor(self):
+        return read_json(self.sync_cursor_path, {})
+
+    def save_sync_cursor(self, cursor):
+        update_json(self.sync_cursor_path, {}, lambda current: current.update(cursor), self.lock_dir)
+
+    def notifications(self):
+        return self.notification_log.all()
+
+    def add_notification(self, entry):
+        stored = self.notification_log.append([entry])[0]
+        self.record_change("notification", stored["id"], seq=stored["seq"])
+        return stored
+
+    def notifications_page(self, since=0, limit=None):
+        return self.notification_log.page(since, limit)
+
+    def get_setting(self, key, default=None):
+        return read_json(self.config_path, {}).get(key, default)
+
+    def set_setting(self, key, value):
+        update_json(self.config_path, {}, lambda config: config.update({key: value}), self.lock_dir)
+
+
+# 🗄️ Indexed SQLite database (WAL mode)
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS assignments (
+    filename   TEXT PRIMARY KEY,
+    id         TEXT NOT NULL,
+    course_id  TEXT,
+    status     TEXT NOT NULL DEFAULT 'pending',
+    data       TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_assignments_id ON assignments(id);
+CREATE INDEX IF NOT EXISTS idx_assignments_course ON assignments(course_id);
+CREATE INDEX IF NOT EXISTS idx_assignments_status ON assignments(status);
+
+CREATE TABLE IF NOT EXISTS courses (
+    id    TEXT PRIMARY KEY,
+    name  TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS fetched_ids (
+    assignment_id  TEXT PRIMARY KEY,
+    update_time    TEXT
+);
+
+CREATE TABLE IF NOT EXISTS sync_cursor (
+    course_id    TEXT PRIMARY KEY,
+    update_time  TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS notifications (
+    seq    INTEGER PRIMARY KEY AUTOINCREMENT,
+    data   TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS settings (
+    key    TEXT PRIMARY KEY,
+    value  TEXT
+);
+
+-- Bumped by triggers so readers in any process can cheaply detect changes
+CREATE TABLE IF NOT EXISTS meta (
+    key    TEXT PRIMARY KEY,
+    value  INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0);
+"""
+
+VERSION_TRIGGERS = [
+    (table, event)
+    for table in ("assignments", "courses")
+    for event in ("INSERT", "UPDATE", "DELETE")
+]
+
+
+class SqliteStorage(Storage):
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._snapshot = (None, [])  # (version, [(filename, assignment), ...])
+        self._snapshot_lock = threading.Lock()
+        self.change_feed = ChangeFeed(db_path)  # `changes` table in the same database
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            conn.executescript(SCHEMA)
+            for table, event in VERSION_TRIGGERS:
+                conn.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS bump_{table}_{event.lower()} "
+                    f"AFTER {event} ON {table} BEGIN "
+                    f"UPDATE meta SET value = value + 1 WHERE key = 'version'; END"
+                )
+
+    # One connection per thread; sqlite3 connections are not thread-safe
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _columns(filename, assignment):
+        return (
+            filename,
+            assignment.get('id', filename[:-len('.json')]),
+            assignment.get('courseId') or assignment.get('course'),
+            assignment.get('status', 'pending'),
+            json.dumps(assignment),
+        )
+
+    def read_assignment(self, filename):
+        row = self._conn().execute(
+            "SELECT data FROM assignments WHERE filename = ?", (filename,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def write_assignment(self, filename, assignment):
+        columns = self._columns(filename, assignment)
+        with self._conn() as conn:
+            existed = conn.execute(
+                "SELECT 1 FROM assignments WHERE filename = ?", (filename,)).fetchone() is not None
+            conn.execute(
+                "INSERT OR REPLACE INTO assignments (filename, id, course_id, status, data) "
+                "VALUES (?, ?, ?, ?, ?)", columns)
+        self.record_change("assignment", columns[1], action="updated" if existed else "added",
+                           filename=filename, course=columns[2])
+
+    # Bulk load (import): one "reload" change instead of one per assignment
+    def write_assignments(self, items):
+        with self._conn() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO assignments (filename, id, course_id, status, data) "
+                "VALUES (?, ?, ?, ?, ?)", [self._columns(f, a) for f, a in items])
+        self.record_change("reload")
+
+    def assignment_filenames(self):
+        return [r[0] for r in self._conn().execute("SELECT filename FROM assignments")]
+
+    def get_assignment(self, assignment_id):
+        row = self._conn().execute(
+            "SELECT filename, data FROM assignments WHERE id = ?", (assignment_id,)).fetchone()
+        if not row:
+            return None, None
+        return row[0], json.loads(row[1])
+
+    def all_assignments(self):
+        # Parsed rows are reused until the version counter moves
+        version = self._version()
+        with self._snapshot_lock:
+            if self._snapshot[0] != version:
+                rows = self._conn().execute("SELECT filename, data FROM assignments")
+                self._snapshot = (version, [(f, json.loads(d)) for f, d in rows])
+            return list(self._snapshot[1])
+
+    def assignments_by_course(self, course_id):
+        rows = self._conn().execute(
+            "SELECT filename, data FROM assignments WHERE course_id = ?", (course_id,))
+        return [(f, json.loads(d)) for f, d in rows]
+
+    def assignments_by_status(self, status):
+        rows = self._conn().execute(
+            "SELECT filename, data FROM assignments WHERE status = ?", (status,))
+        return [(f, json.loads(d)) for f, d in rows]
+
+    def update_statuses(self, updates):
+        updates = dict(updates)  # the last status given for an id wins
+        found = {}
+        with self._conn() as conn:
+            for assignment_id, status in updates.items():
+                cur = conn.execute(
+                    "UPDATE assignments SET status = ?, data = json_set(data, '$.status', ?) "
+                    "WHERE id = ?", (status, status, assignment_id))
+                found[assignment_id] = cur.rowcount > 0
+        self.record_changes("status", [
+            (assignment_id, {"status": status}) for assignment_id, status in updates.items()
+            if found[assignment_id]])
+        return found
+
+    def _version(self):
+        return self._conn().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+    def fingerprint(self):
+        return f"sqlite-{self._version()}"
+
+    def courses(self):
+        return dict(self._conn().execute("SELECT id, name FROM courses"))
+
+    def save_courses(self, courses):
+        with self._conn() as conn:
+            conn.executemany(
+                "INSERT INTO courses (id, name) VALUES (?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET name = excluded.name WHERE name != excluded.name",
+                list(courses.items()))
+
+    def fetched_ids(self):
+        return dict(self._conn().execute("SELECT assignment_id, update_time FROM fetched_ids"))
+
+    def mark_fetched_many(self, records):
+        with self._conn() as conn:
+            conn.executemany("INSERT OR REPLACE INTO fetched_ids (assignment_id, update_time) "
+                             "VALUES (?, ?)", list(records.items()))
+
+    def prune_fetched(self, before):
+        with self._conn() as conn:
+            cur = conn.execute("DELETE FROM fetched_ids WHERE update_time IS NULL OR update_time < ?",
+                               (before,))
+        return cur.rowcount
+
+    def sync_cursor(self):
+        return dict(self._conn().execute("SELECT course_id, update_time FROM sync_cursor"))
+
+    def save_sync_cursor(self, cursor):
+        with self._conn() as conn:
+            conn.executemany("INSERT OR REPLACE INTO sync_cursor (course_id, update_time) VALUES (?, ?)",
+                             list(cursor.items()))
+
+    def notifications(self):
+        return self.notifications_page(0)
+
+    def add_notification(self, entry):
+        entry = dict(entry, id=entry.get("id") or new_id())
+        with self._conn() as conn:
+            cur = conn.execute("INSERT INTO notifications (data) VALUES (?)", (json.dumps(entry),))
+        self.record_change("notification", entry["id"], seq=cur.lastrowid)
+        return dict(entry, seq=cur.lastrowid)
+
+    def notifications_page(self, since=0, limit=None):
+        rows = self._conn().execute(
+            "SELECT seq, data FROM notifications WHERE seq > ? ORDER BY seq LIMIT ?",
+            (since, -1 if limit is None else limit))
+        return [dict(json.loads(data), seq=seq) for seq, data in rows]
+
+    def get_setting(self, key, default=None):
+        row = self._conn().execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_setting(self, key, value):
+        with self._conn() as conn:
+            conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+                         (key, json.dumps(value)))
+
+
+# 🔌 Backend selection (config.json is always read from disk: it says where
+# everything else lives)
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            config = read_json(CONFIG_PATH, {})
+            if config.get("storage", "json") == "sqlite":
+                db_path = os.path.join(BASE_DIR, config.get("databasePath", DEFAULT_DATABASE_PATH))
+                _storage = SqliteStorage(db_path)
+            else:
+                _storage = JsonStorage(BASE_DIR)
+        return _storage
+
+
+# 📥 One-shot importer: copy the JSON layout into a SQLite database
+def import_json_layout(base_dir=BASE_DIR, db_path=None):
+    source = JsonStorage(base_dir)
+    target = SqliteStorage(db_path or os.path.join(base_dir, DEFAULT_DATABASE_PATH))
+
+    assignments = []
+    for filename in source.assignment_filenames():
+        try:
+            assignments.append((filename, source.read_assignment(filename)))
+        except Exception as e:
+            print(f"⚠️ Skipping {filename}: {e}")
+    target.write_assignments(assignments)
+
+    target.save_courses(source.courses())
+
+    with target._conn() as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO fetched_ids (assignment_id, update_time) VALUES (?, ?)",
+            list(source.fetched_ids().items()))
+        conn.executemany(
+            "INSERT OR REPLACE INTO sync_cursor (course_id, update_time) VALUES (?, ?)",
+            list(source.sync_cursor().items()))
+        if conn.execute("SELECT COUNT(*) FROM notifications").fetchone()[0] == 0:
+            conn.executemany("INSERT INTO notifications (seq, data) VALUES (?, ?)",
+                             [(n["seq"], json.dumps(n)) for n in source.notifications()])
+
+    for key, value in read_json(source.config_path, {}).items():
+        if key not in ("storage", "databasePath"):
+            target.set_setting(key, value)
+
+    print(f"✅ Imported {len(assignments)} assignments into {target.db_path}")
+    return target
+
+
+if __name__ == '__main__':
+    if len(sys.argv) >= 2 and sys.argv[1] == "import":
+        import_json_layout(db_path=sys.argv[2] if len(sys.argv) > 2 else None)
+    else:
+        print("Usage: python storage.py import [database path]")
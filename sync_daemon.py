@@ -0,0 +1,394 @@
+# 🔁 Sync Daemon
+#
+# Long-running replacement for running fetch_assignments.py from cron. The
+# credentials, the Classroom/Drive services (one per worker thread) and the
+# generation workers stay warm between syncs, and every course has its own
+# schedule:
+#   * a course that just changed is polled every minIntervalSeconds
+#   * every poll that finds nothing doubles its interval, up to
+#     maxIntervalSeconds
+#   * on startup the interval follows how long the course has been quiet
+#     (age of its watermark / quietDivisor), so courses that have been
+#     silent for weeks are polled rarely from the start
+#   * every interval gets +/- jitter so courses do not all fire together
+# Courses that are due together share one batched listing. The course list
+# itself is refreshed every courseRefreshSeconds. With emailDigest on, the
+# digest of a cycle is sent once the generation queue has drained.
+#
+# A small control server (127.0.0.1:5055 by default) answers:
+#   GET  /health    200 while syncs succeed, 503 otherwise
+#   GET  /status    per-course schedule and the last cycle's counts
+#   GET  /metrics   Prometheus text (see metrics.py)
+#   POST /sync      sync every course now (?course=<id> for one)
+#   POST /stop      graceful shutdown, like SIGTERM / Ctrl+C
+#
+#   python sync_daemon.py
+#
+# Settings: config.json -> "daemon" (see DEFAULTS).
+
+import json
+import random
+import signal
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from storage import get_storage
+from job_queue import get_queue, WorkerPool, default_handlers, DEFAULT_WORKERS
+from email_notifier import get_dispatcher, flush_notifications
+from classroom_sync import COURSE_FIELDS, COURSEWORK_FIELDS
+from metrics import registry, render_prometheus, load_snapshots, write_snapshot
+import fetch_assignments
+from fetch_assignments import (connect, sync_course, new_stats, cutoff_date_setting,
+                               load_fetched_ids, prune_fetched_ids, write_run_log)
+
+DEFAULTS = {
+    "host": "127.0.0.1",
+    "port": 5055,
+    "minIntervalSeconds": 120,
+    "maxIntervalSeconds": 6 * 3600,
+    "quietDivisor": 24,             # quiet for 2 days -> polled every 2 hours
+    "jitter": 0.2,                  # +/- 20% on every interval
+    "courseRefreshSeconds": 3600,
+    "unhealthyAfterFailures": 3,    # consecutive failed cycles before /health says 503
+}
+IDLE_CHECK_SECONDS = 5.0            # how often a waiting daemon checks whether generation is done
+
+
+def parse_update_time(value):
+    return datetime.strptime(value[:19], "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc)
+
+
+class CourseSchedule:
+    def __init__(self, course, interval, next_due):
+        self.course = course
+        self.interval = interval
+        self.next_due = next_due          # time.monotonic() value
+        self.last_sync = None             # wall-clock timestamps
+        self.last_change = None
+        self.polls = 0
+        self.changes = 0
+        self.errors = 0
+
+    def to_json(self, now):
+        iso = lambda t: datetime.fromtimestamp(t).isoformat(timespec="seconds") if t else None
+        return {
+            "id": self.course["id"],
+            "name": self.course["name"],
+            "intervalSeconds": round(self.interval),
+            "nextSyncInSeconds": max(0, round(self.next_due - now)),
+            "lastSync": iso(self.last_sync),
+            "lastChange": iso(self.last_change),
+            "polls": self.polls,
+            "changes": self.changes,
+            "errors": self.errors,
+        }
+
+
+class SyncDaemon:
+    def __init__(self, settings=None):
+        self.settings = dict(DEFAULTS, **(settings or {}))
+        self.schedules = {}               # course_id -> CourseSchedule
+        self.started = time.time()
+        self.cycles = 0
+        self.last_cycle = None
+        self.last_error = None
+        self.failures = 0                 # consecutive failed cycles
+        self.running = False
+        self._next_course_refresh = 0.0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._rng = random.Random()
+        self._workers = None
+        self._server = None
+        self._notifications_pending = False
+
+    # ⏳ Scheduling
+    def _jitter(self, seconds):
+        jitter = self.settings["jitter"]
+        return seconds * (1 + self._rng.uniform(-jitter, jitter))
+
+    def _clamp(self, seconds):
+        return min(self.settings["maxIntervalSeconds"], max(self.settings["minIntervalSeconds"], seconds))
+
+    def initial_interval(self, watermark):
+        if not watermark:
+            return self.settings["minIntervalSeconds"]
+        try:
+            quiet = (datetime.now(timezone.utc) - parse_update_time(watermark)).total_seconds()
+        except ValueError:
+            return self.settings["minIntervalSeconds"]
+        return self._clamp(quiet / self.settings["quietDivisor"])
+
+    def reschedule(self, schedule, changed=False, failed=False):
+        now = time.monotonic()
+        schedule.polls += 1
+        schedule.last_sync = time.time()
+        if failed:
+            schedule.errors += 1
+            schedule.next_due = now + self._jitter(self.settings["minIntervalSeconds"])
+            return
+        if changed:
+            schedule.changes += 1
+            schedule.last_change = schedule.last_sync
+            schedule.interval = self.settings["minIntervalSeconds"]
+        else:
+            schedule.interval = self._clamp(schedule.interval * 2)
+        schedule.next_due = now + self._jitter(schedule.interval)
+
+    def seconds_until_due(self):
+        with self._lock:
+            next_due = min([s.next_due for s in self.schedules.values()] + [self._next_course_refresh])
+        return max(0.0, next_due - time.monotonic())
+
+    # 🎛️ Control
+    def trigger(self, course_id=None):
+        with self._lock:
+            targets = [self.schedules[course_id]] if course_id else list(self.schedules.values())
+            for schedule in targets:
+                schedule.next_due = 0.0
+        self._wake.set()
+        return len(targets)
+
+    def stop(self, *_):
+        self._stop.set()
+        self._wake.set()
+
+    def health(self):
+        healthy = self.running and self.failures < self.settings["unhealthyAfterFailures"]
+        return healthy, {
+            "status": "ok" if healthy else ("failing" if self.running else "stopped"),
+            "uptimeSeconds": round(time.time() - self.started),
+            "cycles": self.cycles,
+            "consecutiveFailures": self.failures,
+            "lastError": self.last_error,
+            "courses": len(self.schedules),
+        }
+
+    def status(self):
+        _, payload = self.health()
+        now = time.monotonic()
+        with self._lock:
+            courses = sorted(self.schedules.values(), key=lambda s: s.next_due)
+            payload["courses"] = [s.to_json(now) for s in courses]
+        payload["lastCycle"] = self.last_cycle
+        payload["queue"] = get_queue().counts()
+        return payload
+
+    # 📘 Course list: new courses are due at once, removed ones are dropped
+    def refresh_courses(self):
+        storage = get_storage()
+        courses = self.sync.list_courses(courseStates=["ACTIVE"], fields=COURSE_FIELDS)
+        watermarks = storage.sync_cursor()
+        now = time.monotonic()
+        with self._lock:
+            current = {}
+            for course in courses:
+                schedule = self.schedules.get(course["id"])
+                if schedule is None:
+                    interval = self.initial_interval(watermarks.get(course["id"]))
+                    schedule = CourseSchedule(course, interval, now)
+                schedule.course = course
+                current[course["id"]] = schedule
+            self.schedules = current
+
+        courses_data = dict(storage.courses())
+        if any(course["id"] not in courses_data for course in courses):
+            courses_data.update({course["id"]: course["name"] for course in courses
+                                 if course["id"] not in courses_data})
+            storage.save_courses(courses_data)
+        pruned = prune_fetched_ids()
+        self._next_course_refresh = time.monotonic() + self._jitter(self.settings["courseRefreshSeconds"])
+        print(f"📚 {len(courses)} active courses, pruned {pruned} old fetched IDs")
+
+    # 🔄 One cycle: list every due course in one batched call, save changes
+    def cycle(self):
+        if time.monotonic() >= self._next_course_refresh:
+            self.refresh_courses()
+        with self._lock:
+            due = [s for s in self.schedules.values() if s.next_due <= time.monotonic()]
+        if not due:
+            return
+
+        started_at = datetime.now()
+        started = time.monotonic()
+        storage = get_storage()
+        stats = new_stats()
+        stats["courses"] = len(due)
+        watermarks = storage.sync_cursor()
+        fetched_records = load_fetched_ids()
+        cutoff_date = cutoff_date_setting()
+        if storage.get_setting("emailDigest", False):
+            get_dispatcher().begin_digest()
+
+        coursework, errors = self.sync.list_coursework([s.course["id"] for s in due],
+                                                       since=watermarks, fields=COURSEWORK_FIELDS)
+        new_watermarks = {}
+        for schedule in due:
+            course_id = schedule.course["id"]
+            try:
+                if course_id in errors:
+                    raise errors[course_id]
+                items = coursework.get(course_id, [])
+                watermark = sync_course(schedule.course, items, watermarks.get(course_id),
+                                        fetched_records, cutoff_date, self.downloads, stats)
+                if watermark and watermark != watermarks.get(course_id):
+                    new_watermarks[course_id] = watermark
+                self.reschedule(schedule, changed=bool(items))
+            except Exception as e:
+                stats["courseErrors"] += 1
+                print(f"⚠️ Error fetching from {schedule.course['name']}: {e}")
+                self.reschedule(schedule, failed=True)
+
+        if new_watermarks:
+            storage.save_sync_cursor(new_watermarks)
+        # The emails come from the generation jobs, which run on the worker
+        # thread: the digest is sent once they are done (flush_when_idle)
+        self._notifications_pending = True
+        if self._workers is None:
+            self.flush_when_idle()
+        stats["durationSeconds"] = round(time.monotonic() - started, 2)
+        write_run_log(started_at, stats)
+        self.cycles += 1
+        self.last_cycle = dict(stats, time=started_at.isoformat(timespec="seconds"))
+        if stats["courseErrors"] and stats["courseErrors"] == len(due):
+            raise RuntimeError(f"all {len(due)} course listings failed")
+
+    # ▶️ Main loop
+    def run(self):
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+
+        creds = fetch_assignments.authenticate()
+        self.sync, self.downloads = connect(creds)
+        self._start_server()
+        self._start_workers()
+        self.running = True
+        host, port = self._server.server_address[:2]
+        print(f"🔁 Sync daemon running, control on http://{host}:{port}")
+
+        try:
+            while not self._stop.is_set():
+                try:
+                    self.cycle()
+                    self.failures = 0
+                except Exception as e:
+                    self.failures += 1
+                    self.last_error = f"{datetime.now().isoformat(timespec='seconds')}: {e}"
+                    print(f"❌ Sync cycle failed: {e}")
+                    # Do not spin on a persistent failure (expired token, no network)
+                    self._wake.wait(self._jitter(self.settings["minIntervalSeconds"]))
+                write_snapshot("daemon")
+                self._wait_until_due()
+                self._wake.clear()
+        finally:
+            self.shutdown()
+
+    # Sleep until the next course is due (or a trigger), sending the
+    # notifications as soon as the queue has drained
+    def _wait_until_due(self):
+        deadline = time.monotonic() + self.seconds_until_due()
+        while not self._stop.is_set() and not self._wake.is_set():
+            self.flush_when_idle()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            self._wake.wait(min(remaining, IDLE_CHECK_SECONDS))
+
+    # Send the cycle's notifications (one digest email in digest mode) once
+    # no generation job is queued or running anymore
+    def flush_when_idle(self):
+        if not self._notifications_pending:
+            return
+        if self._workers is not None and get_queue().pending():
+            return
+        self._notifications_pending = False
+        flush_notifications()
+
+    def shutdown(self):
+        print("🛑 Stopping sync daemon...")
+        self.running = False
+        if self._workers is not None:
+            self._workers.stop()
+            self._workers_thread.join()
+        flush_notifications()
+        self.sync.close()
+        self.downloads.close()
+        write_snapshot("daemon")
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        print("✅ Sync daemon stopped")
+
+    # 🧠 Generation jobs run continuously instead of after each sync
+    def _start_workers(self):
+        storage = get_storage()
+        if not storage.get_setting("drainQueueAfterSync", True):
+            return
+        self._workers = WorkerPool(get_queue(), default_handlers(),
+                                   workers=storage.get_setting("generationWorkers", DEFAULT_WORKERS))
+        self._workers_thread = threading.Thread(target=self._workers.run, name="generation-workers",
+                                                daemon=True)
+        self._workers_thread.start()
+
+    def _start_server(self):
+        self._server = ThreadingHTTPServer((self.settings["host"], self.settings["port"]),
+                                           control_handler(self))
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="daemon-control", daemon=True).start()
+
+
+# 🌐 Control / health endpoint
+def control_handler(daemon):
+    class ControlHandler(BaseHTTPRequestHandler):
+        def _send(self, status, body, content_type="application/json"):
+            data = body.encode("utf-8") if isinstance(body, str) else json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            if path == "/health":
+                healthy, payload = daemon.health()
+                self._send(200 if healthy else 503, payload)
+            elif path == "/status":
+                self._send(200, daemon.status())
+            elif path == "/metrics":
+                snapshots = dict(load_snapshots(), daemon=registry.snapshot())
+                self._send(200, render_prometheus(snapshots), "text/plain; version=0.0.4")
+            else:
+                self._send(404, {"error": "Not found"})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path == "/sync":
+                course_id = parse_qs(url.query).get("course", [None])[0]
+                if course_id and course_id not in daemon.schedules:
+                    self._send(404, {"error": f"Unknown course {course_id}"})
+                    return
+                self._send(202, {"triggered": daemon.trigger(course_id)})
+            elif url.path == "/stop":
+                self._send(202, {"message": "Stopping"})
+                daemon.stop()
+            else:
+                self._send(404, {"error": "Not found"})
+
+        def log_message(self, format, *args):
+            pass  # keep the daemon's output to sync progress
+
+    return ControlHandler
+
+
+def main():
+    SyncDaemon(get_storage().get_setting("daemon", {}) or {}).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("openai")
+
+from ai_engine import GenerationEngine
+
+
+COMPLETION = {
+    "id": "chatcmpl-stub", "object": "chat.completion", "created": 0, "model": "stub",
+    "choices": [{"index": 0, "finish_reason": "stop",
+                 "message": {"role": "assistant", "content": "stub answer"}}],
+    "usage": {"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12},
+}
+
+
+# 🎭 Local stand-in for the OpenAI API: replies are taken from `script` in order
+class StubServer:
+    def __init__(self, script):
+        self.script = list(script)
+        self.requests = []  # monotonic time of every request
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                stub.requests.append(time.monotonic())
+                status, headers, delay = stub.script.pop(0) if stub.script else (200, {}, 0)
+                time.sleep(delay)
+                if status == 200 and request.get("stream"):
+                    return self.stream()
+                body = json.dumps(COMPLETION if status == 200 else
+                                  {"error": {"message": "slow down", "type": "rate_limit"}}).encode()
+                try:
+                    self.send_response(status)
+                    for name, value in dict(headers, **{"Content-Type": "application/json"}).items():
+                        self.send_header(name, value)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except OSError:
+                    pass  # the client gave up (timeout test)
+
+            def stream(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                for piece in ("stub ", "streamed ", "answer"):
+                    chunk = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": 0,
+                             "model": "stub", "choices": [{"index": 0, "delta": {"content": piece}}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.close_connection = True
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def engine_for(stub, **settings):
+    settings = dict({"requestsPerMinute": 6000, "tokensPerMinute": 10000000}, **settings)
+    return GenerationEngine(settings, base_url=stub.base_url, api_key="test")
+
+
+def run(engine, coroutine):
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await engine.aclose()
+    return asyncio.run(main())
+
+
+def test_429_is_retried_after_retry_after():
+    stub = StubServer([(429, {"Retry-After": "1"}, 0)])
+    try:
+        engine = engine_for(stub)
+        assert run(engine, engine.generate("hello")) == "stub answer"
+    finally:
+        stub.close()
+    assert len(stub.requests) == 2
+    assert 0.9 <= stub.requests[1] - stub.requests[0] < 2.5
+    assert engine.usage["retries"] == 1
+
+
+def test_request_timeout_fires():
+    import openai
+    stub = StubServer([(200, {}, 3)])
+    try:
+        engine = engine_for(stub, timeoutSeconds=0.5, maxRetries=0)
+        started = time.monotonic()
+        with pytest.raises(openai.APITimeoutError):
+            run(engine, engine.generate("hello"))
+        assert time.monotonic() - started < 2.5
+    finally:
+        stub.close()
+
+
+def test_stream_callbacks_run_off_the_event_loop_in_order():
+    stub = StubServer([])
+    pieces, threads = [], set()
+
+    def on_delta(text):
+        time.sleep(0.05)  # a blocking write must not stall the loop
+        pieces.append(text)
+        threads.add(threading.current_thread())
+
+    async def main(engine):
+        loop_thread = threading.current_thread()
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        try:
+            return await engine.generate_stream("hello", on_delta), loop_thread, ticks
+        finally:
+            ticker.cancel()
+
+    try:
+        engine = engine_for(stub)
+        content, loop_thread, ticks = run(engine, main(engine))
+    finally:
+        stub.close()
+    assert content == "stub streamed answer"
+    assert pieces == ["stub ", "streamed ", "answer"]
+    assert loop_thread not in threads
+    assert ticks >= 5
@@ -0,0 +1,55 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from response_files import render_inline, render_html
+
+
+def test_link_with_ampersand_and_underscores_is_escaped_once():
+    rendered = render_inline("See [the_docs](https://example.com/a_b_c?x=1&y=_2_) now")
+    assert 'href="https://example.com/a_b_c?x=1&amp;y=_2_"' in rendered
+    assert "&amp;amp;" not in rendered
+    assert "<em>" not in rendered.split('">', 1)[0]
+    assert ">the_docs</a>" in rendered
+
+
+def test_link_text_keeps_emphasis_and_escaping():
+    rendered = render_inline("[**bold** & <tag>](https://example.com/*x*)")
+    assert rendered.startswith('<a href="https://example.com/*x*"')
+    assert "<strong>bold</strong> &amp; &lt;tag&gt;</a>" in rendered
+
+
+def test_code_inside_link_text():
+    rendered = render_inline("[`a_b`](https://example.com)")
+    assert "<code>a_b</code></a>" in rendered
+
+
+def test_emphasis_outside_links():
+    assert render_inline("*one* and _two_ & **three**") == \
+        "<em>one</em> and <em>two</em> &amp; <strong>three</strong>"
+
+
+def test_render_html_paragraph_with_link():
+    assert render_html("Go [here](https://example.com/?a=1&b=2)") == \
+        '<p>Go <a href="https://example.com/?a=1&amp;b=2" target="_blank" rel="noopener noreferrer">here</a></p>'
+
+
+def test_compressed_variants_count_against_max_bytes(tmp_path):
+    import gzip
+    from response_files import ResponseFileCache
+
+    body = os.urandom(4000)  # incompressible: the gzip variant is as large as the body
+    first, second = tmp_path / "a.md", tmp_path / "b.md"
+    first.write_bytes(body)
+    second.write_bytes(body)
+    cache = ResponseFileCache(max_bytes=9000)
+
+    old = cache.get(str(first))
+    entry = cache.get(str(second))  # both bodies fit
+
+    assert gzip.decompress(cache.encoded(entry, "gzip")) == body
+    assert cache.encoded(entry, "gzip") is cache.encoded(entry, "gzip")
+    # The variant pushed the total over max_bytes: the least recent entry went
+    assert cache.get(str(second)) is entry
+    assert cache.get(str(first)) is not old
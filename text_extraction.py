@@ -0,0 +1,223 @@
+# 📄 Cached, Parallel Attachment Text Extraction
+#
+# Extracted text is cached on disk under Extracted_Text/<sha256 of file>.txt,
+# so an attachment is parsed once no matter how often its assignment is
+# processed. Small files are parsed inline; larger cache misses go to a
+# process pool that lives as long as the process, several files at a time.
+# Each file has its own timeout; a corrupt document that hangs is abandoned
+# and its pool retired (workers killed) instead of blocking the run.
+#
+# PDFs are written to the cache page by page, so fitz never has to build the
+# whole document text in memory.
+
+import os
+import hashlib
+import threading
+import multiprocessing
+
+from metrics import timer, timed
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(BASE_DIR, "Extracted_Text")
+
+EXTRACT_TIMEOUT = 60       # seconds per file
+MAX_PROCESSES = max(1, min(4, os.cpu_count() or 1))
+INLINE_BYTES = 256 * 1024  # smaller files parse faster than a pool round trip
+HASH_CHUNK = 1024 * 1024
+
+SUPPORTED = ("pdf", "docx", "txt")
+
+# (path, mtime_ns, size) -> sha256, so unchanged files are not re-hashed
+_hash_memo = {}
+_hash_lock = threading.Lock()
+
+
+def file_hash(path):
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    with _hash_lock:
+        if memo_key in _hash_memo:
+            return _hash_memo[memo_key]
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    with _hash_lock:
+        _hash_memo[memo_key] = digest.hexdigest()
+    return _hash_memo[memo_key]
+
+
+def cache_path_for(path):
+    return os.path.join(CACHE_DIR, f"{file_hash(path)}.txt")
+
+
+def file_type(path):
+    return path.split('.')[-1].lower()
+
+
+# 📃 Page-by-page readers (also used by the prompt builder)
+def iter_pdf_pages(path):
+    import fitz
+    with fitz.open(path) as doc:
+        for page in doc:
+            yield page.get_text()
+
+
+def iter_docx_paragraphs(path):
+    import docx
+    for para in docx.Document(path).paragraphs:
+        yield para.text
+
+
+def iter_text_parts(path):
+    ext = file_type(path)
+    if ext == "pdf":
+        return iter_pdf_pages(path)
+    if ext == "docx":
+        return iter_docx_paragraphs(path)
+    if ext == "txt":
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            return iter([f.read()])
+    raise ValueError(f"Unsupported file type: {ext}")
+
+
+def error_text(path, error):
+    ext = file_type(path)
+    label = {"pdf": "PDF", "docx": "DOCX"}.get(ext, ext.upper())
+    return f"(Error reading {label}: {error})"
+
+
+# 🧱 Runs inside a worker process: parse, stream into the cache, rename
+def _extract_to_cache(path, target):
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp = f"{target}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, 'w', encoding='utf-8') as out:
+            first = True
+            for part in iter_text_parts(path):
+                if not first:
+                    out.write("\n")
+                out.write(part)
+                first = False
+        os.replace(tmp, target)
+    except BaseException:
+        _remove_quietly(tmp)
+        raise
+    return target
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _read_cached(target):
+    with open(target, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+# ✅ Single file, in-process
+def extract_text(path):
+    try:
+        target = cache_path_for(path)
+        if not os.path.exists(target):
+            with timer("extract_text"):
+                _extract_to_cache(path, target)
+        return _read_cached(target)
+    except Exception as e:
+        return error_text(path, e)
+
+
+# ⚡ Make sure every file has a cache entry. Cache misses are parsed in
+# parallel. Returns ({path: cache file}, {path: "(Error ...)" text}).
+def extract_to_cache(paths, timeout=EXTRACT_TIMEOUT, processes=MAX_PROCESSES):
+    targets = {}
+    errors = {}
+    misses = {}
+    for path in paths:
+        try:
+            target = cache_path_for(path)
+        except Exception as e:
+            errors[path] = error_text(path, e)
+            continue
+        if os.path.exists(target):
+            targets[path] = target
+        elif file_type(path) == "txt" or os.path.getsize(path) < INLINE_BYTES:
+            try:
+                targets[path] = _extract_to_cache(path, target)
+            except Exception as e:
+                errors[path] = error_text(path, e)
+        else:
+            misses[path] = target
+
+    if not misses:
+        return targets, errors
+
+    _extract_misses(misses, targets, errors, timeout, processes)
+    return targets, errors
+
+
+# 🏊 One pool per process, started on the first large miss. A pool with a
+# hung worker is retired: new batches get a fresh pool, and the old one is
+# terminated once the last batch using it is done.
+_pool = None
+_pool_users = {}  # pool -> batches currently waiting on it
+_pool_lock = threading.Lock()
+
+
+def _acquire_pool(processes):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: safe even when called from the job-queue worker threads
+            _pool = multiprocessing.get_context("spawn").Pool(processes=processes)
+            _pool_users[_pool] = 0
+        _pool_users[_pool] += 1
+        return _pool
+
+
+def _release_pool(pool, hung):
+    global _pool
+    with _pool_lock:
+        _pool_users[pool] -= 1
+        if hung and pool is _pool:
+            _pool = None
+        retire = pool is not _pool and _pool_users[pool] == 0
+        if retire:
+            del _pool_users[pool]
+    if retire:
+        # terminate() also kills workers stuck on a corrupt document
+        pool.terminate()
+        pool.join()
+
+
+@timed("extract_text")
+def _extract_misses(misses, targets, errors, timeout, processes):
+    pool = _acquire_pool(processes)
+    timed_out = []
+    try:
+        pending = {path: pool.apply_async(_extract_to_cache, (path, target))
+                   for path, target in misses.items()}
+        for path, async_result in pending.items():
+            try:
+                targets[path] = async_result.get(timeout=timeout)
+            except multiprocessing.TimeoutError:
+                print(f"⏱️ Extraction timed out after {timeout}s: {os.path.basename(path)}")
+                errors[path] = error_text(path, f"timed out after {timeout}s")
+                timed_out.append(misses[path])
+            except Exception as e:
+                errors[path] = error_text(path, e)
+    finally:
+        _release_pool(pool, hung=bool(timed_out))
+    # A killed worker never gets to clean up its partial file
+    for target in timed_out:
+        folder, name = os.path.split(target)
+        try:
+            leftovers = os.listdir(folder)
+        except OSError:
+            continue
+        for leftover in leftovers:
+            if leftover.startswith(name + ".") and leftover.endswith(".tmp"):
+                _remove_quietly(os.path.join(folder, leftover))